@@ -0,0 +1,207 @@
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 匹配列表重命名 import (MODE_RENAME, SYNC_MTIME, MatchEngine, PaperMatcher, TitleNormalizer, assign_titles,
+                     _assign_component)
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def paper_files(folder):
+    """论文文件夹中的论文文件 -> 内容，不包括日志、记录和缓存"""
+    return {name: read(os.path.join(folder, name)) for name in os.listdir(folder)
+            if name.endswith(".pdf") and os.path.isfile(os.path.join(folder, name))}
+
+class TitleNormalizerTest(unittest.TestCase):
+    """规范化时去掉版本后缀"""
+
+    def setUp(self):
+        self.normalizer = TitleNormalizer()
+
+    def test_suffix_inside_word_is_kept(self):
+        normalize = self.normalizer.normalize
+        self.assertNotEqual(normalize("Deployment of IPv6"), normalize("Deployment of IPv4"))
+        self.assertEqual(normalize("Deployment of IPv6"), "deploymentofipv6")
+        self.assertEqual(normalize("Electron Microscopy"), "electronmicroscopy")
+        self.assertEqual(normalize("Research on Redraft"), "researchonredraft")
+
+    def test_separated_suffix_is_removed(self):
+        normalize = self.normalizer.normalize
+        self.assertEqual(normalize("Paper v2"), "paper")
+        self.assertEqual(normalize("Paper_V3 (final)"), "paper")
+        self.assertEqual(normalize("论文_终稿"), "论文")
+        self.assertEqual(normalize("论文终稿(1)"), "论文")
+
+    def test_ipv6_title_does_not_match_ipv4_file(self):
+        key_map, _ = self.normalizer.key_map(["Deployment of IPv6"])
+        self.assertIsNone(key_map.get(self.normalizer.normalize("Deployment of IPv4")))
+
+class InPlaceRenameTest(unittest.TestCase):
+    """原地重命名（MODE_RENAME）"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.papers = os.path.join(self.root, "论文")
+        os.makedirs(self.papers)
+        self.sheet = os.path.join(self.root, "名单.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run_matcher(self, rows):
+        write(self.sheet, "序号,论文题目\n" + "".join(f"{paper_id},{title}\n" for paper_id, title in rows))
+        matcher = PaperMatcher(self.sheet, self.papers, output_mode=MODE_RENAME, workers=1, use_cache=False,
+                               log=lambda message: None)
+        self.assertTrue(matcher.run())
+        return matcher
+
+    def test_existing_target_is_not_overwritten(self):
+        write(os.path.join(self.papers, "论文A.pdf"), "PAPER")
+        os.makedirs(os.path.join(self.papers, "1_论文A.pdf"))
+        matcher = self.run_matcher([(1, "论文A")])
+        self.assertEqual(paper_files(self.papers), {"论文A.pdf": "PAPER"})
+        self.assertTrue(os.path.isdir(os.path.join(self.papers, "1_论文A.pdf")))
+        self.assertIn("冲突", matcher.match_results[0].error)
+
+    def test_rerun_is_idempotent(self):
+        write(os.path.join(self.papers, "论文A.pdf"), "A")
+        write(os.path.join(self.papers, "论文B.pdf"), "B")
+        rows = [(1, "论文A"), (12, "论文B")]
+        self.run_matcher(rows)
+        expected = {"1_论文A.pdf": "A", "12_论文B.pdf": "B"}
+        self.assertEqual(paper_files(self.papers), expected)
+        # 再次运行时已带编号的文件不再加编号
+        matcher = self.run_matcher(rows)
+        self.assertEqual(paper_files(self.papers), expected)
+        self.assertEqual([r.error for r in matcher.match_results], [None, None])
+
+    def test_numbered_file_is_kept_and_duplicate_conflicts(self):
+        # 1_论文A.pdf 已经带编号，不再改名；论文A.pdf 的目标被它占用，记为冲突
+        write(os.path.join(self.papers, "论文A.pdf"), "PAPER")
+        write(os.path.join(self.papers, "1_论文A.pdf"), "OTHER_FILE")
+        matcher = self.run_matcher([(1, "论文A")])
+        self.assertEqual(paper_files(self.papers), {"论文A.pdf": "PAPER", "1_论文A.pdf": "OTHER_FILE"})
+        errors = {r.filename: r.error for r in matcher.match_results}
+        self.assertIsNone(errors["1_论文A.pdf"])
+        self.assertIn("冲突", errors["论文A.pdf"])
+
+class SyncDeleteStaleTest(unittest.TestCase):
+    """增量同步时删除多余文件（--sync --delete-stale）"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.papers = os.path.join(self.root, "论文")
+        self.output = os.path.join(self.root, "输出")
+        os.makedirs(self.papers)
+        os.makedirs(self.output)
+        self.sheet = os.path.join(self.root, "名单.csv")
+        write(os.path.join(self.papers, "论文A.pdf"), "A")
+        write(os.path.join(self.papers, "论文B.pdf"), "B")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def sync(self, rows):
+        write(self.sheet, "序号,论文题目\n" + "".join(f"{paper_id},{title}\n" for paper_id, title in rows))
+        matcher = PaperMatcher(self.sheet, self.papers, self.output, workers=1, use_cache=False,
+                               sync=SYNC_MTIME, delete_stale=True, log=lambda message: None)
+        self.assertTrue(matcher.run())
+
+    def test_unrelated_file_is_kept(self):
+        write(os.path.join(self.output, "我的笔记.docx"), "NOTES")
+        write(os.path.join(self.output, "my_notes.docx"), "NOTES")
+        self.sync([(1, "论文A"), (2, "论文B")])
+        names = set(os.listdir(self.output))
+        self.assertTrue({"我的笔记.docx", "my_notes.docx", "1_论文A.pdf", "2_论文B.pdf"} <= names)
+
+    def test_output_kept_while_source_exists(self):
+        self.sync([(1, "论文A"), (2, "论文B")])
+        self.sync([(1, "论文A")])  # 表格中删除了第 2 行，论文B.pdf 仍在论文文件夹中
+        self.assertIn("2_论文B.pdf", os.listdir(self.output))
+
+    def test_output_deleted_when_source_removed(self):
+        self.sync([(1, "论文A"), (2, "论文B")])
+        os.remove(os.path.join(self.papers, "论文A.pdf"))
+        self.sync([(1, "论文A"), (2, "论文B")])
+        names = set(os.listdir(self.output))
+        self.assertNotIn("1_论文A.pdf", names)
+        self.assertIn("2_论文B.pdf", names)
+
+class AssignTitlesTest(unittest.TestCase):
+    """一对一分配"""
+
+    def test_exact_match_is_kept(self):
+        names = ["abcdefghijklmnopqrst", "Zbcdefghijklmnopqrst"]
+        titles = ["abcdefghijklmnopqrst", "abcdefghijklmnopqxyz"]
+        assigned, _ = assign_titles(names, titles, 0.82, ["abcdefghijklmnopqrst", None])
+        self.assertEqual(assigned[0], ("abcdefghijklmnopqrst", 1.0))
+        self.assertNotEqual(assigned[1][0], "abcdefghijklmnopqrst")
+
+    def test_duplicate_exact_title_assigned_once(self):
+        assigned, _ = assign_titles(["论文A", "论文A"], ["论文A"], 0.6, ["论文A", "论文A"])
+        self.assertEqual(assigned, [("论文A", 1.0), (None, 0)])
+
+    def test_exact_match_wins_over_normalized(self):
+        assigned, _ = assign_titles(["论文a", "论文A"], ["论文A"], 0.6, ["论文A", "论文A"])
+        self.assertEqual(assigned, [(None, 0), ("论文A", 1.0)])
+
+    def test_large_component_is_still_one_to_one(self):
+        # 400 个文件互相竞争，超过 HUNGARIAN_MAX_WORK，改用贪心分配
+        rows = list(range(400))
+        edges = {row: {row // 2 + j: 0.6 + 0.02 * j for j in range(16)} for row in rows}
+        cols = sorted({tid for found in edges.values() for tid in found})
+        assigned = _assign_component(rows, cols, edges)
+        tids = [tid for tid, _ in assigned.values()]
+        self.assertEqual(len(tids), len(set(tids)))
+        self.assertTrue(all(tid in edges[row] for row, (tid, _) in assigned.items()))
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """记录每个任务序列化后的大小"""
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.sizes = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.sizes.append(len(pickle.dumps((fn, args))))
+        return super().submit(fn, *args, **kwargs)
+
+class SharedPoolMatchTest(unittest.TestCase):
+    """批量任务共用进程池时的模糊匹配"""
+
+    TITLES = [f"第{i}篇 关于{'文件' * (i % 7)}重命名的研究报告" for i in range(400)]
+    ITEMS = [(i, f"第{i * 3}篇 关于文件重命名的研究.pdf") for i in range(64)]
+
+    def match(self, **kwargs):
+        return list(MatchEngine(self.TITLES, 0.5, chunk_size=16, **kwargs).match(self.ITEMS))
+
+    def test_titles_are_not_sent_with_each_chunk(self):
+        with RecordingExecutor() as executor:
+            self.assertEqual(self.match(executor=executor), self.match())
+        titles_size = len(pickle.dumps(self.TITLES))
+        self.assertEqual(len(executor.sizes), -(-len(self.ITEMS) // 16))
+        self.assertLess(max(executor.sizes), titles_size // 10)
+
+    def test_process_pool_matches_serial_result(self):
+        with ProcessPoolExecutor(2) as executor:
+            self.assertEqual(self.match(executor=executor), self.match())
+            # 同一个进程池接着处理另一组标题
+            other = MatchEngine(self.TITLES[::-1][:200], 0.5, chunk_size=16, executor=executor)
+            self.assertEqual(list(other.match(self.ITEMS)),
+                             list(MatchEngine(self.TITLES[::-1][:200], 0.5, chunk_size=16).match(self.ITEMS)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import os
+import sys
+import shutil
+import sqlite3
+import struct
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 文件元数据 import MetadataCache, evict_least_used, read_metadata, read_metadata_many
+
+
+def tiff(order, ifd0, exif=None):
+    """生成只包含 ASCII 标签的 TIFF 结构，ifd0 和 exif 为 标签 -> 文字"""
+    def ifd(entries, offset):
+        """返回 (IFD 字节, 数据区字节)，数据区紧跟在 IFD 之后"""
+        data_offset = offset + 2 + 12 * len(entries) + 4
+        body = struct.pack(order + "H", len(entries))
+        data = b""
+        for tag, value in sorted(entries.items()):
+            if isinstance(value, int):
+                body += struct.pack(order + "HHII", tag, 4, 1, value)
+                continue
+            raw = value.encode("ascii") + b"\0"
+            body += struct.pack(order + "HHII", tag, 2, len(raw), data_offset + len(data))
+            data += raw
+        return body + b"\0" * 4, data
+
+    header = (b"II*\0" if order == "<" else b"MM\0*") + struct.pack(order + "I", 8)
+    entries = dict(ifd0)
+    if exif is None:
+        first, data = ifd(entries, 8)
+        return header + first + data
+    entries[0x8769] = 0  # 先占位，算出 IFD0 的长度后再填入 EXIF 子目录的位置
+    first, data = ifd(entries, 8)
+    entries[0x8769] = 8 + len(first) + len(data)
+    first, data = ifd(entries, 8)
+    second, second_data = ifd(exif, 8 + len(first) + len(data))
+    return header + first + data + second + second_data
+
+def jpeg(exif_tiff):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9
+    payload = b"Exif\0\0" + exif_tiff
+    app1 = b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+    return b"\xff\xd8" + app0 + app1 + b"\xff\xda\0\x08" + b"\0" * 64 + b"\xff\xd9"
+
+def wav(seconds, rate=8000, channels=1, bits=16):
+    byte_rate = rate * channels * bits // 8
+    fmt = struct.pack("<HHIIHH", 1, channels, rate, byte_rate, channels * bits // 8, bits)
+    data = b"\0" * int(byte_rate * seconds)
+    chunks = (b"fmt " + struct.pack("<I", len(fmt)) + fmt
+              + b"LIST" + struct.pack("<I", 3) + b"abc\0"  # 奇数长度的块后有一个填充字节
+              + b"data" + struct.pack("<I", len(data)) + data)
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+def flac(rate, samples):
+    info = struct.pack(">HH", 4096, 4096) + b"\0" * 6
+    info += (rate << 44 | 1 << 41 | 15 << 36 | samples).to_bytes(8, "big") + b"\0" * 16
+    return b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info
+
+MP3_FRAME = b"\xff\xfb\x90\x00"  # MPEG1 Layer III, 128 kbps, 44100 Hz, 立体声
+
+def mp3(frames=None, id3=b"", body=4096):
+    frame = MP3_FRAME + b"\0" * 32
+    if frames is not None:
+        frame += b"Xing" + struct.pack(">II", 1, frames)
+    data = frame + b"\0" * (body - len(frame))
+    if id3:
+        size = len(id3)
+        synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+        data = b"ID3\x03\0\0" + synchsafe + id3 + data
+    return data
+
+def pdf(info, trailer=b"<< /Info 1 0 R >>", xmp=b""):
+    return (b"%PDF-1.4\n1 0 obj\n" + info + b"\nendobj\n" + xmp + b"\ntrailer\n" + trailer + b"\n%%EOF\n")
+
+class MetadataTest(unittest.TestCase):
+    """只读取文件头部的元数据解析"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def read(self, name, data):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return read_metadata(path)
+
+    def local(self, *args):
+        return datetime(*args).timestamp()
+
+    def test_jpeg_exif_taken_from_sub_ifd(self):
+        data = jpeg(tiff("<", {0x0132: "2020:01:01 00:00:00"}, {0x9003: "2024:01:02 03:04:05"}))
+        self.assertEqual(self.read("a.jpg", data), {"taken": self.local(2024, 1, 2, 3, 4, 5)})
+
+    def test_jpeg_big_endian_falls_back_to_datetime(self):
+        data = jpeg(tiff(">", {0x0132: "2021:06:07 08:09:10"}))
+        self.assertEqual(self.read("a.JPEG", data), {"taken": self.local(2021, 6, 7, 8, 9, 10)})
+
+    def test_jpeg_without_exif(self):
+        self.assertEqual(self.read("a.jpg", b"\xff\xd8\xff\xda\0\x08" + b"\0" * 16), {})
+        self.assertEqual(self.read("b.jpg", jpeg(tiff("<", {0x9003: "not a date"}))), {})
+
+    def test_tiff(self):
+        self.assertEqual(self.read("a.tif", tiff("<", {0x9004: "2019:12:31 23:59:58"})),
+                         {"taken": self.local(2019, 12, 31, 23, 59, 58)})
+
+    def test_wav_duration(self):
+        self.assertEqual(self.read("a.wav", wav(2.5)), {"duration": 2.5})
+        self.assertEqual(self.read("b.wav", wav(1, rate=44100, channels=2)), {"duration": 1.0})
+
+    def test_flac_duration(self):
+        self.assertEqual(self.read("a.flac", flac(44100, 441000)), {"duration": 10.0})
+        self.assertEqual(self.read("b.flac", b"fLaC" + b"\0" * 10), {})
+
+    def test_mp3_xing_frame_count(self):
+        self.assertAlmostEqual(self.read("a.mp3", mp3(frames=1000))["duration"], 1000 * 1152 / 44100)
+        # ID3 标签之后才是第一帧
+        self.assertAlmostEqual(self.read("b.mp3", mp3(frames=100, id3=b"\0" * 300))["duration"], 100 * 1152 / 44100)
+
+    def test_mp3_constant_bitrate_estimate(self):
+        self.assertAlmostEqual(self.read("a.mp3", mp3(body=16000))["duration"], 16000 * 8 / 128000)
+
+    def test_pdf_info_dictionary(self):
+        data = pdf(b"<< /Title (Hello \\(World\\) \\101) /CreationDate (D:20240102030405+08'00') >>")
+        created = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=8))).timestamp()
+        self.assertEqual(self.read("a.pdf", data), {"title": "Hello (World) A", "created": created})
+
+    def test_pdf_utf16_hex_title_and_utc_date(self):
+        data = pdf(b"<< /Title <FEFF4E2D6587 6807 9898> /CreationDate (D:20200304050607Z) >>")
+        meta = self.read("a.pdf", data)
+        self.assertEqual(meta["title"], "中文标题")
+        self.assertEqual(meta["created"], datetime(2020, 3, 4, 5, 6, 7, tzinfo=timezone.utc).timestamp())
+
+    def test_pdf_xmp_fallback(self):
+        xmp = (b"<x:xmpmeta><dc:title><rdf:Alt><rdf:li xml:lang=\"x-default\">A &amp; B</rdf:li></rdf:Alt>"
+               b"</dc:title><xmp:CreateDate>2022-05-06T07:08:09Z</xmp:CreateDate></x:xmpmeta>")
+        meta = self.read("a.pdf", pdf(b"<< /Producer (x) >>", xmp=xmp))
+        self.assertEqual(meta["title"], "A & B")
+        self.assertEqual(meta["created"], datetime(2022, 5, 6, 7, 8, 9, tzinfo=timezone.utc).timestamp())
+
+    def test_unsupported_and_broken_files(self):
+        self.assertEqual(self.read("a.txt", b"hello"), {})
+        self.assertEqual(self.read("a.pdf", b"not a pdf"), {})
+        self.assertEqual(self.read("a.wav", b"RIFF\0\0\0\0WAVEfmt "), {})
+        self.assertEqual(self.read("a.mp3", b"\0" * 100), {})
+        self.assertEqual(read_metadata(os.path.join(self.folder, "不存在.jpg")), {})
+
+    def test_read_many_keeps_order(self):
+        paths = []
+        for i in range(5):
+            path = os.path.join(self.folder, f"{i}.wav")
+            with open(path, "wb") as f:
+                f.write(wav(i + 1))
+            paths.append(path)
+        self.assertEqual([meta["duration"] for meta in read_metadata_many(paths, workers=1)], [1, 2, 3, 4, 5])
+
+class MetadataCacheTest(unittest.TestCase):
+    """元数据缓存按 (路径, 大小, 修改时间) 命中，关闭时淘汰最久未使用的记录"""
+
+    def test_lookup_after_store(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, True)
+        path = os.path.join(folder, "缓存.sqlite3")
+        cache = MetadataCache(path)
+        cache.store([("/a.jpg", 10, 1.5, {"taken": 1.0}), ("/b.wav", 20, 2.5, {"duration": 3})])
+        cache.close()
+        cache = MetadataCache(path)
+        found = cache.lookup([("/a.jpg", 10, 1.5), ("/b.wav", 21, 2.5), ("/c.pdf", 1, 1.0)])
+        cache.close()
+        self.assertEqual(found, {"/a.jpg": {"taken": 1.0}})
+
+    def test_least_used_entries_are_evicted(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE items (key TEXT PRIMARY KEY, used INTEGER)")
+        conn.executemany("INSERT INTO items VALUES (?, ?)", [("a", 3), ("b", 1), ("c", 5), ("d", 2)])
+        evict_least_used(conn, "items", 4)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 4)
+        evict_least_used(conn, "items", 2)
+        self.assertEqual(sorted(row[0] for row in conn.execute("SELECT key FROM items")), ["a", "c"])
+        conn.close()
+
+    def test_recently_looked_up_entries_survive_close(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, True)
+        path = os.path.join(folder, "缓存.sqlite3")
+        with mock.patch("time.time", return_value=100):
+            cache = MetadataCache(path)
+            cache.store([(f"/{i}.jpg", i, 1.0, {}) for i in range(5)])
+            cache.close()
+        with mock.patch("time.time", return_value=200), mock.patch("文件元数据.CACHE_MAX_ENTRIES", 2):
+            cache = MetadataCache(path)
+            cache.lookup([("/3.jpg", 3, 1.0)])
+            cache.store([("/9.jpg", 9, 1.0, {})])
+            cache.close()
+        cache = MetadataCache(path)
+        found = cache.lookup([(f"/{i}.jpg", i, 1.0) for i in range(10)])
+        cache.close()
+        self.assertEqual(sorted(found), ["/3.jpg", "/9.jpg"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 筛选重命名 import (ROOT_LABEL, STATE_FOLDER, FolderSnapshot, build_rename_plan, compile_rename_rule,
+                   invalid_name_reason, journal_directory, scan_files, sort_files)
+from 重命名引擎 import FileRecord
+from 重命名引擎 import PLAN_ERROR, PLAN_RENAME, PLAN_UNCHANGED
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+class JournalDirectoryTest(unittest.TestCase):
+    """重命名记录、运行统计和元数据缓存的位置"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.folder = os.path.join(self.root, "照片")
+        os.makedirs(self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_next_to_folder_when_parent_is_writable(self):
+        self.assertEqual(journal_directory(self.folder, create=True), (self.root, "照片"))
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_inside_folder_when_parent_is_read_only(self):
+        inner = os.path.join(self.folder, STATE_FOLDER)
+        with mock.patch("os.access", return_value=False):
+            self.assertEqual(journal_directory(self.folder), (inner, "照片"))
+            self.assertFalse(os.path.exists(inner))
+            self.assertEqual(journal_directory(self.folder, create=True), (inner, "照片"))
+        self.assertTrue(os.path.isdir(inner))
+        # 改放到文件夹内以后一直使用这个位置，继续和撤销能找到以前的记录
+        self.assertEqual(journal_directory(self.folder), (inner, "照片"))
+        # 扫描时跳过
+        write(os.path.join(inner, "重命名记录_照片_20240101_120000.jsonl"), "")
+        write(os.path.join(self.folder, "a.jpg"), "")
+        self.assertEqual([r.relpath for r in scan_files(self.folder, ["*"], recursive=True)], ["a.jpg"])
+
+    def test_drive_root_has_a_label(self):
+        root = os.path.abspath(os.sep)
+        self.assertEqual(journal_directory(root), (os.path.join(root, STATE_FOLDER), ROOT_LABEL))
+
+class UnsafeNameTest(unittest.TestCase):
+    """不能在 Windows 上使用的新文件名在生成计划时就标记为格式错误"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def test_invalid_name_reason(self):
+        for name in ["a:b.txt", "a?.txt", 'a"b', "a<b>", "a|b", "a*b", "a\x01b", "a\\b", "a/b", "name.", "name ",
+                     "CON", "con.txt", "Com1.jpg", "LPT9 .txt", "", ".", ".."]:
+            self.assertTrue(invalid_name_reason(name), name)
+        for name in ["001_a.txt", "CONSOLE.txt", "COM10.txt", ".hidden", "a b.txt", "照片 (1).jpg"]:
+            self.assertEqual(invalid_name_reason(name), "", name)
+
+    def test_template_text_is_checked_up_front(self):
+        for template in ["{mtime:%H:%M}_{index}{suffix}", "{name}?{suffix}", "{index}|{original}"]:
+            with self.assertRaises(ValueError):
+                compile_rename_rule("自定义格式", 3, template)
+        compile_rename_rule("自定义格式", 3, "{mtime:%Y-%m-%d_%H%M}_{index}{suffix}")
+
+    def test_unsafe_names_are_plan_errors(self):
+        for name in ["con", "a", "b:c"]:
+            write(os.path.join(self.folder, name), "")
+        records = scan_files(self.folder, ["*"])
+        plan = build_rename_plan(records, "自定义格式", 3, 1, "{name}.")
+        self.assertEqual({entry.record.name: entry.status for entry in plan.entries},
+                         {"a": PLAN_ERROR, "b:c": PLAN_ERROR, "con": PLAN_ERROR})
+        # 文件名不变的文件不改名，原文件名不合规也不报错
+        plan = build_rename_plan(records, "自定义格式", 3, 1, "{name}")
+        self.assertEqual({entry.status for entry in plan.entries}, {PLAN_UNCHANGED})
+        plan = build_rename_plan(records, "序号+原文件名", 3, 1)
+        self.assertEqual([entry.status for entry in plan.entries], [PLAN_RENAME, PLAN_ERROR, PLAN_RENAME])
+
+class RenameTemplateTest(unittest.TestCase):
+    """自定义格式的模板: 变量、下标和切片、转换、格式"""
+
+    def setUp(self):
+        self.record = FileRecord(os.path.join(os.sep, "照片", "2024"), "Report2024.PDF", 2048, 0.0, "Report2024.PDF")
+
+    def render(self, template, number=7, digits=3):
+        return compile_rename_rule("自定义格式", digits, template)(self.record, number)
+
+    def test_variables(self):
+        self.assertEqual(self.render("{index}_{original}"), "007_Report2024.PDF")
+        self.assertEqual(self.render("{index}{suffix}", digits=5), "00007.pdf")
+        self.assertEqual(self.render("{name}.{ext}"), "Report2024.pdf")
+        self.assertEqual(self.render("{folder}_{sizekb}k_{size}"), "2024_2k_2048")
+
+    def test_slices_conversions_and_format_specs(self):
+        self.assertEqual(self.render("{name[:3]}{suffix}"), "Rep.pdf")
+        self.assertEqual(self.render("{original[-4:]!l}"), ".pdf")
+        self.assertEqual(self.render("{name[0]}"), "R")
+        self.assertEqual(self.render("{name!u}"), "REPORT2024")
+        self.assertEqual(self.render("{name[:6]!t}_{n:04d}"), "Report_0007")
+        self.assertEqual(self.render("{name:_>12}"), "__Report2024")
+        self.assertEqual(self.render("{mtime:%Y%m%d}"), datetime.fromtimestamp(0).strftime("%Y%m%d"))
+        self.assertEqual(self.render("{mtime}"), datetime.fromtimestamp(0).strftime("%Y%m%d"))
+
+    def test_extindex_counts_per_extension(self):
+        template = compile_rename_rule("自定义格式", 2, "{extindex}{suffix}", start_index=5)
+        names = ["a.jpg", "b.png", "c.JPG", "d.png"]
+        records = [FileRecord(os.sep, name, 0, 0.0, name) for name in names]
+        self.assertEqual([template(record, i) for i, record in enumerate(records)],
+                         ["05.jpg", "05.png", "06.jpg", "06.png"])
+
+    def test_builtin_rules(self):
+        template = compile_rename_rule("完全重命名", 4)
+        self.assertEqual(template(self.record, 12), "0012.pdf")
+        self.assertEqual(compile_rename_rule("自定义格式", 3, "")(self.record, 1), "Report2024.PDF")
+        self.assertFalse(template.needs_metadata)
+        self.assertTrue(compile_rename_rule("自定义格式", 3, "{taken}_{index}").needs_metadata)
+
+    def test_errors_are_caught_when_compiling(self):
+        for template in ["{nope}", "{name!x}", "{}", "{n:%Y}", "{name[1:2:3:4]}", "{name[a]}", "{n:{index}}",
+                         "{name", "{index]}"]:
+            with self.assertRaises(ValueError, msg=template):
+                compile_rename_rule("自定义格式", 3, template)
+
+    def test_index_past_short_name_is_a_plan_error(self):
+        # 下标超出示例文件名时编译通过，只有文件名太短的文件标为格式错误
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, True)
+        for name in ["ab.txt", "abcdefghijkl.txt"]:
+            write(os.path.join(folder, name), "")
+        plan = build_rename_plan(scan_files(folder, ["*"]), "自定义格式", 3, 1, "{name[10]}_{index}")
+        self.assertEqual([(entry.status, entry.new_name) for entry in plan.entries],
+                         [(PLAN_ERROR, ""), (PLAN_RENAME, "k_002")])
+
+class FolderSnapshotTest(unittest.TestCase):
+    """文件夹快照: 扫描、按扩展名筛选、只重新列出变化的文件夹"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        os.makedirs(os.path.join(self.folder, "子"))
+        for relpath in ["a.jpg", "b.txt", os.path.join("子", "c.jpg")]:
+            write(os.path.join(self.folder, relpath), "x")
+
+    def relpaths(self, snapshot, extensions=("*",)):
+        return [record.relpath for record in snapshot.records(list(extensions))]
+
+    def test_scan_and_filter(self):
+        snapshot = FolderSnapshot(self.folder).scan()
+        self.assertEqual(self.relpaths(snapshot), ["a.jpg", "b.txt"])
+        snapshot = FolderSnapshot(self.folder, recursive=True).scan()
+        self.assertEqual(self.relpaths(snapshot), ["a.jpg", "b.txt", os.path.join("子", "c.jpg")])
+        self.assertEqual(self.relpaths(snapshot, ["jpg"]), ["a.jpg", os.path.join("子", "c.jpg")])
+        # 返回新列表，排序不影响缓存
+        sort_files(snapshot.records(["*"]), "文件名(Z→A)")
+        self.assertEqual(self.relpaths(snapshot), ["a.jpg", "b.txt", os.path.join("子", "c.jpg")])
+
+    def test_refresh_folder_counts_changes(self):
+        snapshot = FolderSnapshot(self.folder).scan()
+        unchanged = snapshot.records(["txt"])[0]
+        write(os.path.join(self.folder, "d.txt"), "x")
+        os.remove(os.path.join(self.folder, "a.jpg"))
+        self.assertEqual(snapshot.refresh_folder(snapshot.folder_path), (1, 1, 0))
+        self.assertEqual(self.relpaths(snapshot), ["b.txt", "d.txt"])
+        # 没有变化的文件沿用原来的记录
+        self.assertIs(snapshot.records(["txt"])[0], unchanged)
+        write(os.path.join(self.folder, "b.txt"), "longer")
+        self.assertEqual(snapshot.refresh_folder(snapshot.folder_path), (0, 0, 1))
+        self.assertEqual(snapshot.records(["txt"])[0].size, 6)
+        self.assertEqual(snapshot.refresh_folder(os.path.join(self.folder, "未缓存")), (0, 0, 0))
+
+    def test_refresh_follows_subfolders(self):
+        snapshot = FolderSnapshot(self.folder, recursive=True).scan()
+        os.makedirs(os.path.join(self.folder, "新", "孙"))
+        write(os.path.join(self.folder, "新", "e.jpg"), "x")
+        write(os.path.join(self.folder, "新", "孙", "f.jpg"), "x")
+        shutil.rmtree(os.path.join(self.folder, "子"))
+        self.assertEqual(snapshot.refresh_folder(snapshot.folder_path), (2, 1, 0))
+        self.assertEqual(self.relpaths(snapshot, ["jpg"]),
+                         ["a.jpg", os.path.join("新", "e.jpg"), os.path.join("新", "孙", "f.jpg")])
+        # 子文件夹被删除后再刷新它，去掉其中的文件
+        sub = os.path.join(self.folder, "新")
+        shutil.rmtree(sub)
+        self.assertEqual(snapshot.refresh_folder(sub), (0, 2, 0))
+        self.assertEqual(self.relpaths(snapshot), ["a.jpg", "b.txt"])
+
+    def test_missing_folder_raises(self):
+        with self.assertRaises(OSError):
+            FolderSnapshot(os.path.join(self.folder, "不存在")).scan()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 重命名引擎 import (EXECUTOR_PROCESS, EXECUTOR_SERIAL, EXECUTOR_THREAD, PLAN_CONFLICT, PLAN_ERROR, PLAN_RENAME,
+                   TEMP_FILE_PREFIX, SerialExecutor, apply_rename_plan, bounded_map, chunked_map, create_executor,
+                   iter_chunks, iter_files, plan_renames, run_matchers, scan_files)
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+class FolderTest(unittest.TestCase):
+    """在临时文件夹中生成计划并执行"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def make(self, *names):
+        for name in names:
+            write(os.path.join(self.folder, name), name)
+
+    def contents(self):
+        return {name: read(os.path.join(self.folder, name)) for name in os.listdir(self.folder)}
+
+    def plan(self, renames):
+        """renames 为 原文件名 -> 新文件名，只包括其中的文件"""
+        records = [record for record in scan_files(self.folder, ["*"]) if record.name in renames]
+        return plan_renames(records, [renames[record.name] for record in records])
+
+    def statuses(self, plan):
+        return {entry.record.name: entry.status for entry in plan.entries}
+
+    def apply(self, plan, workers=1):
+        failures = {}
+        result = apply_rename_plan(plan, log=lambda message: None, workers=workers, failures=failures)
+        return result, failures
+
+class PlanRenamesTest(FolderTest):
+    """plan_renames 的冲突检查和临时文件名"""
+
+    def test_duplicate_targets_conflict(self):
+        self.make("a", "b")
+        plan = self.plan({"a": "c", "b": "c"})
+        self.assertEqual(self.statuses(plan), {"a": PLAN_CONFLICT, "b": PLAN_CONFLICT})
+        self.assertEqual(plan.pending, ())
+
+    def test_conflicts_cascade_along_chain(self):
+        # c 已存在且不改名，b 不能改为 c，于是 b 留在原处，a 也不能改为 b
+        self.make("a", "b", "c", "x")
+        plan = self.plan({"a": "b", "b": "c", "x": "y"})
+        self.assertEqual(self.statuses(plan), {"a": PLAN_CONFLICT, "b": PLAN_CONFLICT, "x": PLAN_RENAME})
+        self.assertIn("不会被移走", {entry.record.name: entry.reason for entry in plan.entries}["a"])
+        self.assertEqual(self.apply(plan)[0], (1, 2))
+        self.assertEqual(self.contents(), {"a": "a", "b": "b", "c": "c", "y": "x"})
+
+    def test_swap_goes_through_temp_names(self):
+        self.make("a", "b")
+        plan = self.plan({"a": "b", "b": "a"})
+        self.assertTrue(all(entry.temp_name.startswith(TEMP_FILE_PREFIX) for entry in plan.pending))
+        self.assertEqual(plan.temp_count, 2)
+        self.assertEqual(self.apply(plan)[0], (2, 0))
+        self.assertEqual(self.contents(), {"a": "b", "b": "a"})
+
+    def test_cycle_with_workers(self):
+        names = [f"{i}.txt" for i in range(50)]
+        self.make(*names)
+        plan = self.plan({name: names[(i + 1) % len(names)] for i, name in enumerate(names)})
+        self.assertEqual(self.apply(plan, workers=8)[0], (50, 0))
+        self.assertEqual(self.contents(), {names[(i + 1) % len(names)]: name for i, name in enumerate(names)})
+
+    def test_chain_only_temp_names_occupied_files(self):
+        self.make("a", "b")
+        plan = self.plan({"a": "b", "b": "c"})
+        self.assertEqual({entry.record.name: bool(entry.temp_name) for entry in plan.entries}, {"a": False, "b": True})
+        self.apply(plan)
+        self.assertEqual(self.contents(), {"b": "a", "c": "b"})
+
+    def test_initial_errors_are_kept(self):
+        self.make("a", "b")
+        records = scan_files(self.folder, ["*"])
+        plan = plan_renames(records, ["", "c"], [PLAN_ERROR, PLAN_RENAME], ["文件名无效", ""])
+        self.assertEqual(self.statuses(plan), {"a": PLAN_ERROR, "b": PLAN_RENAME})
+        _, failures = self.apply(plan)
+        self.assertEqual(failures, {"a": f"{PLAN_ERROR}: 文件名无效"})
+
+    def test_case_only_rename(self):
+        self.make("a.txt")
+        plan = self.plan({"a.txt": "A.txt"})
+        self.assertEqual(self.statuses(plan), {"a.txt": PLAN_RENAME})
+        self.assertEqual(self.apply(plan)[0], (1, 0))
+        self.assertEqual(self.contents(), {"A.txt": "a.txt"})
+
+    def test_case_only_rename_on_case_insensitive_system(self):
+        # 模拟 Windows: 只改大小写不是冲突，也不需要临时文件名；改为另一个文件的不同大小写是冲突
+        self.make("a.txt", "b.txt")
+        with mock.patch("os.path.normcase", str.lower):
+            plan = self.plan({"a.txt": "A.txt", "b.txt": "A.TXT"})
+            self.assertEqual(self.statuses(plan), {"a.txt": PLAN_CONFLICT, "b.txt": PLAN_CONFLICT})
+            plan = self.plan({"b.txt": "A.txt"})
+            self.assertEqual(self.statuses(plan), {"b.txt": PLAN_CONFLICT})
+            plan = self.plan({"a.txt": "A.txt"})
+            self.assertEqual(self.statuses(plan), {"a.txt": PLAN_RENAME})
+            self.assertEqual(plan.temp_count, 0)
+
+    def test_folder_changed_after_plan(self):
+        self.make("a", "b")
+        plan = self.plan({"a": "c", "b": "d"})
+        self.make("c")
+        (success, errors), failures = self.apply(plan)
+        self.assertEqual((success, errors), (0, 2))
+        self.assertEqual(set(failures), {"a", "b"})
+        self.assertEqual(self.contents(), {"a": "a", "b": "b", "c": "c"})
+
+    def test_cancel_finishes_temp_names(self):
+        self.make("a", "b", "c", "d")
+        plan = self.plan({"a": "b", "b": "a", "c": "e", "d": "f"})
+        cancel = threading.Event()
+        cancel.set()
+        failures = {}
+        success, errors = apply_rename_plan(plan, log=lambda message: None, cancel=cancel, failures=failures)
+        # 已经改为临时文件名的文件总是完成，不会留下临时文件
+        self.assertEqual((success, errors), (2, 0))
+        self.assertEqual(self.contents(), {"a": "b", "b": "a", "c": "c", "d": "d"})
+        self.assertEqual(failures, {"c": "已取消", "d": "已取消"})
+
+class ScanTest(FolderTest):
+    """iter_files 和 scan_files"""
+
+    def test_recursive_scan_skips_hidden_and_filters_extensions(self):
+        os.makedirs(os.path.join(self.folder, "子", "孙"))
+        os.makedirs(os.path.join(self.folder, ".隐藏"))
+        for relpath in ["a.txt", "b.JPG", ".DS_Store", os.path.join("子", "c.txt"), os.path.join("子", "孙", "d.txt"),
+                        os.path.join(".隐藏", "e.txt")]:
+            write(os.path.join(self.folder, relpath), "")
+        self.assertEqual([r.relpath for r in scan_files(self.folder, ["*"])], ["a.txt", "b.JPG"])
+        self.assertEqual([r.relpath for r in scan_files(self.folder, [".txt"], recursive=True)],
+                         ["a.txt", os.path.join("子", "c.txt"), os.path.join("子", "孙", "d.txt")])
+        self.assertEqual([r.name for r in scan_files(self.folder, [".jpg"])], ["b.JPG"])
+
+    def test_records_carry_stat(self):
+        write(os.path.join(self.folder, "a.txt"), "12345")
+        os.utime(os.path.join(self.folder, "a.txt"), (1000000000, 1000000000))
+        record, = iter_files(self.folder)
+        self.assertEqual((record.size, record.mtime, record.path), (5, 1000000000, os.path.join(self.folder, "a.txt")))
+
+    def test_missing_folder_raises(self):
+        with self.assertRaises(OSError):
+            scan_files(os.path.join(self.folder, "不存在"), ["*"])
+
+def _square(x):
+    return x * x
+
+class ExecutorTest(unittest.TestCase):
+    """create_executor、bounded_map 和 chunked_map"""
+
+    def test_create_executor_selection(self):
+        self.assertIsInstance(create_executor(EXECUTOR_SERIAL, 8), SerialExecutor)
+        self.assertIsInstance(create_executor(EXECUTOR_THREAD, 1), SerialExecutor)
+        self.assertIsInstance(create_executor(EXECUTOR_PROCESS, 0), SerialExecutor)
+        with create_executor(EXECUTOR_THREAD, 2) as executor:
+            self.assertIsInstance(executor, ThreadPoolExecutor)
+        with create_executor(EXECUTOR_PROCESS, 2) as executor:
+            self.assertIsInstance(executor, ProcessPoolExecutor)
+            self.assertEqual(list(bounded_map(executor, _square, range(5))), [0, 1, 4, 9, 16])
+        with self.assertRaises(ValueError):
+            create_executor("gpu", 2)
+
+    def test_serial_executor_reports_exceptions_through_future(self):
+        future = SerialExecutor().submit(int, "x")
+        with self.assertRaises(ValueError):
+            future.result()
+
+    def test_bounded_map_keeps_input_order(self):
+        def slow(x):
+            time.sleep(0.001 * (x % 5))
+            return x
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(bounded_map(executor, slow, range(200))), list(range(200)))
+
+    def test_bounded_map_caps_tasks_in_flight(self):
+        pulled = 0
+
+        def items():
+            nonlocal pulled
+            for i in range(1000):
+                pulled += 1
+                yield i
+        received = 0
+        most = 0
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in bounded_map(executor, _square, items(), window=8):
+                received += 1
+                most = max(most, pulled - received)
+        self.assertEqual(received, 1000)
+        self.assertLessEqual(most, 8)
+
+    def test_bounded_map_early_stop_cancels_pending(self):
+        calls = []
+        gate = threading.Event()
+
+        def work(x):
+            gate.wait()
+            calls.append(x)
+            return x
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            results = bounded_map(executor, work, range(100), window=4)
+            gate.set()
+            self.assertEqual(next(results), 0)
+            results.close()
+        self.assertLessEqual(len(calls), 5)
+
+    def test_bounded_map_serial_is_lazy(self):
+        pulled = []
+        results = bounded_map(None, _square, (pulled.append(i) or i for i in range(10)))
+        self.assertEqual(next(results), 0)
+        self.assertEqual(pulled, [0])
+
+    def test_chunked_map_and_iter_chunks(self):
+        self.assertEqual(list(iter_chunks(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            self.assertEqual(list(chunked_map(executor, _square, range(50), 7)), [x * x for x in range(50)])
+
+class RunMatchersTest(unittest.TestCase):
+    """run_matchers 把前一级没有匹配的项交给下一级"""
+
+    def test_unmatched_items_flow_to_next_stage(self):
+        seen = []
+
+        def matcher(divisor):
+            def match(items):
+                seen.append([i for i, _ in items])
+                return [(i, name) for i, name in items if i % divisor]
+            return match
+        left = run_matchers(list(enumerate("abcdefg")), [("a", matcher(2)), ("b", matcher(3))])
+        self.assertEqual(seen, [[0, 1, 2, 3, 4, 5, 6], [1, 3, 5]])
+        self.assertEqual(left, [(1, "b"), (5, "f")])
+
+if __name__ == "__main__":
+    unittest.main()
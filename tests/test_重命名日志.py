@@ -0,0 +1,160 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 重命名引擎 import (TEMP_FILE_PREFIX, apply_rename_plan, plan_renames, resume_journal, resume_plan, scan_files,
+                   undo_journal)
+from 重命名日志 import JournalState, RenameJournal, latest_journal, new_journal_path
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+class Crash(Exception):
+    """模拟程序在改名过程中退出"""
+
+class JournalTest(unittest.TestCase):
+    """重命名记录: 中断后继续、丢失的完成记录和撤销"""
+
+    # a→b、b→c 是一条链，x↔y 互换，b、c、x、y 都要先改为临时文件名
+    RENAMES = {"a": "b", "b": "c", "c": "d", "x": "y", "y": "x", "p": "q"}
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.folder = os.path.join(self.root, "文件")
+        self.journals = os.path.join(self.root, "记录")
+        os.makedirs(self.folder)
+        os.makedirs(self.journals)
+        for name in self.RENAMES:
+            write(os.path.join(self.folder, name), name.upper())
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def contents(self):
+        return {name: read(os.path.join(self.folder, name)) for name in os.listdir(self.folder)}
+
+    def expected(self):
+        return {new: old.upper() for old, new in self.RENAMES.items()}
+
+    def original(self):
+        return {name: name.upper() for name in self.RENAMES}
+
+    def run_plan(self, progress=None):
+        records = scan_files(self.folder, ["*"])
+        plan = plan_renames(records, [self.RENAMES[record.name] for record in records])
+        journal = RenameJournal(new_journal_path(self.journals, "文件"), "测试", "文件", self.folder)
+        apply_rename_plan(plan, log=lambda message: None, progress=progress, journal=journal)
+        return plan, journal.path
+
+    def crash_after(self, count):
+        def progress(done):
+            if done >= count:
+                raise Crash
+        return progress
+
+    def rewrite(self, path, keep):
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f if keep(line)]
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def test_resume_after_torn_last_line(self):
+        with self.assertRaises(Crash):
+            self.run_plan(self.crash_after(3))
+        path = latest_journal(self.journals, "文件", unfinished=True).path
+        # 最后一行只写了一半
+        with open(path, "rb+") as f:
+            f.truncate(os.path.getsize(path) - 3)
+        state = latest_journal(self.journals, "文件", unfinished=True)
+        self.assertIsNotNone(state)
+        self.assertFalse(state.finished)
+        success, errors = resume_journal(state, log=lambda message: None)
+        self.assertEqual(errors, 0)
+        self.assertEqual(self.contents(), self.expected())
+        # 继续完成后记录已结束，不再需要继续
+        self.assertIsNone(latest_journal(self.journals, "文件", unfinished=True))
+        # 继续时追加的记录另起一行，没有和写了一半的行连在一起
+        state = JournalState(path)
+        self.assertTrue(state.finished)
+        self.assertEqual(len(state.done), len(state.entries) - 1)  # 只缺写了一半的那一条
+
+    def test_lost_done_records_are_located(self):
+        _, path = self.run_plan()
+        self.assertEqual(self.contents(), self.expected())
+        # 最后一组完成记录和结束标记没有写入磁盘
+        self.rewrite(path, lambda line: '"done"' not in line and '"end"' not in line)
+        state = latest_journal(self.journals, "文件", unfinished=True)
+        self.assertEqual(state.done, set())
+        for entry_id, (_, src, dst, temp) in state.entries.items():
+            self.assertEqual(state.locate(entry_id), dst, src)
+        self.assertEqual(len(resume_plan(state)), 0)
+
+    def test_locate_chain_stopped_at_temp_name(self):
+        with self.assertRaises(Crash):
+            self.run_plan(self.crash_after(1))
+        state = latest_journal(self.journals, "文件", unfinished=True)
+        names = {state.locate(entry_id) for entry_id in state.entries}
+        self.assertTrue(any(name.startswith(TEMP_FILE_PREFIX) for name in names))
+        self.assertEqual(names, set(os.listdir(self.folder)))
+        resume_journal(state, log=lambda message: None)
+        self.assertEqual(self.contents(), self.expected())
+
+    def test_undo_twice_redoes(self):
+        self.run_plan()
+        self.assertIsNone(latest_journal(self.journals, "文件", unfinished=True))
+        success, errors = undo_journal(latest_journal(self.journals, "文件"), log=lambda message: None)
+        self.assertEqual((success, errors), (len(self.RENAMES), 0))
+        self.assertEqual(self.contents(), self.original())
+        # 撤销本身也有记录，再次撤销即恢复
+        undo_journal(latest_journal(self.journals, "文件"), log=lambda message: None)
+        self.assertEqual(self.contents(), self.expected())
+
+    def test_undo_interrupted_rename(self):
+        with self.assertRaises(Crash):
+            self.run_plan(self.crash_after(2))
+        success, errors = undo_journal(latest_journal(self.journals, "文件"), log=lambda message: None)
+        self.assertEqual(errors, 0)
+        self.assertEqual(self.contents(), self.original())
+
+    def test_unwritable_journal_renames_nothing(self):
+        records = scan_files(self.folder, ["*"])
+        plan = plan_renames(records, [self.RENAMES[record.name] for record in records])
+        journal = RenameJournal(os.path.join(self.root, "不存在", "记录.jsonl"), "测试", "文件", self.folder)
+        failures = {}
+        success, errors = apply_rename_plan(plan, log=lambda message: None, journal=journal, failures=failures)
+        self.assertEqual((success, errors), (0, len(self.RENAMES)))
+        self.assertEqual(set(failures), set(self.RENAMES))
+        self.assertEqual(self.contents(), self.original())
+
+class GroupCommitTest(unittest.TestCase):
+    """完成记录按组写入磁盘"""
+
+    def test_marks_are_committed_in_groups(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        journal = RenameJournal(os.path.join(root, "记录.jsonl"), "测试", "文件", root)
+        journal.add_entries((i, root, f"{i}", f"{i}.new", "") for i in range(1000))
+        self.assertEqual(journal.commits, 1)
+        # 时间间隔很长时只按数量提交
+        journal.last_commit += 3600
+        for i in range(1000):
+            journal.mark("done", i)
+        self.assertLessEqual(journal.commits, 1 + 1000 // 256)
+        journal.finish()
+        journal.close()
+        state = JournalState(journal.path)
+        self.assertTrue(state.finished)
+        self.assertEqual(state.done, set(range(1000)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,339 +1,1759 @@
 import os
+import re
+import sys
+import csv
+import errno
+import math
+import time
+import codecs
+import json
+import sqlite3
+import hashlib
+import heapq
+import zlib
 import shutil
-import pandas as pd
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from openpyxl import load_workbook
+import queue
 import threading
+import tempfile
+import multiprocessing
+from functools import partial
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import difflib
-from collections import defaultdict
+import unicodedata
+from collections import defaultdict, Counter, namedtuple
 
-class PaperRenamerApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("论文文件重命名工具")
-        self.root.geometry("800x600")
-        
-        # 变量初始化
-        self.excel_path = tk.StringVar()
-        self.folder_path = tk.StringVar()
-        self.output_path = tk.StringVar()
-        self.unmatched_files = []  # 存储未匹配的文件列表
-        self.similarity_threshold = 0.6  # 默认相似度阈值
-        
-        self.setup_ui()
-        
-    def setup_ui(self):
-        # 创建主框架
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Excel文件选择部分
-        ttk.Label(main_frame, text="Excel文件路径:").grid(row=0, column=0, sticky=tk.W, pady=5)
-        ttk.Entry(main_frame, textvariable=self.excel_path, width=60).grid(row=0, column=1, padx=5)
-        ttk.Button(main_frame, text="浏览", command=self.select_excel).grid(row=0, column=2, padx=5)
-        
-        # 源文件夹选择部分
-        ttk.Label(main_frame, text="论文文件夹路径:").grid(row=1, column=0, sticky=tk.W, pady=5)
-        ttk.Entry(main_frame, textvariable=self.folder_path, width=60).grid(row=1, column=1, padx=5)
-        ttk.Button(main_frame, text="浏览", command=self.select_folder).grid(row=1, column=2, padx=5)
-        
-        # 输出文件夹选择部分
-        ttk.Label(main_frame, text="输出文件夹路径:").grid(row=2, column=0, sticky=tk.W, pady=5)
-        ttk.Entry(main_frame, textvariable=self.output_path, width=60).grid(row=2, column=1, padx=5)
-        ttk.Button(main_frame, text="浏览", command=self.select_output_folder).grid(row=2, column=2, padx=5)
-        
-        # 表格列设置
-        ttk.Label(main_frame, text="序号列名:").grid(row=3, column=0, sticky=tk.W, pady=5)
-        self.id_column = ttk.Entry(main_frame, width=20)
-        self.id_column.grid(row=3, column=1, sticky=tk.W, padx=5)
-        self.id_column.insert(0, "序号")  # 默认值
-        
-        ttk.Label(main_frame, text="论文题目列名:").grid(row=4, column=0, sticky=tk.W, pady=5)
-        self.title_column = ttk.Entry(main_frame, width=20)
-        self.title_column.grid(row=4, column=1, sticky=tk.W, padx=5)
-        self.title_column.insert(0, "论文题目")  # 默认值
-        
-        # 相似度阈值设置
-        ttk.Label(main_frame, text="相似度阈值 (0.1-1.0):").grid(row=5, column=0, sticky=tk.W, pady=5)
-        self.similarity_entry = ttk.Entry(main_frame, width=10)
-        self.similarity_entry.grid(row=5, column=1, sticky=tk.W, padx=5)
-        self.similarity_entry.insert(0, "0.6")  # 默认值
-        
-        # 执行按钮
-        ttk.Button(main_frame, text="开始处理", command=self.start_processing).grid(row=6, column=1, pady=20)
-        
-        # 进度条
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
-        
-        # 日志文本框
-        ttk.Label(main_frame, text="处理日志:").grid(row=8, column=0, sticky=tk.W, pady=5)
-        
-        # 添加滚动条
-        log_frame = ttk.Frame(main_frame)
-        log_frame.grid(row=9, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
-        
-        self.log_text = tk.Text(log_frame, height=20, width=90)
-        scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
-        self.log_text.configure(yscrollcommand=scrollbar.set)
-        
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        
-        # 配置网格权重
-        main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(9, weight=1)
-        log_frame.columnconfigure(0, weight=1)
-        log_frame.rowconfigure(0, weight=1)
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
-        
-    def select_excel(self):
-        file_path = filedialog.askopenfilename(
-            title="选择Excel文件",
-            filetypes=[("Excel文件", "*.xlsx *.xls"), ("所有文件", "*.*")]
-        )
-        if file_path:
-            self.excel_path.set(file_path)
-            
-    def select_folder(self):
-        folder_path = filedialog.askdirectory(title="选择论文文件夹")
-        if folder_path:
-            self.folder_path.set(folder_path)
-            
-    def select_output_folder(self):
-        folder_path = filedialog.askdirectory(title="选择输出文件夹")
-        if folder_path:
-            self.output_path.set(folder_path)
-            
-    def log_message(self, message):
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+from 运行统计 import RunStats, SLOWEST_COUNT
+from 重命名日志 import JOURNAL_PREFIX, RenameJournal, new_journal_path, latest_journal
+from 文件元数据 import (CONTENT_TYPES, CONTENT_POOL_MIN, evict_least_used, file_fingerprint, map_files,
+                   read_first_lines)
+from 重命名引擎 import (EXECUTOR_PROCESS, FileRecord, create_executor, bounded_map, iter_chunks, iter_files,
+                   run_matchers, plan_renames, apply_rename_plan, resume_journal, undo_journal)
+
+# 匹配层级
+TIER_EXACT = "精确匹配"
+TIER_NORMALIZED = "规范化匹配"
+TIER_FUZZY = "模糊匹配"
+TIER_CONTENT = "内容匹配"  # 文件名无法匹配时，按 PDF/DOCX 开头的标题和文字匹配
+TIER_NONE = "未匹配"
+
+# 单个文件的匹配结果: 文件名、匹配到的论文标题、相似度、匹配层级、输出错误
+MatchResult = namedtuple("MatchResult", ["filename", "title", "score", "tier", "error"])
+
+# 规范化时默认去掉的文件名后缀（正则表达式，不区分大小写，可带括号和分隔符；英文后缀前须有分隔符或括号）
+DEFAULT_STRIP_SUFFIXES = ["终稿", "定稿", "最终版", "修改版", "修订版", "副本", "final", "draft", "copy",
+                          r"v\d+", r"\(\d+\)"]
+
+_NON_WORD = re.compile(r"[\W_]+")  # 标点、空白和符号
+
+class TitleNormalizer:
+    """把标题和文件名转换为规范化的键，用于精确匹配之后的查表匹配
+
+    依次进行 NFKC（全角转半角等）、大小写折叠、去掉结尾的后缀（如 "(终稿)"，
+    可重复去掉多个），最后删除标点、空白和符号。后缀规则无效时抛出 ValueError。
+    """
+
+    def __init__(self, suffixes=DEFAULT_STRIP_SUFFIXES):
+        self.suffixes = [s for s in suffixes if s]
+        self.suffix_re = None
+        if self.suffixes:
+            # 以英文字母或数字开头的后缀（如 copy、v\d+）前面必须不是字母或数字，
+            # 否则会从 Microscopy、IPv6 这样的单词中间截掉；中文后缀前不需要分隔符
+            alternatives = [f"(?<![a-z0-9])(?:{s})" if re.match(r"[A-Za-z0-9]", s) else f"(?:{s})"
+                            for s in self.suffixes]
+            try:
+                self.suffix_re = re.compile(r"[\s_\-.~·]*[(\[【]?\s*(?:%s)\s*[)\]】]?$"
+                                            % "|".join(alternatives), re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"后缀规则无效: {str(e)}")
+
+    def normalize(self, text):
+        text = unicodedata.normalize("NFKC", text).casefold()
+        if self.suffix_re:
+            while True:
+                stripped = self.suffix_re.sub("", text)
+                # 整个名称都是后缀时保留原样
+                if stripped == text or not _NON_WORD.sub("", stripped):
+                    break
+                text = stripped
+        return _NON_WORD.sub("", text)
+
+    def key_map(self, titles):
+        """返回 (规范化键 -> 标题, 重复的键数)，多个标题规范化后相同时该键不参与匹配"""
+        keys = {}
+        ambiguous = set()
+        for title in titles:
+            key = self.normalize(title)
+            if not key or key in ambiguous:
+                continue
+            if key in keys and keys[key] != title:
+                del keys[key]
+                ambiguous.add(key)
+            else:
+                keys[key] = title
+        return keys, len(ambiguous)
+
+class TitleIndex:
+    """论文标题的字符倒排索引，用于在模糊匹配前剪枝候选标题
+
+    索引以 (字符, 第k次出现) 为键，对中英文标题同样适用。查询时先用前缀过滤
+    找出可能达到阈值的候选，再按字符交集给出的相似度上界从高到低逐个用
+    SequenceMatcher 打分，上界低于当前最佳分数时即停止。由于字符交集是
+    SequenceMatcher 匹配字符数的严格上界，结果与逐个比较全部标题完全一致。
+    """
+
+    def __init__(self, titles):
+        self.titles = []
+        self.lowered = []
+        self.counters = []
+        seen = set()
+        for title in titles:
+            # 重复标题只保留第一次出现的位置，与顺序扫描时的取舍一致
+            if title in seen:
+                continue
+            seen.add(title)
+            lowered = title.lower()
+            self.titles.append(title)
+            self.lowered.append(lowered)
+            self.counters.append(Counter(lowered))
+
+        # 倒排表: (字符, 第k次出现) -> 含有该字符至少k+1次的标题编号
+        self.postings = defaultdict(list)
+        for tid, counter in enumerate(self.counters):
+            for ch, cnt in counter.items():
+                for k in range(cnt):
+                    self.postings[(ch, k)].append(tid)
+
+        self.compared = 0  # 实际执行 SequenceMatcher 的次数
+        self.pruned = 0    # 被索引跳过的比较次数
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _bounded_candidates(self, query, threshold):
+        """返回可能达到阈值的候选 [(-相似度上界, 标题编号)]，按上界从高到低排序"""
+        query_len = len(query)
+        query_counter = Counter(query)
+
+        # 只有出现在某个标题中的字符才可能贡献匹配
+        tokens = [(ch, k) for ch, cnt in query_counter.items() for k in range(cnt)
+                  if (ch, k) in self.postings]
+
+        # 相似度 2M/(la+lb) >= t 且 lb >= M，可推出匹配字符数 M >= t*la/(2-t)
+        min_overlap = max(1, math.ceil(threshold * query_len / (2 - threshold) - 1e-9))
+        if query_len == 0 or len(tokens) < min_overlap:
+            return []
+
+        # 前缀过滤: 按出现频率从低到高排序，达到阈值的标题必然包含前缀中的某个字符
+        tokens.sort(key=lambda token: (len(self.postings[token]), token))
+        candidates = set()
+        for token in tokens[:len(tokens) - min_overlap + 1]:
+            candidates.update(self.postings[token])
+
+        # 计算每个候选的相似度上界，低于阈值的直接跳过
+        bounded = []
+        for tid in candidates:
+            title_counter = self.counters[tid]
+            overlap = sum(min(cnt, title_counter[ch]) for ch, cnt in query_counter.items()
+                          if ch in title_counter)
+            upper = 2.0 * overlap / (query_len + len(self.lowered[tid]))
+            if upper >= threshold:
+                bounded.append((-upper, tid))
+        bounded.sort()
+        return bounded
+
+    def find_best_match(self, filename, threshold):
+        """返回 (最佳标题, 相似度)，没有达到阈值的标题时返回 (None, 0)"""
+        query = filename.lower()
+        bounded = self._bounded_candidates(query, threshold)
+
+        best_tid = None
+        best_score = 0
+        compared = 0
+        for neg_upper, tid in bounded:
+            upper = -neg_upper
+            if upper < best_score:
+                break
+            if upper == best_score and tid > best_tid:
+                continue
+            compared += 1
+            score = difflib.SequenceMatcher(None, query, self.lowered[tid]).ratio()
+            # 分数相同时取表格中靠前的标题，与顺序扫描结果保持一致
+            if score >= threshold and (score > best_score or (score == best_score and tid < best_tid)):
+                best_score = score
+                best_tid = tid
+
+        self.compared += compared
+        self.pruned += len(self.titles) - compared
+        if best_tid is None:
+            return None, 0
+        return self.titles[best_tid], best_score
+
+    def top_matches(self, filename, threshold, k):
+        """返回相似度最高的至多 k 个 (标题编号, 相似度)，均不低于阈值"""
+        query = filename.lower()
+        top = []  # 小顶堆: (相似度, -标题编号)
+        compared = 0
+        for neg_upper, tid in self._bounded_candidates(query, threshold):
+            if len(top) == k and -neg_upper < top[0][0]:
+                break
+            compared += 1
+            score = difflib.SequenceMatcher(None, query, self.lowered[tid]).ratio()
+            if score >= threshold:
+                heapq.heappush(top, (score, -tid))
+                if len(top) > k:
+                    heapq.heappop(top)
+        self.compared += compared
+        self.pruned += len(self.titles) - compared
+        return [(-neg_tid, score) for score, neg_tid in sorted(top, reverse=True)]
+
+def _cell_text(value):
+    """把单元格的值转换为去除首尾空白的字符串，空单元格返回空字符串"""
+    if value is None or value != value:  # None 或 NaN
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def _column_positions(header, id_col, title_col):
+    header = [_cell_text(h) for h in header]
+    if id_col not in header or title_col not in header:
+        raise ValueError(f"Excel文件中未找到列 '{id_col}' 或 '{title_col}'")
+    return header.index(id_col), header.index(title_col)
+
+def _detect_text_encoding(path):
+    """根据文件开头判断CSV编码，兼容Excel导出的GBK文件"""
+    with open(path, "rb") as f:
+        sample = f.read(1 << 20)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gbk"
+
+def _iter_xlsx_rows(path, id_col, title_col):
+    from openpyxl import load_workbook
+    # 只读模式按行流式解析，不会把整个工作簿载入内存
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = wb.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        id_pos, title_pos = _column_positions(header, id_col, title_col)
+        # 只解析序号列和题目列之间的单元格
+        first = min(id_pos, title_pos)
+        id_pos -= first
+        title_pos -= first
+        for row in sheet.iter_rows(min_row=2, min_col=first + 1,
+                                   max_col=first + max(id_pos, title_pos) + 1, values_only=True):
+            yield row[id_pos], row[title_pos]
+    finally:
+        wb.close()
+
+def _iter_csv_rows(path, id_col, title_col, delimiter):
+    with open(path, newline="", encoding=_detect_text_encoding(path)) as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        id_pos, title_pos = _column_positions(next(reader, []), id_col, title_col)
+        last = max(id_pos, title_pos)
+        for row in reader:
+            if len(row) > last:
+                yield row[id_pos], row[title_pos]
+
+def _iter_xls_rows(path, id_col, title_col):
+    # 旧版 .xls 格式 openpyxl 无法读取，只有这种情况才需要 pandas
+    import pandas as pd
+    df = pd.read_excel(path, dtype=object)
+    id_pos, title_pos = _column_positions(df.columns, id_col, title_col)
+    yield from df.iloc[:, [id_pos, title_pos]].itertuples(index=False, name=None)
+
+def read_paper_table(path, id_col, title_col):
+    """流式读取表格中的序号列和论文题目列，支持 xlsx/xls/csv/tsv
+
+    返回 (paper_map, paper_titles, 读取行数)，找不到指定列时抛出 ValueError
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        rows = _iter_csv_rows(path, id_col, title_col, ",")
+    elif ext == ".tsv":
+        rows = _iter_csv_rows(path, id_col, title_col, "\t")
+    elif ext == ".xls":
+        rows = _iter_xls_rows(path, id_col, title_col)
+    else:
+        rows = _iter_xlsx_rows(path, id_col, title_col)
         
-    def start_processing(self):
-        if not self.excel_path.get() or not self.folder_path.get() or not self.output_path.get():
-            messagebox.showerror("错误", "请先选择Excel文件、论文文件夹和输出文件夹")
+    paper_map = {}
+    paper_titles = []  # 存储所有论文标题用于模糊匹配
+    row_count = 0
+    for paper_id, paper_title in rows:
+        row_count += 1
+        paper_id = _cell_text(paper_id)
+        paper_title = _cell_text(paper_title)
+        if paper_id and paper_title:
+            paper_map[paper_title] = paper_id
+            paper_titles.append(paper_title)
+    return paper_map, paper_titles, row_count
+
+# 输出方式
+MODE_COPY = "复制"
+MODE_HARDLINK = "硬链接"
+MODE_REFLINK = "写时复制(reflink)"
+MODE_RENAME = "原地重命名"
+OUTPUT_MODES = [MODE_COPY, MODE_HARDLINK, MODE_REFLINK, MODE_RENAME]
+
+_FICLONE = 0x40049409  # Linux ioctl: 在 Btrfs/XFS 等文件系统上共享数据块
+
+def _reflink(src, dst):
+    """创建写时复制克隆，文件系统不支持时抛出 OSError"""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        # APFS 的 clonefile 会同时保留文件元数据
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+    else:
+        raise OSError(errno.EOPNOTSUPP, "当前系统不支持写时复制", dst)
+
+class FileTransfer:
+    """按选定的输出方式生成目标文件，不可用时自动回退为复制
+
+    硬链接和写时复制第一次失败后（跨文件系统、文件系统不支持等）即视为不可用，
+    之后的文件直接复制，不再重复尝试。原地重命名不经过这里，由重命名引擎执行。
+    """
+
+    def __init__(self, mode=MODE_COPY):
+        self.mode = mode
+        self.available = True
+        self.fallback_reason = None
+        self.counts = Counter()  # 实际使用的输出方式 -> 文件数
+        self.lock = threading.Lock()
+
+    def transfer(self, src, dst):
+        """把 src 输出为 dst，返回实际使用的输出方式，可在多个线程中同时调用"""
+        used = self._transfer(src, dst)
+        with self.lock:
+            self.counts[used] += 1
+        return used
+
+    def _transfer(self, src, dst):
+        if self.mode in (MODE_HARDLINK, MODE_REFLINK) and self.available:
+            try:
+                if self.mode == MODE_HARDLINK:
+                    if os.path.lexists(dst):
+                        os.remove(dst)
+                    os.link(src, dst)
+                else:
+                    _reflink(src, dst)
+                return self.mode
+            except OSError as e:
+                self.available = False
+                self.fallback_reason = str(e)
+        shutil.copy2(src, dst)
+        return MODE_COPY
+
+    def summary(self):
+        """返回实际使用的输出方式统计，如: 硬链接 120 个, 复制 3 个"""
+        return ", ".join(f"{mode} {count} 个" for mode, count in self.counts.most_common())
+
+# 增量同步时判断目标文件是否需要更新的方式
+SYNC_MTIME = "大小和修改时间"
+SYNC_HASH = "大小和内容"
+SYNC_MTIME_WINDOW = 1.0  # 比较修改时间时允许的误差（秒），兼容时间精度较低的文件系统
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+def is_up_to_date(src, dst, compare=SYNC_MTIME):
+    """目标文件已存在且与源文件相同时返回 True，按 compare 指定的方式比较"""
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src)
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if os.path.samestat(src_stat, dst_stat):  # 硬链接
+        return True
+    if compare == SYNC_HASH:
+        return _file_digest(src) == _file_digest(dst)
+    return abs(src_stat.st_mtime - dst_stat.st_mtime) <= SYNC_MTIME_WINDOW
+
+class CopyPipeline:
+    """输出文件的并发流水线
+
+    匹配阶段把输出任务放入有界队列（队列满时匹配线程等待），由固定数量的
+    线程取出执行。进度按已处理的文件数和字节数统计，未匹配的文件在确定
+    未匹配时即计为已完成；输出失败按文件名收集，运行结束后统一报告。
+    传入 stats 时记录每个文件的输出用时；传入 compare 时为增量同步，目标文件
+    已是最新的不再输出，计入跳过的文件数和字节数。
+    """
+
+    def __init__(self, transfer, workers=4, queue_size=256, stats=None, compare=None):
+        self.transfer = transfer
+        self.stats = stats
+        self.compare = compare
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.failures = {}  # 文件名 -> 错误信息
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.files_copied = 0
+        self.bytes_copied = 0
+        self.files_skipped = 0
+        self.bytes_skipped = 0
+        self.start_time = time.perf_counter()
+        self.closed = False
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def set_total(self, files, total_bytes):
+        self.files_total = files
+        self.bytes_total = total_bytes
+
+    def submit(self, filename, src, dst, size):
+        self.jobs.put((filename, src, dst, size))
+
+    def skip(self, size):
+        """未匹配的文件不需要输出，直接计入进度"""
+        with self.lock:
+            self.files_done += 1
+            self.bytes_done += size
+
+    def close(self):
+        """等待队列中的任务全部完成并结束工作线程，可重复调用"""
+        if self.closed:
             return
-            
-        # 获取相似度阈值
-        try:
-            threshold = float(self.similarity_entry.get().strip())
-            if threshold < 0.1 or threshold > 1.0:
-                messagebox.showerror("错误", "相似度阈值必须在0.1到1.0之间")
+        self.closed = True
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def fraction(self):
+        """已完成的比例，按字节数计算，全部为空文件时按文件数计算"""
+        if self.bytes_total:
+            return self.bytes_done / self.bytes_total
+        if self.files_total:
+            return self.files_done / self.files_total
+        return 0.0
+
+    def throughput(self):
+        """返回 (MB/s, 文件/s)"""
+        elapsed = max(time.perf_counter() - self.start_time, 1e-6)
+        return self.bytes_copied / elapsed / (1024 * 1024), self.files_copied / elapsed
+
+    def _worker(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
                 return
-            self.similarity_threshold = threshold
-        except ValueError:
-            messagebox.showerror("错误", "请输入有效的相似度阈值（0.1-1.0）")
+            filename, src, dst, size = job
+            start = time.perf_counter()
+            skipped = copied = False
+            try:
+                if self.compare and is_up_to_date(src, dst, self.compare):
+                    skipped = True
+                else:
+                    self.transfer.transfer(src, dst)
+                    copied = True
+            except Exception as e:
+                with self.lock:
+                    self.failures[filename] = str(e)
+            if self.stats:
+                self.stats.observe("output", filename, time.perf_counter() - start)
+            with self.lock:
+                self.files_done += 1
+                self.bytes_done += size
+                if skipped:
+                    self.files_skipped += 1
+                    self.bytes_skipped += size
+                if copied:
+                    self.files_copied += 1
+                    self.bytes_copied += size
+
+LOG_FILE_PREFIX = "处理日志_"
+REPORT_FILE_PREFIX = "处理统计_"
+JOURNAL_LABEL = "原地重命名"  # 原地重命名的重命名记录保存在论文文件夹中
+
+# 进程池工作进程中的标题索引，由 _init_match_worker 在每个进程启动时建立一次
+_worker_index = None
+_worker_threshold = None
+
+def _init_match_worker(titles, threshold):
+    global _worker_index, _worker_threshold
+    _worker_index = TitleIndex(titles)
+    _worker_threshold = threshold
+
+def _match_chunk_with(index, threshold, chunk):
+    """对一块 (序号, 文件名) 进行模糊匹配，返回结果、本块的比较/剪枝次数和最慢的几个 (用时, 序号)"""
+    compared, pruned = index.compared, index.pruned
+    results = []
+    timings = []
+    for pos, name in chunk:
+        start = time.perf_counter()
+        results.append((pos,) + index.find_best_match(name, threshold))
+        timings.append((time.perf_counter() - start, pos))
+    slowest = heapq.nlargest(SLOWEST_COUNT, timings)
+    return results, index.compared - compared, index.pruned - pruned, slowest
+
+def _match_chunk(chunk):
+    return _match_chunk_with(_worker_index, _worker_threshold, chunk)
+
+# 共享进程池（批量任务）中每个工作进程缓存的标题索引: 标题指纹 -> TitleIndex
+_shared_indexes = {}
+SHARED_INDEX_LIMIT = 2  # 每个工作进程最多缓存的标题索引数
+
+def _match_chunk_shared(fingerprint, titles_path, threshold, chunk):
+    """共享进程池中的匹配任务，同一标题集合的索引在每个工作进程中只建立一次
+
+    任务只携带标题指纹和标题文件的路径，工作进程缓存中没有这个指纹时才从文件读取标题。
+    """
+    index = _shared_indexes.get(fingerprint)
+    if index is None:
+        if len(_shared_indexes) >= SHARED_INDEX_LIMIT:
+            _shared_indexes.pop(next(iter(_shared_indexes)))
+        with open(titles_path, encoding="utf-8") as f:
+            titles = json.load(f)
+        index = _shared_indexes[fingerprint] = TitleIndex(titles)
+    return _match_chunk_with(index, threshold, chunk)
+
+class MatchEngine:
+    """模糊匹配引擎，将待匹配文件分块后交给进程池并行计算
+
+    标题集合通过进程池的 initializer 在每个工作进程中只传输一次；
+    结果按输入顺序逐块返回，因此无论进程数多少，输出都完全相同。
+    传入 executor 时使用外部的共享进程池（批量任务），标题集合每次匹配只写入一个临时文件，
+    各块只携带标题指纹，工作进程按指纹缓存索引，缓存中没有时才读取标题文件。
+    """
+
+    def __init__(self, titles, threshold, workers=1, chunk_size=64, executor=None):
+        self.titles = list(dict.fromkeys(titles))
+        self.threshold = threshold
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.compared = 0
+        self.pruned = 0
+        self.slowest = []  # 最慢的几个 (用时, 序号)
+
+    def match(self, items):
+        """items 为 (序号, 文件名) 列表，按输入顺序产出 (序号, 最佳标题, 相似度)
+
+        每个工作进程最多同时分到几块，不会一次把全部文件交给进程池。
+        """
+        chunks = iter_chunks(items, self.chunk_size)
+        if self.executor is not None and len(items) > self.chunk_size:
+            fingerprint = hashlib.sha1("\n".join(self.titles).encode("utf-8")).hexdigest()
+            fd, titles_path = tempfile.mkstemp(prefix="匹配标题_", suffix=".json")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.titles, f, ensure_ascii=False)
+                task = partial(_match_chunk_shared, fingerprint, titles_path, self.threshold)
+                for chunk_result in bounded_map(self.executor, task, chunks):
+                    yield from self._collect(chunk_result)
+            finally:
+                try:
+                    os.remove(titles_path)
+                except OSError:
+                    pass
             return
             
-        # 在后台线程中执行处理，避免界面冻结
-        thread = threading.Thread(target=self.process_files)
-        thread.daemon = True
-        thread.start()
-        
-    def find_best_match(self, filename, paper_titles):
-        """使用模糊匹配找到最佳匹配的论文标题"""
-        best_match = None
-        best_score = 0
-        
-        for title in paper_titles:
-            # 计算相似度
-            score = difflib.SequenceMatcher(None, filename.lower(), title.lower()).ratio()
-            
-            # 如果相似度高于阈值且是当前最佳匹配
-            if score > best_score and score >= self.similarity_threshold:
-                best_score = score
-                best_match = title
-        
-        return best_match, best_score
-    
-    def show_unmatched_files_popup(self, unmatched_count, unmatched_files):
-        """显示未匹配文件的弹窗提示"""
-        if unmatched_count == 0:
-            messagebox.showinfo("处理完成", f"所有文件都已成功匹配并重命名！\n\n输出文件夹: {self.output_path.get()}")
+        if self.workers == 1 or len(items) <= self.chunk_size:
+            index = TitleIndex(self.titles)
+            for chunk in chunks:
+                yield from self._collect(_match_chunk_with(index, self.threshold, chunk))
             return
             
-        # 创建弹窗
-        popup = tk.Toplevel(self.root)
-        popup.title("未匹配文件提示")
-        popup.geometry("600x400")
-        popup.transient(self.root)
-        popup.grab_set()
+        workers = min(self.workers, -(-len(items) // self.chunk_size))
+        with create_executor(EXECUTOR_PROCESS, workers, initializer=_init_match_worker,
+                             initargs=(self.titles, self.threshold)) as executor:
+            # 按提交顺序取结果，先完成的块在前面的块完成后立即输出
+            for chunk_result in bounded_map(executor, _match_chunk, chunks):
+                yield from self._collect(chunk_result)
+                
+    def _collect(self, chunk_result):
+        results, compared, pruned, slowest = chunk_result
+        self.compared += compared
+        self.pruned += pruned
+        self.slowest = heapq.nlargest(SLOWEST_COUNT, self.slowest + slowest)
+        return results
+
+ASSIGN_TOP_K = 16  # 一对一分配时每个文件保留的候选标题数
+NGRAM_DIMS = 1024  # 字符二元组计数向量的哈希维度
+ASSIGN_BLOCK = 512  # 向量化打分时每批处理的文件数
+# 最优分配（匈牙利算法）的计算量上限: 行数² × 列数（候选标题数 + 行数）。纯 Python 实现在
+# 上限附近、候选互相竞争最激烈时约需 0.2 秒；超过上限的连通块（至多约 170 个文件，
+# 候选标题越多越少）改用贪心分配
+HUNGARIAN_MAX_WORK = 8000000
+
+def _ngram_vectors(np, texts):
+    """把文本转换为按行归一化的字符二元组哈希计数矩阵"""
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        grams = [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+        for gram in grams:
+            rows.append(row)
+            # 使用稳定的哈希，保证每次运行的候选完全相同
+            cols.append(zlib.crc32(gram.encode("utf-8")) % NGRAM_DIMS)
+    matrix = np.zeros((len(texts), NGRAM_DIMS), dtype=np.float32)
+    np.add.at(matrix, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def _candidates_numpy(np, names, index, threshold, top_k):
+    """用矩阵乘法一次计算一批文件与全部标题的余弦相似度，只对前 top_k 个候选用 SequenceMatcher 精确打分"""
+    title_vectors = _ngram_vectors(np, index.lowered)
+    k = min(top_k, len(index.lowered))
+    candidates = []
+    for start in range(0, len(names), ASSIGN_BLOCK):
+        block = [name.lower() for name in names[start:start + ASSIGN_BLOCK]]
+        sims = _ngram_vectors(np, block) @ title_vectors.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for query, tids in zip(block, top.tolist()):
+            scored = []
+            for tid in sorted(tids):
+                score = difflib.SequenceMatcher(None, query, index.lowered[tid]).ratio()
+                if score >= threshold:
+                    scored.append((tid, score))
+            index.compared += len(tids)
+            index.pruned += len(index.lowered) - len(tids)
+            candidates.append(scored)
+    return candidates
+
+def _hungarian(cost):
+    """最小费用分配，cost 为 n×m (n<=m) 的二维列表，返回每行分配到的列"""
+    n, m = len(cost), len(cost[0])
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = math.inf
+            j1 = 0
+            row = cost[i0 - 1]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+    result = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            result[p[j] - 1] = j - 1
+    return result
+
+def _assign_component(rows, cols, edges):
+    """对一个连通块求总相似度最大的一对一分配，返回 {文件序号: (标题编号, 相似度)}
+
+    cols 只包含这个连通块中文件的候选标题；计算量超过 HUNGARIAN_MAX_WORK 时改用贪心分配。
+    """
+    if len(rows) == 1:
+        tid, score = max(edges[rows[0]].items(), key=lambda item: (item[1], -item[0]))
+        return {rows[0]: (tid, score)}
+    if len(rows) ** 2 * (len(cols) + len(rows)) > HUNGARIAN_MAX_WORK:
+        # 规模过大时按相似度从高到低贪心分配
+        assigned, taken = {}, set()
+        ordered = sorted(((score, -tid, row) for row in rows for tid, score in edges[row].items()), reverse=True)
+        for score, neg_tid, row in ordered:
+            if row not in assigned and -neg_tid not in taken:
+                assigned[row] = (-neg_tid, score)
+                taken.add(-neg_tid)
+        return assigned
+    # 每个文件都可以选择不分配（费用 0），没有候选关系的位置费用设为很大的值
+    big = float(len(rows) + 1)
+    col_pos = {tid: j for j, tid in enumerate(cols)}
+    cost = []
+    for row in rows:
+        line = [big] * len(cols) + [0.0] * len(rows)
+        for tid, score in edges[row].items():
+            line[col_pos[tid]] = -score
+        cost.append(line)
+    assigned = {}
+    for row, j in zip(rows, _hungarian(cost)):
+        if j < len(cols) and cols[j] in edges[row]:
+            assigned[row] = (cols[j], edges[row][cols[j]])
+    return assigned
+
+def assign_titles(names, titles, threshold, exact=None, top_k=ASSIGN_TOP_K):
+    """批量一对一分配文件和论文标题
+
+    exact 为每个文件精确匹配或规范化匹配到的标题（没有则为 None），这些文件先直接
+    分配到各自的标题（同一标题优先给精确匹配的文件，其次给靠前的文件），不参与
+    后面的分配。其余文件在
+    其余标题中找出至多 top_k 个达到阈值的候选标题（安装了 NumPy 时用向量化的
+    二元组相似度初筛，否则用 TitleIndex），再在候选关系图的每个连通块上求总
+    相似度最大的分配，保证每个标题最多分配给一个文件。
+
+    返回 (与 names 等长的 [(标题, 相似度)] 列表, 用于打分的 TitleIndex)
+    """
+    titles = list(titles)
+    known = set(titles)
+    results = [(None, 0)] * len(names)
+    pinned = set()
+    exact = exact or []
+    # 精确匹配优先于规范化匹配，其次按文件顺序
+    for row in sorted(range(len(exact)), key=lambda row: exact[row] != names[row]):
+        title = exact[row]
+        if title is not None and title not in pinned and title in known:
+            results[row] = (title, 1.0)
+            pinned.add(title)
+    rows_left = [row for row in range(len(names)) if results[row][0] is None]
+    names_left = [names[row] for row in rows_left]
+    index = TitleIndex(title for title in titles if title not in pinned)
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None and index.lowered and names_left:
+        candidates = _candidates_numpy(np, names_left, index, threshold, top_k)
+    else:
+        candidates = [index.top_matches(name, threshold, top_k) for name in names_left]
+    edges = [dict(found) for found in candidates]
+
+    # 用并查集把互相竞争同一标题的文件归为一个连通块
+    parent = list(range(len(names_left)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    owner = {}
+    for row, found in enumerate(edges):
+        for tid in found:
+            if tid in owner:
+                parent[find(row)] = find(owner[tid])
+            else:
+                owner[tid] = row
+    components = defaultdict(list)
+    for row, found in enumerate(edges):
+        if found:
+            components[find(row)].append(row)
+
+    for rows in components.values():
+        cols = sorted({tid for row in rows for tid in edges[row]})
+        for row, (tid, score) in _assign_component(rows, cols, edges).items():
+            results[rows_left[row]] = (index.titles[tid], score)
+    return results, index
+
+CACHE_FILENAME = "匹配缓存.sqlite3"
+CACHE_MAX_ENTRIES = 200000  # 缓存最多保留的匹配记录数，超出后淘汰最久未使用的记录
+
+# 缓存查询结果
+CACHE_HIT = "命中"
+CACHE_PARTIAL = "部分命中"
+CACHE_MISS = "未命中"
+
+class MatchCache:
+    """保存在磁盘上的模糊匹配结果缓存（SQLite）
+
+    记录以 (小写文件名, 相似度阈值, 标题集合指纹) 为键，保存最佳标题和相似度。
+    标题集合变化后，只要旧结果的最佳标题仍在新集合中（或旧结果为未匹配），
+    就只需对新增的标题打分，再与旧结果合并。
+    """
+
+    def __init__(self, path, titles, threshold):
+        self.titles = titles
+        self.threshold = threshold
+        self.order = {title: i for i, title in enumerate(titles)}
+        self.fingerprint = hashlib.sha1("\n".join(titles).encode("utf-8")).hexdigest()
+        self.now = int(time.time())
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self._title_sets = {}
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS matches (name TEXT, threshold REAL, fingerprint TEXT, "
+                          "title TEXT, score REAL, used INTEGER, PRIMARY KEY (name, threshold, fingerprint))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS title_sets (fingerprint TEXT PRIMARY KEY, titles TEXT, used INTEGER)")
+        self.conn.execute("INSERT OR REPLACE INTO title_sets VALUES (?, ?, ?)",
+                          (self.fingerprint, json.dumps(titles, ensure_ascii=False), self.now))
+
+    def lookup(self, name):
+        """返回 (查询结果, 标题, 相似度, 旧指纹)，部分命中时需要再对 delta_titles(旧指纹) 打分"""
+        rows = self.conn.execute("SELECT fingerprint, title, score FROM matches WHERE name = ? AND threshold = ? "
+                                 "ORDER BY fingerprint = ? DESC, used DESC",
+                                 (name.lower(), self.threshold, self.fingerprint)).fetchall()
+        for fingerprint, title, score in rows:
+            if fingerprint == self.fingerprint:
+                self.hits += 1
+                self._touch(name)
+                return CACHE_HIT, title, score, None
+            if (title is None or title in self.order) and self._load_title_set(fingerprint) is not None:
+                self.partial_hits += 1
+                return CACHE_PARTIAL, title, score, fingerprint
+        self.misses += 1
+        return CACHE_MISS, None, 0, None
+
+    def delta_titles(self, fingerprint):
+        """当前标题集合中不属于旧集合的标题，保持表格顺序"""
+        old_titles = self._load_title_set(fingerprint)
+        return [title for title in self.titles if title not in old_titles]
+
+    def merge(self, cached, fresh):
+        """合并旧结果和新增标题的结果，分数相同时取表格中靠前的标题"""
+        candidates = [c for c in (cached, fresh) if c[0] is not None]
+        if not candidates:
+            return None, 0
+        return max(candidates, key=lambda c: (c[1], -self.order[c[0]]))
+
+    def store(self, name, title, score):
+        self.conn.execute("INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?)",
+                          (name.lower(), self.threshold, self.fingerprint, title, score, self.now))
+
+    def close(self):
+        """淘汰超出容量的旧记录并写入磁盘"""
+        try:
+            evict_least_used(self.conn, "matches", CACHE_MAX_ENTRIES)
+            self.conn.execute("DELETE FROM title_sets WHERE fingerprint != ? AND fingerprint NOT IN "
+                              "(SELECT DISTINCT fingerprint FROM matches)", (self.fingerprint,))
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+    def _touch(self, name):
+        self.conn.execute("UPDATE matches SET used = ? WHERE name = ? AND threshold = ? AND fingerprint = ?",
+                          (self.now, name.lower(), self.threshold, self.fingerprint))
+
+    def _load_title_set(self, fingerprint):
+        if fingerprint not in self._title_sets:
+            row = self.conn.execute("SELECT titles FROM title_sets WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            self._title_sets[fingerprint] = set(json.loads(row[0])) if row else None
+        return self._title_sets[fingerprint]
+
+class ContentCache:
+    """内容匹配时从文件中读取的文字，与匹配缓存保存在同一个数据库中
+
+    以文件指纹（大小和开头的内容）为键，文件改名、复制到其他文件夹后仍然命中。
+    """
+
+    def __init__(self, path):
+        self.now = int(time.time())
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS contents (fingerprint TEXT PRIMARY KEY, lines TEXT, used INTEGER)")
+
+    def lookup(self, fingerprints):
+        """返回 指纹 -> 文本行列表，只包括已缓存的指纹"""
+        found = {}
+        fingerprints = list(set(fingerprints))
+        for i in range(0, len(fingerprints), 500):
+            batch = fingerprints[i:i + 500]
+            rows = self.conn.execute(f"SELECT fingerprint, lines FROM contents WHERE fingerprint IN "
+                                     f"({','.join('?' * len(batch))})", batch).fetchall()
+            found.update((fingerprint, json.loads(lines)) for fingerprint, lines in rows)
+        self.conn.executemany("UPDATE contents SET used = ? WHERE fingerprint = ?",
+                              ((self.now, fingerprint) for fingerprint in found))
+        return found
+
+    def store(self, items):
+        """items 为 (指纹, 文本行列表) 列表"""
+        self.conn.executemany("INSERT OR REPLACE INTO contents VALUES (?, ?, ?)",
+                              ((fingerprint, json.dumps(lines, ensure_ascii=False), self.now)
+                               for fingerprint, lines in items))
+
+    def close(self):
+        try:
+            evict_least_used(self.conn, "contents", CACHE_MAX_ENTRIES)
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+def _content_queries(lines):
+    """用于匹配的文本: 每一行，以及相邻两行连在一起（标题常常折成两行）"""
+    queries = list(lines)
+    for first, second in zip(lines, lines[1:]):
+        # 中文之间直接相连，英文单词之间加空格
+        joiner = " " if first[-1].isascii() and second[0].isascii() else ""
+        queries.append(first + joiner + second)
+    return queries
+
+class PaperMatcher:
+    """论文匹配重命名的完整流程，不依赖图形界面，由界面和命令行共用
+
+    log 为接收日志消息的函数；每次运行的完整日志同时写入输出文件夹中的日志文件。
+    """
+
+    def __init__(self, excel_path, folder_path, output_path="", id_col="序号", title_col="论文题目",
+                 threshold=0.6, workers=1, output_mode=MODE_COPY, copy_workers=4,
+                 use_cache=True, one_to_one=False, strip_suffixes=DEFAULT_STRIP_SUFFIXES, normalize=True,
+                 log=print, executor=None, sync=None, delete_stale=False, content_match=False):
+        self.excel_path = excel_path
+        self.folder_path = folder_path
+        self.output_path = output_path
+        self.id_col = id_col
+        self.title_col = title_col
+        self.similarity_threshold = threshold
+        self.worker_count = workers
+        self.output_mode = output_mode
+        self.copy_workers = copy_workers
+        self.use_cache = use_cache
+        self.one_to_one = one_to_one
+        self.executor = executor  # 批量任务共享的进程池，为 None 时每次运行单独创建
+        # 增量同步: 直接输出到输出文件夹，只输出新增或变化的文件（SYNC_MTIME/SYNC_HASH），
+        # 为 None 时每次输出到新的带时间的子文件夹
+        self.sync = sync
+        self.delete_stale = delete_stale  # 同步时删除源文件已不在论文文件夹中的输出文件
+        self.content_match = content_match  # 文件名无法匹配的 PDF/DOCX 再按文件内容匹配
+        # 规范化匹配，关闭时只有精确匹配和模糊匹配；后缀规则无效时在这里抛出 ValueError
+        self.normalizer = TitleNormalizer(strip_suffixes) if normalize else None
+        self.log_callback = log
+        self.log_file = None
+        self.log_backlog = []  # 日志文件打开前的消息
+        self.pipeline = None  # 当前运行的输出流水线，用于刷新进度
+        self.scoring = None  # 本次运行的模糊匹配引擎或一对一分配的标题索引，用于统计比较次数
+        self.unmatched_files = []  # 未匹配的文件列表
+        self.match_results = []  # 每个文件的匹配结果
+        self.output_dir = ""  # 本次运行实际使用的输出文件夹
+        self.stats = RunStats("匹配列表重命名")  # 各阶段用时和计数，每次运行重新开始
+
+    def log_message(self, message):
+        start = time.perf_counter()
+        self.log_callback(message)
+        if self.log_file:
+            self.log_file.write(message + "\n")
+        else:
+            self.log_backlog.append(message)
+        self.stats.add_time("log", time.perf_counter() - start)
+
+    def open_log_file(self, path):
+        try:
+            self.log_file = open(path, "w", encoding="utf-8")
+            self.log_file.write("\n".join(self.log_backlog + [""]))
+        except OSError as e:
+            self.log_callback(f"无法创建日志文件: {str(e)}")
+        self.log_backlog = []
+
+    def match_normalized(self, items, paper_titles):
+        """规范化后查表匹配，items 为 (序号, 文件名) 列表，返回 ({序号: 标题}, 未匹配的 items)"""
+        if not self.normalizer or not items:
+            return {}, items
+        with self.stats.stage("normalize"):
+            key_map, ambiguous = self.normalizer.key_map(paper_titles)
+            found = {}
+            rest = []
+            for pos, name in items:
+                title = key_map.get(self.normalizer.normalize(name))
+                if title:
+                    found[pos] = title
+                else:
+                    rest.append((pos, name))
+        if ambiguous:
+            self.log_message(f"{ambiguous} 组论文标题规范化后相同，这些标题只参与模糊匹配")
+        self.log_message(f"规范化匹配: {len(found)} 个文件")
+        self.stats.count("normalized_hits", len(found))
+        return found, rest
         
-        # 设置弹窗内容
-        label = ttk.Label(popup, text=f"有 {unmatched_count} 个文件未能匹配:", font=("Arial", 12))
-        label.pack(pady=10)
+    def exact_matcher(self, paper_map, record):
+        """精确匹配: 文件名（不含扩展名）与论文标题完全相同"""
+        def match(items):
+            rest = []
+            for pos, name in items:
+                if name in paper_map:
+                    record(pos, name, 1.0, TIER_EXACT)
+                else:
+                    rest.append((pos, name))
+            return rest
+        return match
         
-        # 创建文本框显示未匹配文件列表
-        text_frame = ttk.Frame(popup)
-        text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+    def normalized_matcher(self, paper_titles, record):
+        """规范化匹配，见 match_normalized"""
+        def match(items):
+            found, rest = self.match_normalized(items, paper_titles)
+            for pos, title in found.items():
+                record(pos, title, 1.0, TIER_NORMALIZED)
+            return rest
+        return match
+        
+    def fuzzy_matcher(self, paper_titles, cache_folder, record):
+        """先查匹配缓存，再用匹配引擎模糊匹配；匹配引擎保存在 self.scoring 中，用于统计"""
+        def match(pending):
+            pending_names = dict(pending)
+            engine = self.scoring = MatchEngine(paper_titles, self.similarity_threshold, self.worker_count,
+                                                executor=self.executor)
+            rest = []
+            
+            def found(pos, best_match, similarity_score):
+                if best_match:
+                    record(pos, best_match, similarity_score, TIER_FUZZY)
+                else:
+                    rest.append((pos, pending_names[pos]))
+                    
+            # 查询匹配缓存，命中的文件不再打分，部分命中的只对新增标题打分
+            cache = None
+            stale = defaultdict(list)  # 旧指纹 -> [(序号, 文件名, 缓存标题, 缓存相似度)]
+            if self.use_cache and pending:
+                cache = MatchCache(os.path.join(cache_folder, CACHE_FILENAME), engine.titles,
+                                   self.similarity_threshold)
+                misses = []
+                for pos, name in pending:
+                    status, title, score, old_fingerprint = cache.lookup(name)
+                    if status == CACHE_HIT:
+                        found(pos, title, score)
+                    elif status == CACHE_PARTIAL:
+                        stale[old_fingerprint].append((pos, name, title, score))
+                    else:
+                        misses.append((pos, name))
+                pending = misses
+                self.log_message(f"匹配缓存: 命中 {cache.hits} 个，部分命中 {cache.partial_hits} 个，"
+                                 f"未命中 {cache.misses} 个")
+                self.stats.count("cache_hits", cache.hits)
+                
+            try:
+                if pending:
+                    self.log_message(f"{len(pending)} 个文件需要模糊匹配")
+                for pos, best_match, similarity_score in engine.match(pending):
+                    found(pos, best_match, similarity_score)
+                    if cache:
+                        cache.store(pending_names[pos], best_match, similarity_score)
+                        
+                for old_fingerprint, entries in stale.items():
+                    delta = MatchEngine(cache.delta_titles(old_fingerprint), self.similarity_threshold,
+                                        self.worker_count, executor=self.executor)
+                    cached = {pos: (title, score) for pos, _, title, score in entries}
+                    for pos, best_match, similarity_score in delta.match([(pos, name) for pos, name, _, _ in entries]):
+                        best_match, similarity_score = cache.merge(cached[pos], (best_match, similarity_score))
+                        found(pos, best_match, similarity_score)
+                        cache.store(pending_names[pos], best_match, similarity_score)
+                    engine.compared += delta.compared
+                    engine.pruned += delta.pruned
+                    engine.slowest = heapq.nlargest(SLOWEST_COUNT, engine.slowest + delta.slowest)
+            finally:
+                if cache:
+                    cache.close()
+            rest.sort()
+            return rest
+        return match
         
-        text_widget = tk.Text(text_frame, wrap=tk.WORD)
-        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=text_widget.yview)
-        text_widget.configure(yscrollcommand=scrollbar.set)
+    def one_to_one_matcher(self, paper_map, paper_titles, record):
+        """批量一对一分配，每个标题最多分配给一个文件；标题索引保存在 self.scoring 中，用于统计"""
+        def match(items):
+            self.log_message("一对一分配模式: 批量计算相似度后统一分配（不使用匹配缓存）")
+            names = [name for _, name in items]
+            exact = [name if name in paper_map else None for name in names]
+            found, _ = self.match_normalized([(i, name) for i, name in enumerate(names) if exact[i] is None],
+                                             paper_titles)
+            for i, title in found.items():
+                exact[i] = title
+            assigned, self.scoring = assign_titles(names, paper_titles, self.similarity_threshold, exact)
+            rest = []
+            for i, (title, score) in enumerate(assigned):
+                pos = items[i][0]
+                if title is None:
+                    rest.append(items[i])
+                elif title == exact[i]:
+                    record(pos, title, score, TIER_NORMALIZED if i in found else TIER_EXACT)
+                else:
+                    record(pos, title, score, TIER_FUZZY)
+            return rest
+        return match
         
-        text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    def content_matcher(self, paths, paper_titles, cache_folder, record, results):
+        """内容匹配，只处理 PDF/DOCX，paths 为 序号 -> 文件路径；一对一分配时跳过 results 中已分配的标题"""
+        def match(items):
+            eligible = [(pos, paths[pos]) for pos, _ in items
+                        if os.path.splitext(paths[pos])[1].lower()[1:] in CONTENT_TYPES]
+            if not eligible:
+                return items
+            taken = {r.title for r in results if r and r.title} if self.one_to_one else ()
+            unmatched = set(self.match_content(eligible, paper_titles, cache_folder, record, taken))
+            eligible = {pos for pos, _ in eligible}
+            return [(pos, name) for pos, name in items if pos not in eligible or pos in unmatched]
+        return match
         
-        for file in unmatched_files:
-            text_widget.insert(tk.END, f"• {file}\n")
+    def match_content(self, items, paper_titles, cache_folder, record, taken=()):
+        """内容匹配: 读取文件名未能匹配的 PDF/DOCX 开头的标题和文字，与论文标题匹配
+
+        items 为 (序号, 文件路径) 列表；taken 中的标题（一对一分配时已分配的标题）不再使用。
+        读取文字在进程池中进行；使用匹配缓存时按文件指纹缓存读取结果，再次运行只需计算指纹。
+        返回没有匹配的文件的序号列表。
+        """
+        fingerprints = [file_fingerprint(path) for _, path in items]
+        cache = ContentCache(os.path.join(cache_folder, CACHE_FILENAME)) if self.use_cache else None
+        try:
+            found = cache.lookup([f for f in fingerprints if f]) if cache else {}
+            missing = [i for i, fingerprint in enumerate(fingerprints) if fingerprint not in found]
+            self.log_message(f"内容匹配: {len(items)} 个文件，缓存命中 {len(items) - len(missing)} 个，"
+                             f"需要读取 {len(missing)} 个")
+            texts = map_files(read_first_lines, [items[i][1] for i in missing], self.worker_count, self.executor,
+                              CONTENT_POOL_MIN)
+            contents = [found.get(fingerprint, []) for fingerprint in fingerprints]
+            for i, lines in zip(missing, texts):
+                contents[i] = lines
+            if cache:
+                cache.store([(fingerprints[i], contents[i]) for i in missing if fingerprints[i]])
+        finally:
+            if cache:
+                cache.close()
+        self.stats.count("content_read", len(missing))
+        self.stats.count("content_cache_hits", len(items) - len(missing))
         
-        text_widget.config(state=tk.DISABLED)  # 设置为只读
+        # 每个文件取各行中得分最高的标题，规范化后相同的直接算作完全匹配
+        titles = [title for title in dict.fromkeys(paper_titles) if title not in taken]
+        index = TitleIndex(titles)
+        key_map = self.normalizer.key_map(titles)[0] if self.normalizer else {}
+        best = []
+        for (pos, path), lines in zip(items, contents):
+            title, score, source = None, 0, None
+            for query in _content_queries(lines):
+                candidate = key_map.get(self.normalizer.normalize(query)) if self.normalizer else None
+                candidate_score = 1.0 if candidate else 0
+                if not candidate:
+                    candidate, candidate_score = index.find_best_match(query, self.similarity_threshold)
+                if candidate and candidate_score > score:
+                    title, score, source = candidate, candidate_score, query
+                    if score == 1.0:
+                        break
+            best.append((pos, title, score, source))
+            
+        # 一对一分配时同一标题只给得分最高的文件
+        used = set()
+        if self.one_to_one:
+            for i in sorted(range(len(best)), key=lambda i: -best[i][2]):
+                pos, title, score, source = best[i]
+                if title in used:
+                    best[i] = (pos, None, 0, None)
+                elif title:
+                    used.add(title)
+        unmatched = []
+        for pos, title, score, source in best:
+            if title:
+                record(pos, title, score, TIER_CONTENT)
+                self.log_message(f"  文件内容: {source}")
+            else:
+                unmatched.append(pos)
+        matched = len(best) - len(unmatched)
+        self.log_message(f"内容匹配: {matched} 个文件")
+        self.stats.count("content_hits", matched)
+        return unmatched
         
-        # 确定按钮
-        button_frame = ttk.Frame(popup)
-        button_frame.pack(pady=10)
+    def remove_stale_outputs(self, output_folder, targets, source_folder, paper_ids):
+        """增量同步后找出源文件已经不在论文文件夹中的输出文件，按设置删除或只报告
+
+        只考虑形如 <序号>_<源文件名> 的文件（序号为表格中的序号）；本次的输出文件、
+        源文件仍然存在的输出文件和其他文件（如用户自己放入的文件）都不会被删除。
+        """
+        keep = (CACHE_FILENAME, LOG_FILE_PREFIX, REPORT_FILE_PREFIX, BATCH_REPORT_PREFIX, JOURNAL_PREFIX)
+        paper_ids = {str(paper_id) for paper_id in paper_ids}
         
-        ttk.Button(button_frame, text="确定", command=popup.destroy).pack()
+        def source_gone(name):
+            # 序号本身可能含有 _，逐个尝试每个分隔位置
+            for i, ch in enumerate(name):
+                if ch == "_" and name[:i] in paper_ids and name[i + 1:]:
+                    if not os.path.lexists(os.path.join(source_folder, name[i + 1:])):
+                        return True
+            return False
+        with os.scandir(output_folder) as it:
+            stale = sorted(entry.name for entry in it
+                           if entry.is_file() and entry.name not in targets and not entry.name.startswith(keep)
+                           and source_gone(entry.name))
+        if not stale:
+            return
+        if not self.delete_stale:
+            self.log_message(f"输出文件夹中有 {len(stale)} 个文件的源文件已不存在（未删除）")
+            return
+        deleted = 0
+        for name in stale:
+            try:
+                os.remove(os.path.join(output_folder, name))
+                deleted += 1
+                self.log_message(f"删除多余文件: {name}")
+            except OSError as e:
+                self.log_message(f"删除多余文件失败: {name}: {str(e)}")
+        self.stats.count("stale_deleted", deleted)
         
-    def process_files(self):
+    def write_stats_report(self):
+        """在日志中写入运行统计摘要，并把完整报告保存到输出文件夹"""
+        self.log_message(self.stats.summary())
+        if not self.output_dir:
+            return
+        path = os.path.join(self.output_dir,
+                            f"{REPORT_FILE_PREFIX}{self.stats.started.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            self.stats.write_report(path)
+        except OSError as e:
+            self.log_message(f"无法保存运行统计: {str(e)}")
+            
+    def run(self):
+        """执行匹配和输出，全部完成时返回 True"""
+        pipeline = None
+        journal = None
+        self.stats = stats = RunStats("匹配列表重命名")
+        self.output_dir = ""
         try:
-            self.progress.start()
             self.log_message("开始处理...")
             self.log_message(f"使用相似度阈值: {self.similarity_threshold}")
-            
-            # 清空未匹配文件列表
-            self.unmatched_files = []
+            self.log_message(f"模糊匹配进程数: {self.worker_count}")
             
             # 读取Excel文件
-            excel_file = self.excel_path.get()
-            id_col = self.id_column.get().strip()
-            title_col = self.title_column.get().strip()
-            
             try:
-                # 尝试多种方式读取Excel
-                try:
-                    df = pd.read_excel(excel_file)
-                except:
-                    wb = load_workbook(excel_file)
-                    sheet = wb.active
-                    data = sheet.values
-                    cols = next(data)
-                    df = pd.DataFrame(data, columns=cols)
-                
-                # 检查列是否存在
-                if id_col not in df.columns or title_col not in df.columns:
-                    self.log_message(f"错误: Excel文件中未找到列 '{id_col}' 或 '{title_col}'")
-                    return
-                    
-                # 创建论文标题到序号的映射
-                paper_map = {}
-                paper_titles = []  # 存储所有论文标题用于模糊匹配
-                for _, row in df.iterrows():
-                    paper_id = str(row[id_col]).strip()
-                    paper_title = str(row[title_col]).strip()
-                    if paper_id and paper_title:
-                        paper_map[paper_title] = paper_id
-                        paper_titles.append(paper_title)
+                start_time = time.perf_counter()
+                paper_map, paper_titles, row_count = read_paper_table(self.excel_path, self.id_col, self.title_col)
+                elapsed = time.perf_counter() - start_time
+                stats.add_time("load", elapsed)
+                stats.count("rows", row_count)
                 
                 self.log_message(f"成功读取 {len(paper_map)} 条论文信息")
+                self.log_message(f"共 {row_count} 行，用时 {elapsed:.2f} 秒 ({row_count / max(elapsed, 1e-6):.0f} 行/秒)")
                 
+            except ValueError as e:
+                self.log_message(f"错误: {str(e)}")
+                return False
             except Exception as e:
                 self.log_message(f"读取Excel文件时出错: {str(e)}")
-                return
+                return False
                 
-            # 创建输出文件夹（如果不存在）
-            output_folder = self.output_path.get()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_subfolder = os.path.join(output_folder, f"重命名论文_{timestamp}")
+            folder_path = self.folder_path
+            transfer = FileTransfer(self.output_mode)
+            self.log_message(f"输出方式: {self.output_mode}")
             
-            try:
-                os.makedirs(output_subfolder, exist_ok=True)
-                self.log_message(f"创建输出文件夹: {output_subfolder}")
-            except Exception as e:
-                self.log_message(f"创建输出文件夹时出错: {str(e)}")
-                return
+            if self.output_mode == MODE_RENAME:
+                # 原地重命名时直接在论文文件夹中修改文件名
+                output_subfolder = folder_path
+                cache_folder = folder_path
+            elif self.sync:
+                # 增量同步时每次都输出到同一个文件夹
+                output_subfolder = self.output_path
+                cache_folder = self.output_path
+                if os.path.abspath(output_subfolder) == os.path.abspath(folder_path):
+                    self.log_message("错误: 增量同步的输出文件夹不能是论文文件夹")
+                    return False
+                try:
+                    os.makedirs(output_subfolder, exist_ok=True)
+                    self.log_message(f"增量同步到输出文件夹: {output_subfolder} (比较{self.sync})")
+                except Exception as e:
+                    self.log_message(f"创建输出文件夹时出错: {str(e)}")
+                    return False
+            else:
+                # 创建输出文件夹（如果不存在）
+                output_folder = self.output_path
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_subfolder = os.path.join(output_folder, f"重命名论文_{timestamp}")
+                # 批量任务共用输出文件夹时，同一秒内的多次运行使用不同的子文件夹
+                suffix = 2
+                while os.path.exists(output_subfolder):
+                    output_subfolder = os.path.join(output_folder, f"重命名论文_{timestamp}_{suffix}")
+                    suffix += 1
+                # 匹配缓存放在每次运行都相同的输出文件夹中
+                cache_folder = output_folder
+                
+                try:
+                    os.makedirs(output_subfolder, exist_ok=True)
+                    self.log_message(f"创建输出文件夹: {output_subfolder}")
+                except Exception as e:
+                    self.log_message(f"创建输出文件夹时出错: {str(e)}")
+                    return False
+            self.output_dir = output_subfolder
+                
+            # 处理文件夹中的文件（按文件名排序，保证每次运行的日志顺序一致）
+            with stats.stage("scan"):
+                files = sorted((r.name, r.size) for r in iter_files(folder_path, stats=stats)
+                               if not r.name.startswith(
+                                   (CACHE_FILENAME, LOG_FILE_PREFIX, REPORT_FILE_PREFIX, JOURNAL_PREFIX)))
+            
+            # 完整日志写入输出文件夹，日志框只保留最近的内容
+            self.open_log_file(os.path.join(
+                output_subfolder, f"{LOG_FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"))
                 
-            # 处理文件夹中的文件
-            folder_path = self.folder_path.get()
-            files = os.listdir(folder_path)
-            matched_count = 0
-            fuzzy_matched_count = 0  # 模糊匹配计数
+            # 输出文件交给流水线并发执行，匹配线程只负责产生任务
+            pipeline = CopyPipeline(transfer, self.copy_workers, stats=stats, compare=self.sync)
+            pipeline.set_total(len(files), sum(size for _, size in files))
+            self.pipeline = pipeline
             
-            for filename in files:
-                file_path = os.path.join(folder_path, filename)
-                if os.path.isfile(file_path):
-                    # 获取文件名（不含扩展名）进行匹配
-                    name_without_ext = os.path.splitext(filename)[0]
+            # 匹配结果表，统计信息、未匹配报告和弹窗都从这里读取
+            results = [None] * len(files)
+            targets = set()  # 本次运行的全部输出文件名，增量同步时据此找出多余的文件
+            # 原地重命名时先收集全部改名，匹配结束后交给重命名引擎执行: 与筛选重命名一样检查
+            # 目标冲突、用临时文件名处理互相占用，并写入重命名记录用于中断后继续和撤销
+            renames = [] if self.output_mode == MODE_RENAME else None
+            numbered = set()  # 原地重命名时已经带有所匹配编号、不再改名的文件
+            
+            def record(pos, best_match, similarity_score, tier):
+                filename, size = files[pos]
+                if best_match and renames is not None and filename.startswith(f"{paper_map[best_match]}_"):
+                    # 已经处理过的文件再次运行时不再加编号
+                    self.log_message(f"{tier}: {filename} 已带编号，不再重命名")
+                    numbered.add(filename)
+                    pipeline.skip(size)
+                elif best_match:
+                    paper_id = paper_map[best_match]
+                    new_filename = f"{paper_id}_{filename}"
+                    new_file_path = os.path.join(output_subfolder, new_filename)
+                    targets.add(new_filename)
+                    if renames is not None:
+                        renames.append((filename, size, new_filename))
+                    else:
+                        pipeline.submit(filename, os.path.join(folder_path, filename), new_file_path, size)
                     
-                    # 先尝试精确匹配
-                    if name_without_ext in paper_map:
-                        # 精确匹配成功
-                        paper_id = paper_map[name_without_ext]
-                        file_ext = os.path.splitext(filename)[1]
-                        new_filename = f"{paper_id}_{filename}"
-                        new_file_path = os.path.join(output_subfolder, new_filename)
-                        
-                        try:
-                            shutil.copy2(file_path, new_file_path)
-                            self.log_message(f"精确匹配: {filename} -> {new_filename}")
-                            matched_count += 1
-                        except Exception as e:
-                            self.log_message(f"复制文件 {filename} 时出错: {str(e)}")
+                    if tier == TIER_EXACT:
+                        self.log_message(f"精确匹配: {filename} -> {new_filename}")
+                    elif tier == TIER_NORMALIZED:
+                        self.log_message(f"规范化匹配: {filename} -> {new_filename}")
+                        self.log_message(f"  匹配论文: {best_match}")
                     else:
-                        # 精确匹配失败，尝试模糊匹配
-                        best_match, similarity_score = self.find_best_match(name_without_ext, paper_titles)
-                        
-                        if best_match:
-                            # 模糊匹配成功
-                            paper_id = paper_map[best_match]
-                            file_ext = os.path.splitext(filename)[1]
-                            new_filename = f"{paper_id}_{filename}"
-                            new_file_path = os.path.join(output_subfolder, new_filename)
-                            
-                            try:
-                                shutil.copy2(file_path, new_file_path)
-                                self.log_message(f"模糊匹配 (相似度: {similarity_score:.2f}): {filename} -> {new_filename}")
-                                self.log_message(f"  匹配论文: {best_match}")
-                                matched_count += 1
-                                fuzzy_matched_count += 1
-                            except Exception as e:
-                                self.log_message(f"复制文件 {filename} 时出错: {str(e)}")
-                        else:
-                            # 两种匹配都失败
-                            self.unmatched_files.append(filename)
+                        self.log_message(f"{tier} (相似度: {similarity_score:.2f}): {filename} -> {new_filename}")
+                        self.log_message(f"  匹配论文: {best_match}")
+                else:
+                    pipeline.skip(size)
+                    
+                results[pos] = MatchResult(filename, best_match, similarity_score, tier, None)
+                
+            # 依次经过各级匹配器，前面没有匹配的文件交给后面的匹配器，最后仍未匹配的文件记为未匹配
+            self.scoring = MatchEngine((), self.similarity_threshold)  # 模糊匹配的统计，由匹配器替换
+            if self.one_to_one:
+                matchers = [("match", self.one_to_one_matcher(paper_map, paper_titles, record))]
+            else:
+                matchers = [("match", self.exact_matcher(paper_map, record)),
+                            ("match", self.normalized_matcher(paper_titles, record)),
+                            ("match", self.fuzzy_matcher(paper_titles, cache_folder, record))]
+            if self.content_match:
+                paths = [os.path.join(folder_path, filename) for filename, _ in files]
+                matchers.append(("content", self.content_matcher(paths, paper_titles, cache_folder, record, results)))
+            names = [os.path.splitext(filename)[0] for filename, _ in files]
+            for pos, _ in run_matchers(list(enumerate(names)), matchers, stats):
+                record(pos, None, 0, TIER_NONE)
+            engine = self.scoring
+            stats.count("compared", engine.compared)
+            stats.count("pruned", engine.pruned)
+            for seconds, pos in getattr(engine, "slowest", []):
+                stats.observe("match", files[pos][0], seconds)
+                
+            failures = {}
+            if renames:
+                folder = os.path.abspath(folder_path)
+                records = [FileRecord(folder, filename, size, 0.0, filename) for filename, size, _ in renames]
+                plan = plan_renames(records, [new_filename for _, _, new_filename in renames])
+                journal = RenameJournal(new_journal_path(folder_path, JOURNAL_LABEL), "匹配列表重命名",
+                                        JOURNAL_LABEL, folder)
+                self.log_message(f"重命名记录: {journal.path}")
+                average = sum(size for _, size, _ in renames) / len(renames)
+                # 引擎负责结束并关闭重命名记录
+                apply_rename_plan(plan, self.log_message, lambda done: pipeline.skip(average), stats,
+                                  workers=self.copy_workers, journal=journal, failures=failures)
+                
+            # 等待全部文件输出完成，再把失败信息写入结果表
+            with stats.stage("output_wait"):
+                pipeline.close()
+            failures.update(pipeline.failures)
+            stats.count("files_output", pipeline.files_copied)
+            stats.count("bytes_output", pipeline.bytes_copied)
+            if self.sync:
+                stats.count("files_skipped", pipeline.files_skipped)
+                stats.count("bytes_skipped", pipeline.bytes_skipped)
+                self.remove_stale_outputs(output_subfolder, targets, folder_path, paper_map.values())
+            self.match_results = [r._replace(error=failures.get(r.filename)) for r in results]
+            copied = [r for r in self.match_results if r.title and not r.error and r.filename not in numbered]
+            matched_count = len(copied)
+            normalized_count = sum(1 for r in copied if r.tier == TIER_NORMALIZED)
+            fuzzy_matched_count = sum(1 for r in copied if r.tier == TIER_FUZZY)
+            content_count = sum(1 for r in copied if r.tier == TIER_CONTENT)
+            self.unmatched_files = [r.filename for r in self.match_results if r.tier == TIER_NONE]
             
+            if transfer.fallback_reason:
+                self.log_message(f"{transfer.mode}不可用 ({transfer.fallback_reason})，已改为{MODE_COPY}")
+            failed = [r for r in self.match_results if r.error]
+            if failed:
+                self.log_message(f"\n{len(failed)} 个文件输出失败:")
+                for r in failed:
+                    self.log_message(f"  - {r.filename}: {r.error}")
+                    
             # 输出统计信息
             self.log_message("\n处理完成!")
             self.log_message(f"成功匹配并重命名了 {matched_count} 个文件")
+            if normalized_count > 0:
+                self.log_message(f"  - 其中 {normalized_count} 个通过规范化匹配")
             if fuzzy_matched_count > 0:
                 self.log_message(f"  - 其中 {fuzzy_matched_count} 个通过模糊匹配")
+            if content_count > 0:
+                self.log_message(f"  - 其中 {content_count} 个通过内容匹配")
+            if numbered:
+                self.log_message(f"另有 {len(numbered)} 个匹配的文件已带编号，没有重新命名")
             self.log_message(f"输出文件夹: {output_subfolder}")
+            if transfer.counts:
+                mb_per_sec, files_per_sec = pipeline.throughput()
+                self.log_message(f"实际输出方式: {transfer.summary()}")
+                self.log_message(f"输出 {pipeline.bytes_copied / (1024 * 1024):.1f} MB，"
+                                 f"{mb_per_sec:.1f} MB/s，{files_per_sec:.1f} 文件/s")
+            if self.sync:
+                self.log_message(f"跳过未变化的文件 {pipeline.files_skipped} 个 "
+                                 f"({pipeline.bytes_skipped / (1024 * 1024):.1f} MB)")
             self.log_message(f"未能匹配 {len(self.unmatched_files)} 个文件")
+            self.log_message(f"模糊匹配比较 {engine.compared} 次，索引剪枝跳过 {engine.pruned} 次")
             
             if self.unmatched_files:
                 self.log_message("\n未匹配的文件列表:")
                 for file in self.unmatched_files:
                     self.log_message(f"  - {file}")
             
-            # 检查是否有Excel中的论文没有对应文件
-            matched_titles = set()
-            for filename in files:
-                name_without_ext = os.path.splitext(filename)[0]
-                best_match, _ = self.find_best_match(name_without_ext, paper_titles)
-                if best_match:
-                    matched_titles.add(best_match)
-            
-            unmatched_papers = set(paper_titles) - matched_titles
+            # 检查是否有Excel中的论文没有对应文件（按表格顺序输出）
+            matched_titles = {r.title for r in self.match_results if r.title}
+            unmatched_papers = [title for title in dict.fromkeys(paper_titles) if title not in matched_titles]
             if unmatched_papers:
                 self.log_message(f"\nExcel中有 {len(unmatched_papers)} 篇论文没有对应的文件:")
                 for paper in unmatched_papers:
                     self.log_message(f"  - {paper}")
-                    
-            # 处理完成后显示弹窗提示
-            self.root.after(0, lambda: self.show_unmatched_files_popup(
-                len(self.unmatched_files), self.unmatched_files))
+            return True
                     
         except Exception as e:
             self.log_message(f"处理过程中发生错误: {str(e)}")
+            return False
         finally:
-            self.progress.stop()
+            if pipeline is not None:
+                pipeline.close()
+            if journal is not None:
+                journal.close()
+            self.write_stats_report()
             self.log_message("处理结束")
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+
+def run_journal(folder_path, undo=False, log=print):
+    """按论文文件夹中的重命名记录继续中断的原地重命名，或撤销上次原地重命名，全部成功时返回 True"""
+    state = latest_journal(folder_path, JOURNAL_LABEL, unfinished=not undo)
+    if state is None:
+        log("没有可以撤销的原地重命名" if undo else "没有中断的原地重命名")
+        return False
+    stats = RunStats("匹配列表重命名")
+    success_count, error_count = (undo_journal if undo else resume_journal)(state, log=log, stats=stats)
+    log(f"成功: {success_count}, 失败: {error_count}")
+    log(stats.summary())
+    return error_count == 0
+
+# 命令行中输出方式的英文名称
+MODE_ALIASES = {"copy": MODE_COPY, "hardlink": MODE_HARDLINK, "reflink": MODE_REFLINK, "rename": MODE_RENAME}
+
+# 批量任务清单中的字段，未填写的字段使用命令行或界面中的设置
+MANIFEST_FIELDS = ["excel", "folder", "output", "id_column", "title_column", "threshold", "mode"]
+BATCH_REPORT_PREFIX = "批量处理统计_"
+
+def read_manifest(path):
+    """读取批量任务清单，返回任务字典列表
+
+    csv 第一行为字段名（见 MANIFEST_FIELDS）；json 为对象列表或 {"jobs": [...]}。
+    清单中的相对路径相对于清单所在的文件夹。文件格式错误时抛出 ValueError，
+    单个任务的字段是否有效在运行该任务时检查。
+    """
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, encoding="utf-8-sig") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"任务清单不是有效的JSON: {str(e)}")
+        if isinstance(data, dict):
+            data = data.get("jobs")
+        if not isinstance(data, list) or not all(isinstance(job, dict) for job in data):
+            raise ValueError("JSON任务清单应为任务对象的列表")
+    else:
+        with open(path, encoding=_detect_text_encoding(path), newline="") as f:
+            data = list(csv.DictReader(f))
+            
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for job in data:
+        job = {key.strip().lower(): str(value).strip() for key, value in job.items()
+               if key and value is not None and str(value).strip()}
+        unknown = set(job) - set(MANIFEST_FIELDS)
+        if unknown:
+            raise ValueError(f"任务清单中有未知字段: {', '.join(sorted(unknown))}")
+        for key in ("excel", "folder", "output"):
+            if key in job:
+                job[key] = os.path.join(base, job[key])
+        jobs.append(job)
+    if not jobs:
+        raise ValueError("任务清单中没有任务")
+    return jobs
+
+def _pool_alive(executor):
+    """检查共享进程池是否还能使用（工作进程异常退出后进程池不可再用）"""
+    try:
+        executor.submit(int).result()
+        return True
+    except BrokenProcessPool:
+        return False
+
+class BatchRunner:
+    """按任务清单依次运行多个匹配任务，所有任务共用一个模糊匹配进程池
+
+    defaults 为清单中未填写字段的默认值。单个任务失败（字段无效、读取表格出错、
+    进程池异常等）只记录在结果中，不影响后面的任务。
+    """
+
+    def __init__(self, jobs, defaults, workers=1, copy_workers=4, use_cache=True, one_to_one=False,
+                 strip_suffixes=DEFAULT_STRIP_SUFFIXES, normalize=True, log=print, sync=None, delete_stale=False,
+                 content_match=False):
+        self.jobs = jobs
+        self.defaults = defaults
+        self.worker_count = max(1, workers)
+        self.copy_workers = copy_workers
+        self.use_cache = use_cache
+        self.one_to_one = one_to_one
+        self.strip_suffixes = strip_suffixes
+        self.normalize = normalize
+        self.sync = sync
+        self.delete_stale = delete_stale
+        self.content_match = content_match
+        self.log_message = log
+        self.sync_outputs = set()  # 已同步过的输出文件夹
+        self.current = None  # 正在运行的任务
+        self.job_results = []  # 每个任务的统计
+        self.stats = RunStats("批量任务")
+
+    @property
+    def pipeline(self):
+        """当前任务的输出流水线，用于刷新进度"""
+        return self.current.pipeline if self.current else None
+
+    def make_matcher(self, job, executor):
+        """按清单字段和默认值创建任务，字段无效时抛出 ValueError"""
+        settings = dict(self.defaults, **job)
+        for key in ("excel", "folder"):
+            if not settings.get(key):
+                raise ValueError(f"缺少字段 {key}")
+        mode = MODE_ALIASES.get(settings.get("mode") or "copy", settings.get("mode"))
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"未知的输出方式: {settings['mode']}")
+        if mode != MODE_RENAME and not settings.get("output"):
+            raise ValueError("缺少字段 output")
+        try:
+            threshold = float(settings.get("threshold", 0.6))
+        except ValueError:
+            threshold = -1
+        if not 0.1 <= threshold <= 1.0:
+            raise ValueError("相似度阈值必须在0.1到1.0之间")
+        if self.sync:
+            if mode == MODE_RENAME:
+                raise ValueError("增量同步不能与原地重命名同时使用")
+            # 删除多余文件时，同步到同一文件夹的后一个任务会删除前一个任务的输出
+            output = os.path.normcase(os.path.abspath(settings["output"]))
+            if self.delete_stale and output in self.sync_outputs:
+                raise ValueError("多个任务同步到同一输出文件夹时不能删除多余文件")
+            self.sync_outputs.add(output)
+        return PaperMatcher(settings["excel"], settings["folder"], settings.get("output", ""),
+                            settings.get("id_column", "序号"), settings.get("title_column", "论文题目"),
+                            threshold, self.worker_count, mode, self.copy_workers, self.use_cache,
+                            self.one_to_one, self.strip_suffixes, self.normalize,
+                            log=self.log_message, executor=executor, sync=self.sync,
+                            delete_stale=self.delete_stale, content_match=self.content_match)
+
+    def run(self):
+        """运行全部任务，全部成功时返回 True"""
+        self.stats = RunStats("批量任务")
+        self.job_results = []
+        self.sync_outputs = set()
+        executor = create_executor(EXECUTOR_PROCESS, self.worker_count) if self.worker_count > 1 else None
+        try:
+            for number, job in enumerate(self.jobs, 1):
+                self.log_message(f"\n=== 任务 {number}/{len(self.jobs)}: {job.get('excel', '')} ===")
+                start_time = time.perf_counter()
+                matcher = None
+                try:
+                    matcher = self.make_matcher(job, executor)
+                    self.current = matcher
+                    ok = matcher.run()
+                except Exception as e:
+                    self.log_message(f"任务 {number} 无法运行: {str(e)}")
+                    ok = False
+                finally:
+                    self.current = None
+                elapsed = time.perf_counter() - start_time
+                self.stats.observe("job", f"任务 {number}", elapsed)
+                self.job_results.append(self.job_result(number, job, matcher, ok, elapsed))
+                
+                # 工作进程异常退出后重建进程池，后面的任务照常运行
+                if not ok and executor is not None and not _pool_alive(executor):
+                    self.log_message("模糊匹配进程池异常，已重新创建")
+                    executor.shutdown(wait=False)
+                    executor = create_executor(EXECUTOR_PROCESS, self.worker_count)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+                
+        for key in ("files", "matched", "exact", "normalized", "fuzzy", "content", "unmatched", "output_failed"):
+            self.stats.count(key, sum(r[key] for r in self.job_results))
+        self.log_message("\n=== 批量处理结果 ===")
+        for r in self.job_results:
+            status = "成功" if r["ok"] else "失败"
+            self.log_message(f"任务 {r['job']} {status}: 匹配 {r['matched']}/{r['files']} 个文件，"
+                             f"未匹配 {r['unmatched']} 个，用时 {r['seconds']:.2f} 秒 ({r['excel']})")
+        self.log_message(self.summary())
+        return all(r["ok"] for r in self.job_results)
+
+    def job_result(self, number, job, matcher, ok, elapsed):
+        results = matcher.match_results if matcher and ok else []
+        tiers = Counter(r.tier for r in results if r.title and not r.error)
+        return {
+            "job": number,
+            "excel": job.get("excel", ""),
+            "folder": job.get("folder", ""),
+            "output_dir": matcher.output_dir if matcher else "",
+            "ok": ok,
+            "seconds": round(elapsed, 6),
+            "files": len(results),
+            "matched": sum(tiers.values()),
+            "exact": tiers[TIER_EXACT],
+            "normalized": tiers[TIER_NORMALIZED],
+            "fuzzy": tiers[TIER_FUZZY],
+            "content": tiers[TIER_CONTENT],
+            "unmatched": sum(1 for r in results if r.tier == TIER_NONE),
+            "output_failed": sum(1 for r in results if r.error),
+        }
+
+    def summary(self):
+        succeeded = sum(1 for r in self.job_results if r["ok"])
+        matched = sum(r["matched"] for r in self.job_results)
+        files = sum(r["files"] for r in self.job_results)
+        return (f"完成 {succeeded}/{len(self.job_results)} 个任务，共匹配 {matched}/{files} 个文件，"
+                f"总用时 {self.stats.elapsed():.2f} 秒")
+
+    def write_report(self, folder):
+        """把批量统计保存到 folder，返回文件路径，失败时抛出 OSError"""
+        report = self.stats.report()
+        report["jobs"] = self.job_results
+        path = os.path.join(folder, f"{BATCH_REPORT_PREFIX}{self.stats.started.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+def parse_suffixes(text):
+    """解析逗号分隔的后缀规则"""
+    return [s.strip() for s in text.split(",") if s.strip()]
+
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="按表格中的论文题目匹配文件，并在文件名前加上序号")
+    parser.add_argument("--excel", help="表格文件 (xlsx/xls/csv/tsv)")
+    parser.add_argument("--folder", help="论文文件夹")
+    parser.add_argument("--output", default="", help="输出文件夹（原地重命名时可省略）")
+    parser.add_argument("--batch", help="批量任务清单 (csv/json)，清单中未填写的字段使用其余参数的值")
+    parser.add_argument("--id-column", default="序号", help="序号列名，默认: 序号")
+    parser.add_argument("--title-column", default="论文题目", help="论文题目列名，默认: 论文题目")
+    parser.add_argument("--threshold", type=float, default=0.6, help="相似度阈值 (0.1-1.0)，默认: 0.6")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="模糊匹配进程数，默认: CPU核心数")
+    parser.add_argument("--mode", choices=list(MODE_ALIASES) + OUTPUT_MODES, default="copy",
+                        help="输出方式: copy/hardlink/reflink/rename，默认: copy")
+    parser.add_argument("--copy-workers", type=int, default=4, help="输出文件的线程数，默认: 4")
+    parser.add_argument("--no-cache", action="store_true", help="不使用匹配缓存")
+    parser.add_argument("--one-to-one", action="store_true", help="一对一分配，每个标题最多匹配一个文件")
+    parser.add_argument("--strip-suffixes", default=",".join(DEFAULT_STRIP_SUFFIXES),
+                        help="规范化匹配时去掉的后缀，逗号分隔的正则表达式，默认: %(default)s")
+    parser.add_argument("--no-normalize", action="store_true", help="不使用规范化匹配")
+    parser.add_argument("--content", action="store_true",
+                        help="文件名无法匹配的 PDF/DOCX 再按文件开头的标题和文字匹配（PDF 正文需要安装 pypdf）")
+    parser.add_argument("--sync", action="store_true",
+                        help="增量同步: 直接输出到输出文件夹，只输出新增或变化的文件（按大小和修改时间判断）")
+    parser.add_argument("--verify-hash", action="store_true", help="增量同步时按文件内容判断是否变化（较慢）")
+    parser.add_argument("--delete-stale", action="store_true", help="增量同步时删除源文件已不在论文文件夹中的输出文件")
+    parser.add_argument("--resume", action="store_true", help="按论文文件夹中的重命名记录继续上次中断的原地重命名")
+    parser.add_argument("--undo", action="store_true", help="按论文文件夹中的重命名记录撤销上次原地重命名")
+    args = parser.parse_args(argv)
+
+    args.mode = MODE_ALIASES.get(args.mode, args.mode)
+    if not 0.1 <= args.threshold <= 1.0:
+        parser.error("相似度阈值必须在0.1到1.0之间")
+    if args.workers < 1 or args.copy_workers < 1:
+        parser.error("进程数和线程数必须是大于0的整数")
+    if args.resume or args.undo:
+        if not args.folder:
+            parser.error("--resume 和 --undo 需要指定 --folder")
+        return args
+    if not args.batch and not (args.excel and args.folder):
+        parser.error("请指定 --excel 和 --folder，或使用 --batch 指定任务清单")
+    if not args.batch and args.mode != MODE_RENAME and not args.output:
+        parser.error("请指定输出文件夹 --output")
+    if (args.verify_hash or args.delete_stale) and not args.sync:
+        parser.error("--verify-hash 和 --delete-stale 需要与 --sync 一起使用")
+    if args.sync and args.mode == MODE_RENAME:
+        parser.error("增量同步不能与原地重命名同时使用")
+    args.sync = (SYNC_HASH if args.verify_hash else SYNC_MTIME) if args.sync else None
+    args.strip_suffixes = parse_suffixes(args.strip_suffixes)
+    try:
+        TitleNormalizer(args.strip_suffixes)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+def main_cli(argv):
+    """命令行模式，返回进程退出码"""
+    args = parse_args(argv)
+    if args.resume or args.undo:
+        return 0 if run_journal(args.folder, args.undo) else 1
+    if args.batch:
+        return main_batch(args)
+    matcher = PaperMatcher(args.excel, args.folder, args.output, args.id_column.strip(), args.title_column.strip(),
+                           args.threshold, args.workers, args.mode, args.copy_workers,
+                           not args.no_cache, args.one_to_one, args.strip_suffixes, not args.no_normalize,
+                           sync=args.sync, delete_stale=args.delete_stale, content_match=args.content)
+    return 0 if matcher.run() else 1
+
+def main_batch(args):
+    """命令行批量模式，全部任务成功时返回 0"""
+    try:
+        jobs = read_manifest(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"无法读取任务清单: {str(e)}")
+        return 2
+    defaults = {"output": args.output, "id_column": args.id_column.strip(), "title_column": args.title_column.strip(),
+                "threshold": args.threshold, "mode": args.mode}
+    runner = BatchRunner(jobs, defaults, args.workers, args.copy_workers, not args.no_cache, args.one_to_one,
+                         args.strip_suffixes, not args.no_normalize, sync=args.sync,
+                         delete_stale=args.delete_stale, content_match=args.content)
+    ok = runner.run()
+    try:
+        print(f"批量统计已保存: {runner.write_report(os.path.dirname(os.path.abspath(args.batch)))}")
+    except OSError as e:
+        print(f"无法保存批量统计: {str(e)}")
+    return 0 if ok else 1
+
+def main():
+    # 有命令行参数时使用命令行模式，不加载图形界面
+    if len(sys.argv) > 1:
+        sys.exit(main_cli(sys.argv[1:]))
+    from 匹配列表重命名界面 import run_gui
+    run_gui()
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = PaperRenamerApp(root)
-    root.mainloop()
\ No newline at end of file
+    # 打包为可执行程序后，进程池的子进程需要此调用
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,425 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import deque
+from tkinter import filedialog, messagebox, ttk
+
+from 匹配列表重命名 import (PaperMatcher, BatchRunner, TitleNormalizer, read_manifest, parse_suffixes, run_journal,
+                       MODE_COPY, MODE_RENAME, OUTPUT_MODES, DEFAULT_STRIP_SUFFIXES, SYNC_MTIME, SYNC_HASH)
+
+LOG_MAX_LINES = 5000  # 日志框最多显示的行数，完整日志写入输出文件夹中的日志文件
+LOG_DRAIN_INTERVAL = 100  # 日志刷新间隔（毫秒）
+
+PROGRESS_STEPS = 1000  # 进度条刻度
+PROGRESS_INTERVAL = 200  # 进度刷新间隔（毫秒）
+
+class PaperRenamerApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("论文文件重命名工具")
+        self.root.geometry("800x600")
+        
+        # 变量初始化
+        self.excel_path = tk.StringVar()
+        self.folder_path = tk.StringVar()
+        self.output_path = tk.StringVar()
+        self.matcher = None  # 当前运行的匹配流程，用于刷新进度
+        self.on_finish = None  # 后台线程结束后在界面线程中调用的函数（如完成后的弹窗），由后台线程设置
+        self.similarity_threshold = 0.6  # 默认相似度阈值
+        self.worker_count = os.cpu_count() or 1  # 模糊匹配进程数
+        self.output_mode = MODE_COPY  # 输出方式
+        self.copy_workers = 4  # 输出文件的线程数
+        self.use_cache = tk.BooleanVar(value=True)  # 是否使用匹配缓存
+        self.one_to_one = tk.BooleanVar(value=False)  # 是否一对一分配标题
+        self.content_match = tk.BooleanVar(value=False)  # 文件名无法匹配时是否按文件内容匹配
+        self.sync = tk.BooleanVar(value=False)  # 是否增量同步到固定的输出文件夹
+        self.verify_hash = tk.BooleanVar(value=False)  # 增量同步时是否按内容比较
+        self.delete_stale = tk.BooleanVar(value=False)  # 增量同步时是否删除多余文件
+        
+        # 日志队列: 后台线程只负责放入消息，界面线程定时批量取出显示
+        self.log_queue = queue.Queue()
+        
+        self.setup_ui()
+        self.root.after(LOG_DRAIN_INTERVAL, self.drain_log)
+        
+    def setup_ui(self):
+        # 创建主框架
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Excel文件选择部分
+        ttk.Label(main_frame, text="Excel文件路径:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        ttk.Entry(main_frame, textvariable=self.excel_path, width=60).grid(row=0, column=1, padx=5)
+        ttk.Button(main_frame, text="浏览", command=self.select_excel).grid(row=0, column=2, padx=5)
+        
+        # 源文件夹选择部分
+        ttk.Label(main_frame, text="论文文件夹路径:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        ttk.Entry(main_frame, textvariable=self.folder_path, width=60).grid(row=1, column=1, padx=5)
+        ttk.Button(main_frame, text="浏览", command=self.select_folder).grid(row=1, column=2, padx=5)
+        
+        # 输出文件夹选择部分
+        ttk.Label(main_frame, text="输出文件夹路径:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Entry(main_frame, textvariable=self.output_path, width=60).grid(row=2, column=1, padx=5)
+        ttk.Button(main_frame, text="浏览", command=self.select_output_folder).grid(row=2, column=2, padx=5)
+        
+        # 表格列设置
+        ttk.Label(main_frame, text="序号列名:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.id_column = ttk.Entry(main_frame, width=20)
+        self.id_column.grid(row=3, column=1, sticky=tk.W, padx=5)
+        self.id_column.insert(0, "序号")  # 默认值
+        
+        ttk.Label(main_frame, text="论文题目列名:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.title_column = ttk.Entry(main_frame, width=20)
+        self.title_column.grid(row=4, column=1, sticky=tk.W, padx=5)
+        self.title_column.insert(0, "论文题目")  # 默认值
+        
+        # 相似度阈值设置
+        ttk.Label(main_frame, text="相似度阈值 (0.1-1.0):").grid(row=5, column=0, sticky=tk.W, pady=5)
+        self.similarity_entry = ttk.Entry(main_frame, width=10)
+        self.similarity_entry.grid(row=5, column=1, sticky=tk.W, padx=5)
+        self.similarity_entry.insert(0, "0.6")  # 默认值
+        
+        # 并行进程数和输出方式设置
+        ttk.Label(main_frame, text="并行进程数:").grid(row=6, column=0, sticky=tk.W, pady=5)
+        options_frame = ttk.Frame(main_frame)
+        options_frame.grid(row=6, column=1, sticky=tk.W, padx=5)
+        self.workers_entry = ttk.Entry(options_frame, width=10)
+        self.workers_entry.pack(side=tk.LEFT)
+        self.workers_entry.insert(0, str(self.worker_count))  # 默认使用全部CPU核心
+        
+        ttk.Label(options_frame, text="输出方式:").pack(side=tk.LEFT, padx=(20, 5))
+        self.mode_combo = ttk.Combobox(options_frame, values=OUTPUT_MODES, state="readonly", width=18)
+        self.mode_combo.pack(side=tk.LEFT)
+        self.mode_combo.set(self.output_mode)
+        
+        ttk.Label(options_frame, text="复制线程数:").pack(side=tk.LEFT, padx=(20, 5))
+        self.copy_workers_entry = ttk.Entry(options_frame, width=10)
+        self.copy_workers_entry.pack(side=tk.LEFT)
+        self.copy_workers_entry.insert(0, str(self.copy_workers))
+        
+        ttk.Checkbutton(options_frame, text="使用匹配缓存", variable=self.use_cache).pack(side=tk.LEFT, padx=(20, 0))
+        ttk.Checkbutton(options_frame, text="一对一分配", variable=self.one_to_one).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Checkbutton(options_frame, text="按文件内容匹配", variable=self.content_match).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # 规范化匹配时去掉的文件名后缀
+        ttk.Label(main_frame, text="忽略的后缀:").grid(row=7, column=0, sticky=tk.W, pady=5)
+        self.suffix_entry = ttk.Entry(main_frame, width=60)
+        self.suffix_entry.grid(row=7, column=1, sticky=(tk.W, tk.E), padx=5)
+        self.suffix_entry.insert(0, ",".join(DEFAULT_STRIP_SUFFIXES))  # 逗号分隔的正则表达式
+        
+        # 增量同步设置
+        ttk.Label(main_frame, text="增量同步:").grid(row=8, column=0, sticky=tk.W, pady=5)
+        sync_frame = ttk.Frame(main_frame)
+        sync_frame.grid(row=8, column=1, sticky=tk.W, padx=5)
+        ttk.Checkbutton(sync_frame, text="直接输出到输出文件夹，只输出新增或变化的文件",
+                        variable=self.sync).pack(side=tk.LEFT)
+        ttk.Checkbutton(sync_frame, text="按内容比较", variable=self.verify_hash).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Checkbutton(sync_frame, text="删除多余文件", variable=self.delete_stale).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # 执行按钮
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=9, column=1, pady=20)
+        # 运行期间禁用全部执行按钮，同一时间只运行一个任务
+        self.run_buttons = [
+            ttk.Button(button_frame, text="开始处理", command=self.start_processing),
+            ttk.Button(button_frame, text="批量任务...", command=self.start_batch),
+            ttk.Button(button_frame, text="继续中断的重命名", command=lambda: self.start_journal(False)),
+            ttk.Button(button_frame, text="撤销上次原地重命名", command=lambda: self.start_journal(True)),
+        ]
+        for i, button in enumerate(self.run_buttons):
+            button.pack(side=tk.LEFT, padx=(10 if i else 0, 0))
+        
+        # 进度条和吞吐量显示
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.grid(row=10, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        self.progress = ttk.Progressbar(progress_frame, mode='determinate', maximum=PROGRESS_STEPS)
+        self.progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_frame, width=50)
+        self.progress_label.pack(side=tk.LEFT, padx=5)
+        
+        # 日志文本框
+        ttk.Label(main_frame, text="处理日志:").grid(row=11, column=0, sticky=tk.W, pady=5)
+        
+        # 添加滚动条
+        log_frame = ttk.Frame(main_frame)
+        log_frame.grid(row=12, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        
+        self.log_text = tk.Text(log_frame, height=20, width=90)
+        scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=scrollbar.set)
+        
+        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        # 配置网格权重
+        main_frame.columnconfigure(1, weight=1)
+        main_frame.rowconfigure(12, weight=1)
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(0, weight=1)
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        
+    def select_excel(self):
+        file_path = filedialog.askopenfilename(
+            title="选择Excel文件",
+            filetypes=[("表格文件", "*.xlsx *.xlsm *.xls *.csv *.tsv"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            self.excel_path.set(file_path)
+            
+    def select_folder(self):
+        folder_path = filedialog.askdirectory(title="选择论文文件夹")
+        if folder_path:
+            self.folder_path.set(folder_path)
+            
+    def select_output_folder(self):
+        folder_path = filedialog.askdirectory(title="选择输出文件夹")
+        if folder_path:
+            self.output_path.set(folder_path)
+            
+    def log_message(self, message):
+        """记录一条日志，可在任意线程中调用"""
+        self.log_queue.put(message)
+        
+    def drain_log(self):
+        """在界面线程中定时取出全部日志，一次性写入日志框
+
+        一次取出的日志超过行数上限时只插入最后 LOG_MAX_LINES 条，更早的日志插入后也会立即被删除。
+        """
+        lines = deque(maxlen=LOG_MAX_LINES)
+        while True:
+            try:
+                lines.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                break
+                
+        if lines:
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            # 超出行数上限时删除最早的日志，完整内容保留在输出文件夹的日志文件中
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+        self.root.after(LOG_DRAIN_INTERVAL, self.drain_log)
+        
+    def read_options(self):
+        """读取并检查界面中的参数，有误时提示并返回 None，否则返回规范化匹配忽略的后缀"""
+        self.output_mode = self.mode_combo.get()
+        
+        # 获取相似度阈值
+        try:
+            threshold = float(self.similarity_entry.get().strip())
+            if threshold < 0.1 or threshold > 1.0:
+                messagebox.showerror("错误", "相似度阈值必须在0.1到1.0之间")
+                return None
+            self.similarity_threshold = threshold
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的相似度阈值（0.1-1.0）")
+            return None
+            
+        # 获取并行进程数
+        try:
+            workers = int(self.workers_entry.get().strip())
+            if workers < 1:
+                raise ValueError
+            self.worker_count = workers
+        except ValueError:
+            messagebox.showerror("错误", "并行进程数必须是大于0的整数")
+            return None
+            
+        # 获取复制线程数
+        try:
+            copy_workers = int(self.copy_workers_entry.get().strip())
+            if copy_workers < 1:
+                raise ValueError
+            self.copy_workers = copy_workers
+        except ValueError:
+            messagebox.showerror("错误", "复制线程数必须是大于0的整数")
+            return None
+            
+        if self.sync.get() and self.output_mode == MODE_RENAME:
+            messagebox.showerror("错误", "增量同步不能与原地重命名同时使用")
+            return None
+            
+        # 获取规范化匹配忽略的后缀
+        strip_suffixes = parse_suffixes(self.suffix_entry.get())
+        try:
+            TitleNormalizer(strip_suffixes)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return None
+        return strip_suffixes
+        
+    def start_processing(self):
+        # 原地重命名不需要输出文件夹
+        need_output = self.mode_combo.get() != MODE_RENAME
+        if not self.excel_path.get() or not self.folder_path.get() or (need_output and not self.output_path.get()):
+            messagebox.showerror("错误", "请先选择Excel文件、论文文件夹和输出文件夹")
+            return
+        strip_suffixes = self.read_options()
+        if strip_suffixes is None:
+            return
+            
+        # 在后台线程中执行处理，避免界面冻结
+        self.matcher = PaperMatcher(
+            self.excel_path.get(), self.folder_path.get(), self.output_path.get(),
+            self.id_column.get().strip(), self.title_column.get().strip(),
+            self.similarity_threshold, self.worker_count, self.output_mode, self.copy_workers,
+            self.use_cache.get(), self.one_to_one.get(), strip_suffixes, log=self.log_message,
+            sync=self.sync_mode(), delete_stale=self.delete_stale.get(), content_match=self.content_match.get())
+        self.start_thread(self.process_files)
+        
+    def start_batch(self):
+        """选择任务清单，按清单依次处理多组表格和文件夹
+
+        清单中未填写的输出文件夹、列名、阈值和输出方式使用界面中的设置。
+        """
+        manifest = filedialog.askopenfilename(
+            title="选择批量任务清单",
+            filetypes=[("任务清单", "*.csv *.json"), ("所有文件", "*.*")]
+        )
+        if not manifest:
+            return
+        strip_suffixes = self.read_options()
+        if strip_suffixes is None:
+            return
+        try:
+            jobs = read_manifest(manifest)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"无法读取任务清单: {str(e)}")
+            return
+            
+        defaults = {"output": self.output_path.get(), "id_column": self.id_column.get().strip(),
+                    "title_column": self.title_column.get().strip(), "threshold": self.similarity_threshold,
+                    "mode": self.output_mode}
+        self.matcher = BatchRunner(jobs, defaults, self.worker_count, self.copy_workers, self.use_cache.get(),
+                                   self.one_to_one.get(), strip_suffixes, log=self.log_message,
+                                   sync=self.sync_mode(), delete_stale=self.delete_stale.get(),
+                                   content_match=self.content_match.get())
+        self.start_thread(lambda: self.process_batch(os.path.dirname(os.path.abspath(manifest))))
+        
+    def start_journal(self, undo):
+        """按论文文件夹中的重命名记录继续中断的原地重命名或撤销上次原地重命名"""
+        folder = self.folder_path.get()
+        if not folder:
+            messagebox.showerror("错误", "请选择论文文件夹")
+            return
+        if undo and not messagebox.askyesno("确认", "确定要把上次原地重命名的文件改回原文件名吗？"):
+            return
+        self.matcher = None
+        self.start_thread(lambda: self.process_journal(folder, undo))
+        
+    def sync_mode(self):
+        """增量同步的比较方式，未开启时为 None"""
+        if not self.sync.get():
+            return None
+        return SYNC_HASH if self.verify_hash.get() else SYNC_MTIME
+        
+    def start_thread(self, target):
+        """在后台线程中执行处理，避免界面冻结
+
+        target 在后台线程中运行，不能调用 Tkinter；需要在结束后更新界面时返回一个函数，
+        由界面线程在检测到线程结束后调用。
+        """
+        for button in self.run_buttons:
+            button.state(["disabled"])
+        self.progress["value"] = 0
+        self.on_finish = None
+        
+        def work():
+            self.on_finish = target()
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        self.root.after(PROGRESS_INTERVAL, self.update_progress, thread)
+        
+    def update_progress(self, thread):
+        """在界面线程中定时刷新进度条和吞吐量"""
+        pipeline = getattr(self.matcher, "pipeline", None)
+        if pipeline is not None:
+            mb_per_sec, files_per_sec = pipeline.throughput()
+            self.progress["value"] = pipeline.fraction() * PROGRESS_STEPS
+            self.progress_label.config(
+                text=f"{pipeline.files_done}/{pipeline.files_total} 个文件, "
+                     f"{pipeline.bytes_done / (1024 * 1024):.1f}/{pipeline.bytes_total / (1024 * 1024):.1f} MB, "
+                     f"{mb_per_sec:.1f} MB/s, {files_per_sec:.1f} 文件/s")
+        if thread.is_alive():
+            self.root.after(PROGRESS_INTERVAL, self.update_progress, thread)
+        else:
+            self.finish_thread()
+            
+    def finish_thread(self):
+        """后台线程结束后在界面线程中恢复执行按钮，并调用后台线程返回的函数"""
+        for button in self.run_buttons:
+            button.state(["!disabled"])
+        on_finish, self.on_finish = self.on_finish, None
+        if on_finish:
+            on_finish()
+            
+
+    def show_unmatched_files_popup(self, unmatched_count, unmatched_files):
+        """显示未匹配文件的弹窗提示"""
+        if unmatched_count == 0:
+            messagebox.showinfo("处理完成", f"所有文件都已成功匹配并重命名！\n\n输出文件夹: {self.matcher.output_dir}")
+            return
+            
+        # 创建弹窗
+        popup = tk.Toplevel(self.root)
+        popup.title("未匹配文件提示")
+        popup.geometry("600x400")
+        popup.transient(self.root)
+        popup.grab_set()
+        
+        # 设置弹窗内容
+        label = ttk.Label(popup, text=f"有 {unmatched_count} 个文件未能匹配:", font=("Arial", 12))
+        label.pack(pady=10)
+        
+        # 创建文本框显示未匹配文件列表
+        text_frame = ttk.Frame(popup)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        text_widget = tk.Text(text_frame, wrap=tk.WORD)
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=text_widget.yview)
+        text_widget.configure(yscrollcommand=scrollbar.set)
+        
+        text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        for file in unmatched_files:
+            text_widget.insert(tk.END, f"• {file}\n")
+        
+        text_widget.config(state=tk.DISABLED)  # 设置为只读
+        
+        # 确定按钮
+        button_frame = ttk.Frame(popup)
+        button_frame.pack(pady=10)
+        
+        ttk.Button(button_frame, text="确定", command=popup.destroy).pack()
+        
+    def process_files(self):
+        """在后台线程中运行，处理完成后返回显示弹窗提示的函数"""
+        if self.matcher.run():
+            unmatched_files = self.matcher.unmatched_files
+            return lambda: self.show_unmatched_files_popup(len(unmatched_files), unmatched_files)
+        return None
+        
+    def process_batch(self, report_folder):
+        """在后台线程中运行，完成后返回显示批量处理结果的函数"""
+        self.matcher.run()
+        summary = self.matcher.summary()
+        try:
+            summary += f"\n\n批量统计: {self.matcher.write_report(report_folder)}"
+        except OSError as e:
+            self.log_message(f"无法保存批量统计: {str(e)}")
+        return lambda: messagebox.showinfo("批量处理完成", summary)
+        
+    def process_journal(self, folder, undo):
+        """在后台线程中继续或撤销原地重命名，结果只写入日志"""
+        run_journal(folder, undo, log=self.log_message)
+        return None
+
+def run_gui():
+    root = tk.Tk()
+    app = PaperRenamerApp(root)
+    root.mainloop()
@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+from datetime import datetime
+
+from 匹配列表重命名 import (read_paper_table, TitleIndex, TitleNormalizer, MatchEngine, FileTransfer, CopyPipeline,
+                       MODE_COPY, MODE_HARDLINK, MODE_REFLINK)
+from 筛选重命名 import scan_files, sort_files, rename_files
+
+# 结果文件格式版本，字段含义变化时递增
+RESULT_SCHEMA = 1
+
+# 各阶段的名称，结果文件中使用英文键
+STAGES = {
+    "load": "读取表格",
+    "normalize": "规范化匹配",
+    "index": "建立标题索引",
+    "match": "模糊匹配",
+    "output": "输出文件",
+    "scan_sort": "扫描并排序",
+    "rename": "顺序重命名",
+}
+
+# 命令行中输出方式的英文名称（不包括原地重命名，测试时源文件夹要留给重命名阶段）
+OUTPUT_ALIASES = {"copy": MODE_COPY, "hardlink": MODE_HARDLINK, "reflink": MODE_REFLINK}
+
+# 生成论文标题用的词表
+ZH_WORDS = ["基于", "深度学习", "的", "研究", "分析", "系统", "设计", "与", "实现", "网络", "图像", "识别",
+            "算法", "优化", "模型", "数据", "挖掘", "智能", "城市", "交通", "预测", "方法", "应用", "多模态",
+            "知识图谱", "推荐", "分布式", "存储", "区块链", "隐私", "保护", "机制", "评估", "框架", "中国",
+            "农村", "经济", "发展", "影响", "因素", "实证", "教育", "高校", "学生", "心理", "健康", "环境",
+            "污染", "治理", "能源", "电池", "材料", "性能", "结构", "仿真", "控制", "策略", "视角", "下"]
+EN_WORDS = ["deep", "learning", "for", "analysis", "of", "system", "design", "and", "implementation",
+            "network", "image", "recognition", "algorithm", "optimization", "model", "data", "mining",
+            "intelligent", "urban", "traffic", "prediction", "method", "based", "on", "multimodal",
+            "knowledge", "graph", "recommendation", "distributed", "storage", "privacy", "framework",
+            "evaluation", "energy", "battery", "materials", "performance", "control", "strategy",
+            "a", "survey", "towards", "efficient", "robust", "scalable", "neural", "transformer"]
+EN_SYLLABLES = ["ba", "ce", "di", "fo", "gu", "ha", "ke", "li", "mo", "nu", "pa", "qui", "ro", "si", "ta",
+                "ve", "xa", "zo", "tion", "ment", "al", "ic", "er", "on", "ing", "ous", "graph", "morph"]
+SUFFIXES = ["_终稿", "(1)", "-修改版", " final", "_v2", "（定稿）"]
+VOCAB_SIZE = 3000  # 每种语言随机生成的专业词数量
+
+def make_vocabulary(rng):
+    """随机生成中英文专业词，使标题的用字分布接近真实论文列表
+
+    只用固定词表时标题之间共用的字符过多，模糊匹配的耗时会远高于实际情况。
+    """
+    zh = ["".join(chr(0x4E00 + rng.randrange(3000)) for _ in range(rng.randint(2, 3))) for _ in range(VOCAB_SIZE)]
+    en = ["".join(rng.choice(EN_SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(VOCAB_SIZE)]
+    return zh, en
+
+def make_title(rng, vocabulary):
+    """随机生成一个中文或英文论文标题，常用词和专业词各占一半"""
+    zh, en = vocabulary
+    if rng.random() < 0.5:
+        words = [rng.choice(ZH_WORDS if rng.random() < 0.5 else zh) for _ in range(rng.randint(4, 9))]
+        return "".join(words)
+    words = [rng.choice(EN_WORDS if rng.random() < 0.5 else en) for _ in range(rng.randint(5, 11))]
+    title = " ".join(words)
+    return title[0].upper() + title[1:]
+
+def add_noise(title, rng):
+    """给标题加上常见的噪声: 删字、错字、相邻字符交换、大小写、版本后缀"""
+    chars = list(title)
+    for _ in range(rng.randint(1, 3)):
+        op = rng.random()
+        i = rng.randrange(len(chars))
+        if op < 0.3 and len(chars) > 4:
+            del chars[i]
+        elif op < 0.6:
+            chars[i] = rng.choice("的和之论研究abcde")
+        elif i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    noisy = "".join(chars)
+    if rng.random() < 0.3:
+        noisy = noisy.lower()
+    if rng.random() < 0.4:
+        noisy += rng.choice(SUFFIXES)
+    return noisy
+
+def reformat(title, rng):
+    """只改变格式、不改变内容: 全角字符、空格和标点、大小写、版本后缀"""
+    op = rng.random()
+    if op < 0.3:
+        text = title.replace(" ", rng.choice(["_", "-", "  "]))
+    elif op < 0.6:
+        # 只转换开头部分，整个英文标题都转为全角时文件名会超过 255 字节
+        text = "".join(chr(ord(c) + 0xFEE0) if "!" <= c <= "~" else c for c in title[:16]) + title[16:]
+    else:
+        # 只使用在 Windows 文件名中也合法的标点（半角冒号在 NTFS 上是非法字符）
+        i = rng.randrange(1, len(title))
+        text = title[:i] + rng.choice(["，", " ", "、", "："]) + title[i:]
+    if rng.random() < 0.3:
+        text = text.upper()
+    if rng.random() < 0.6 or text == title:
+        text += rng.choice(SUFFIXES)
+    return text
+
+def generate_corpus(size, seed):
+    """生成 size 个不重复标题和 size 个文件名
+
+    40% 的文件名与标题完全相同，20% 只有格式不同，20% 有错字等噪声，20% 是表格中没有的标题。
+    返回 (标题列表, [(文件名, 期望标题或 None)])
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    titles = []
+    seen = set()
+    while len(titles) < size:
+        title = make_title(rng, vocabulary)
+        if title not in seen:
+            seen.add(title)
+            titles.append(title)
+
+    files = []
+    names = set()
+    for i, title in enumerate(titles):
+        kind = rng.random()
+        if kind < 0.4:
+            name, expected = title, title
+        elif kind < 0.6:
+            name, expected = reformat(title, rng), title
+        elif kind < 0.8:
+            name, expected = add_noise(title, rng), title
+        else:
+            name, expected = make_title(rng, vocabulary), None
+        if name in names:
+            name = f"{name} ({i})"
+        names.add(name)
+        files.append((name, expected))
+    return titles, files
+
+def write_sheet(path, titles, fmt):
+    """按指定格式写入测试表格，列名与工具默认值相同"""
+    header = ("序号", "论文题目")
+    rows = [(str(i + 1), title) for i, title in enumerate(titles)]
+    if fmt == "xlsx":
+        import openpyxl
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(header)
+        for row in rows:
+            ws.append(row)
+        wb.save(path)
+    else:
+        import csv
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+def write_files(folder, files, file_size):
+    """在文件夹中创建测试文件，依次设置不同的修改时间以便按时间排序"""
+    os.makedirs(folder, exist_ok=True)
+    payload = b"\0" * file_size
+    base = time.time() - len(files)
+    for i, (name, _) in enumerate(files):
+        path = os.path.join(folder, name + ".pdf")
+        with open(path, "wb") as f:
+            f.write(payload)
+        os.utime(path, (base + i, base + i))
+
+def run_once(size, args, workdir):
+    """在 workdir 中生成一套数据并依次执行各阶段，返回 {阶段: (秒数, 附加信息)}"""
+    titles, files = generate_corpus(size, args.seed)
+    sheet = os.path.join(workdir, f"论文列表.{args.format}")
+    src = os.path.join(workdir, "论文")
+    out = os.path.join(workdir, "输出")
+    write_sheet(sheet, titles, args.format)
+    write_files(src, files, args.file_size)
+    os.makedirs(out)
+    timings = {}
+
+    start = time.perf_counter()
+    paper_map, paper_titles, row_count = read_paper_table(sheet, "序号", "论文题目")
+    timings["load"] = (time.perf_counter() - start, {"rows": row_count})
+
+    # 与工具相同: 先精确匹配，再规范化匹配，剩下的交给模糊匹配引擎
+    matched = {}
+    pending = []
+    for pos, (name, _) in enumerate(files):
+        if name in paper_map:
+            matched[pos] = name
+        else:
+            pending.append((pos, name))
+    normalizer = TitleNormalizer()
+    start = time.perf_counter()
+    key_map, _ = normalizer.key_map(paper_titles)
+    found = {}
+    rest = []
+    for pos, name in pending:
+        title = key_map.get(normalizer.normalize(name))
+        if title:
+            found[pos] = title
+        else:
+            rest.append((pos, name))
+    elapsed = time.perf_counter() - start
+    matched.update(found)
+    correct = sum(1 for pos, title in found.items() if title == files[pos][1])
+    timings["normalize"] = (elapsed, {"items": len(pending), "matched": len(found), "correct": correct})
+    pending = rest
+
+    start = time.perf_counter()
+    TitleIndex(paper_titles)
+    timings["index"] = (time.perf_counter() - start, {"titles": len(paper_titles)})
+
+    # 大规模时模糊匹配很慢，只取等间隔的一部分文件测试，速度按实际匹配的文件数计算
+    sample = pending
+    if args.match_sample and len(pending) > args.match_sample:
+        step = len(pending) / args.match_sample
+        sample = [pending[int(i * step)] for i in range(args.match_sample)]
+    engine = MatchEngine(paper_titles, args.threshold, args.workers)
+    start = time.perf_counter()
+    fuzzy_matched = {}
+    for pos, best_match, _ in engine.match(sample):
+        if best_match:
+            fuzzy_matched[pos] = best_match
+    elapsed = time.perf_counter() - start
+    matched.update(fuzzy_matched)
+    correct = sum(1 for pos, _ in sample if fuzzy_matched.get(pos) == files[pos][1])
+    timings["match"] = (elapsed, {"items": len(sample), "fuzzy": len(pending), "matched": len(fuzzy_matched),
+                                  "correct": correct, "compared": engine.compared, "pruned": engine.pruned})
+
+    transfer = FileTransfer(args.mode)
+    start = time.perf_counter()
+    pipeline = CopyPipeline(transfer, args.copy_workers)
+    for pos, title in matched.items():
+        filename = files[pos][0] + ".pdf"
+        pipeline.submit(filename, os.path.join(src, filename),
+                        os.path.join(out, f"{paper_map[title]}_{filename}"), args.file_size)
+    pipeline.close()
+    timings["output"] = (time.perf_counter() - start, {"files": pipeline.files_copied,
+                                                       "failed": len(pipeline.failures),
+                                                       "mode": transfer.summary()})
+
+    start = time.perf_counter()
+    records = sort_files(scan_files(src, ["pdf"]), "修改时间(旧→新)")
+    timings["scan_sort"] = (time.perf_counter() - start, {"files": len(records)})
+
+    start = time.perf_counter()
+    success, errors = rename_files(records, "序号+原文件名", len(str(size)), 1, log=lambda message: None)
+    timings["rename"] = (time.perf_counter() - start, {"files": success, "failed": errors})
+    return timings
+
+def run_benchmarks(args):
+    """按每个规模运行 repeat 次，每个阶段取最短用时"""
+    results = {}
+    for size in args.sizes:
+        runs = []
+        for i in range(args.repeat):
+            workdir = tempfile.mkdtemp(prefix="性能测试_", dir=args.workdir)
+            try:
+                runs.append(run_once(size, args, workdir))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        for stage in STAGES:
+            seconds = [run[stage][0] for run in runs]
+            best = min(seconds)
+            info = runs[seconds.index(best)][stage][1]
+            items = info.get("items", size)  # 本阶段实际处理的数量
+            results[f"{stage}@{size}"] = {
+                "stage": stage,
+                "size": size,
+                "items": items,
+                "seconds": round(best, 6),
+                "items_per_sec": round(items / max(best, 1e-9), 1),
+                "runs": [round(s, 6) for s in seconds],
+                "info": info,
+            }
+            print(f"{STAGES[stage]:<8} {size:>7} 个: {best:9.3f} 秒  ({items / max(best, 1e-9):,.0f} 个/秒)")
+    return results
+
+def environment():
+    """运行环境信息，对比基准时环境不同的结果仅供参考"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """逐项对比基准结果，返回变慢超过容差的项目列表"""
+    regressions = []
+    print(f"\n=== 与基准对比 (容差 {tolerance:.0%}) ===")
+    for key, current in results.items():
+        previous = baseline["results"].get(key)
+        if not previous:
+            print(f"{key:<18} 基准中没有此项")
+            continue
+        ratio = current["seconds"] / max(previous["seconds"], 1e-9)
+        if ratio > 1 + tolerance:
+            status = "变慢"
+            regressions.append(key)
+        elif ratio < 1 - tolerance:
+            status = "变快"
+        else:
+            status = "持平"
+        print(f"{key:<18} {previous['seconds']:9.3f} → {current['seconds']:9.3f} 秒  x{ratio:.2f}  {status}")
+    return regressions
+
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="用合成数据测试匹配、扫描和重命名各阶段的耗时")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="文件数量（同时也是表格行数），逗号分隔，默认: 1000,10000，可用到 100000")
+    parser.add_argument("--repeat", type=int, default=3, help="每个规模重复次数，取最短用时，默认: 3")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，相同种子生成相同数据，默认: 42")
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx", help="测试表格格式，默认: xlsx")
+    parser.add_argument("--threshold", type=float, default=0.6, help="相似度阈值，默认: 0.6")
+    parser.add_argument("--workers", type=int, default=1, help="模糊匹配进程数，默认: 1")
+    parser.add_argument("--match-sample", type=int, default=200,
+                        help="每个规模最多对多少个文件做模糊匹配，0 表示全部，默认: 200")
+    parser.add_argument("--mode", choices=list(OUTPUT_ALIASES), default="copy", help="输出方式，默认: copy")
+    parser.add_argument("--copy-workers", type=int, default=4, help="输出文件的线程数，默认: 4")
+    parser.add_argument("--file-size", type=int, default=4096, help="每个测试文件的字节数，默认: 4096")
+    parser.add_argument("--workdir", default=None, help="生成测试数据的目录，默认: 系统临时目录")
+    parser.add_argument("--output", default="", help="把结果保存为 JSON 文件")
+    parser.add_argument("--baseline", default="", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="变慢超过此比例视为退化，默认: 0.2")
+    args = parser.parse_args(argv)
+
+    try:
+        args.sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        parser.error("--sizes 必须是逗号分隔的整数")
+    if not args.sizes or min(args.sizes) < 1 or args.repeat < 1 or args.match_sample < 0:
+        parser.error("文件数量和重复次数必须是大于0的整数")
+    args.mode = OUTPUT_ALIASES[args.mode]
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    config = {key: getattr(args, key) for key in ("sizes", "repeat", "seed", "format", "threshold",
+                                                  "workers", "match_sample", "mode", "copy_workers", "file_size")}
+    print(f"规模: {args.sizes}，每个规模重复 {args.repeat} 次")
+    results = run_benchmarks(args)
+    report = {
+        "schema": RESULT_SCHEMA,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("schema") != RESULT_SCHEMA:
+            print("基准文件格式版本不同，无法对比")
+            return 2
+        # 规模和重复次数不影响单项结果，其余参数或运行环境不同时提示
+        comparable = lambda config: {k: v for k, v in config.items() if k not in ("sizes", "repeat")}
+        if baseline.get("environment") != report["environment"]:
+            print("注意: 基准的运行环境与本次不同，对比结果仅供参考")
+        if comparable(baseline.get("config", {})) != comparable(config):
+            print("注意: 基准的测试参数与本次不同，对比结果仅供参考")
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} 项变慢: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,490 @@
+import os
+import re
+import html
+import json
+import time
+import struct
+import sqlite3
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+
+from 重命名引擎 import EXECUTOR_PROCESS, chunked_map, create_executor
+
+METADATA_CACHE_FILENAME = "元数据缓存.sqlite3"
+CACHE_MAX_ENTRIES = 500000  # 缓存最多保留的文件数，超出后淘汰最久未使用的记录
+METADATA_WORKERS = min(8, os.cpu_count() or 1)  # 读取元数据的进程数
+POOL_MIN_FILES = 64  # 需要读取的文件少于此数量时不启动进程池
+CHUNK_SIZE = 32  # 每次交给工作进程的文件数
+PDF_BYTES = 65536  # PDF 只读取开头和结尾的这么多字节
+TIFF_BYTES = 131072  # TIFF 图片只读取开头的这么多字节
+FINGERPRINT_BYTES = 65536  # 文件指纹使用的开头字节数
+CONTENT_TYPES = ("pdf", "docx")  # 可以读取正文的文件类型
+CONTENT_LINES = 12  # 读取正文时最多保留的行数
+CONTENT_POOL_MIN = 4  # 读取正文较慢，需要读取的文件达到此数量就使用进程池
+
+# 元数据字段: taken 拍摄时间（时间戳）、created 创建日期（时间戳）、title 文档标题、duration 时长（秒）
+
+def _exif_entries(data, order, offset):
+    """读取 TIFF 结构中的一个 IFD，返回 标签 -> (类型, 数量, 值或偏移)"""
+    (count,) = struct.unpack_from(order + "H", data, offset)
+    entries = {}
+    for i in range(count):
+        tag, kind, n, value = struct.unpack_from(order + "HHI4s", data, offset + 2 + i * 12)
+        entries[tag] = (kind, n, value)
+    return entries
+
+def _exif_text(data, order, entry):
+    kind, n, value = entry
+    if kind != 2:  # 只读取 ASCII 类型
+        return None
+    if n > 4:
+        (offset,) = struct.unpack(order + "I", value)
+        value = data[offset:offset + n]
+    return value[:n].split(b"\0")[0].decode("ascii", "ignore").strip()
+
+def _exif_time(text):
+    """解析 EXIF 时间 2024:01:02 03:04:05（相机的本地时间）"""
+    try:
+        return datetime.strptime(text[:19], "%Y:%m:%d %H:%M:%S").timestamp()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+def _parse_tiff(data):
+    """从 TIFF 结构（JPEG 中的 EXIF 也是这种结构）中读取拍摄时间"""
+    order = {b"II": "<", b"MM": ">"}.get(data[:2])
+    if order is None:
+        return {}
+    (offset,) = struct.unpack_from(order + "I", data, 4)
+    entries = _exif_entries(data, order, offset)
+    if 0x8769 in entries:  # EXIF 子目录
+        kind, n, value = entries[0x8769]
+        entries.update(_exif_entries(data, order, struct.unpack(order + "I", value)[0]))
+    # 依次使用 拍摄时间、数字化时间、文件修改时间
+    for tag in (0x9003, 0x9004, 0x0132):
+        if tag in entries:
+            taken = _exif_time(_exif_text(data, order, entries[tag]))
+            if taken is not None:
+                return {"taken": taken}
+    return {}
+
+def _read_jpeg(f, size):
+    """逐个读取 JPEG 段的头部，只读取 EXIF 段的内容，遇到图像数据即停止"""
+    if f.read(2) != b"\xff\xd8":
+        return {}
+    while True:
+        head = f.read(4)
+        if len(head) < 4 or head[0] != 0xFF or head[1] in (0xDA, 0xD9):
+            return {}
+        (length,) = struct.unpack(">H", head[2:])
+        if head[1] == 0xE1:
+            data = f.read(length - 2)
+            if data.startswith(b"Exif\0\0"):
+                return _parse_tiff(data[6:])
+        else:
+            f.seek(length - 2, 1)
+
+def _read_tiff(f, size):
+    return _parse_tiff(f.read(TIFF_BYTES))
+
+_PDF_ESCAPES = {ord("n"): 10, ord("r"): 13, ord("t"): 9, ord("b"): 8, ord("f"): 12}
+
+def _pdf_literal(data, pos):
+    """解析 PDF 中 ( 之后的字符串，处理转义和嵌套的括号"""
+    out = bytearray()
+    depth = 0
+    while pos < len(data):
+        c = data[pos]
+        if c == 0x5C:  # 反斜杠
+            pos += 1
+            c = data[pos] if pos < len(data) else 0
+            if 0x30 <= c <= 0x37:
+                digits = re.match(rb"[0-7]{1,3}", data[pos:pos + 3]).group()
+                out.append(int(digits, 8) & 0xFF)
+                pos += len(digits)
+                continue
+            if c not in (10, 13):  # 反斜杠加换行表示续行
+                out.append(_PDF_ESCAPES.get(c, c))
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            if depth == 0:
+                break
+            depth -= 1
+            out.append(c)
+        else:
+            out.append(c)
+        pos += 1
+    return bytes(out)
+
+def _pdf_text(raw):
+    """PDF 字符串转为文字: 带 BOM 的 UTF-16/UTF-8，否则按 UTF-8 或 Latin-1"""
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", "ignore")
+    if raw.startswith(b"\xef\xbb\xbf"):
+        return raw[3:].decode("utf-8", "ignore")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+def _pdf_value(obj, key):
+    """读取字典中 key 对应的字符串值（字面量或十六进制），没有时返回 None"""
+    match = re.search(rb"/" + key + rb"\s*([(<])", obj)
+    if not match:
+        return None
+    if match.group(1) == b"(":
+        return _pdf_text(_pdf_literal(obj, match.end()))
+    end = obj.find(b">", match.end())
+    hex_text = re.sub(rb"\s", b"", obj[match.end():end])
+    try:
+        return _pdf_text(bytes.fromhex((hex_text + b"0" * (len(hex_text) % 2)).decode("ascii")))
+    except ValueError:
+        return None
+
+def _pdf_date(text):
+    """解析 PDF 日期 D:20240102030405+08'00'，没有时区时按本地时间"""
+    match = re.match(r"(?:D:)?(\d{4})(\d\d)?(\d\d)?(\d\d)?(\d\d)?(\d\d)?([Zz+\-])?(\d\d)?'?(\d\d)?", text or "")
+    if not match:
+        return None
+    parts = match.groups()
+    tz = None
+    if parts[6] in ("Z", "z"):
+        tz = timezone.utc
+    elif parts[6]:
+        offset = timedelta(hours=int(parts[7] or 0), minutes=int(parts[8] or 0))
+        tz = timezone(offset if parts[6] == "+" else -offset)
+    try:
+        return datetime(int(parts[0]), int(parts[1] or 1), int(parts[2] or 1), int(parts[3] or 0),
+                        int(parts[4] or 0), int(parts[5] or 0), tzinfo=tz).timestamp()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+def _pdf_xref_object(f, start, number):
+    """按传统交叉引用表找到对象的位置，读取对象内容；交叉引用流等其他情况返回 None"""
+    f.seek(start)
+    head = f.read(64)
+    match = re.match(rb"xref\s+(\d+)\s+(\d+)\s*?\r?\n", head)
+    if not match:
+        return None
+    first, count = int(match.group(1)), int(match.group(2))
+    if not first <= number < first + count:
+        return None
+    f.seek(start + match.end() + 20 * (number - first))
+    entry = re.match(rb"(\d{10}) \d{5} n", f.read(20))
+    if not entry:
+        return None
+    f.seek(int(entry.group(1)))
+    return f.read(4096)
+
+def _read_pdf(f, size):
+    """从 PDF 的文档信息字典中读取标题和创建日期，读不到时使用 XMP 元数据"""
+    head = f.read(PDF_BYTES)
+    if not head.startswith(b"%PDF"):
+        return {}
+    tail = b""
+    if size > PDF_BYTES:
+        f.seek(max(PDF_BYTES, size - PDF_BYTES))
+        tail = f.read()
+    data = head + tail
+
+    info = None
+    refs = re.findall(rb"/Info\s+(\d+)\s+(\d+)\s+R", tail or head)
+    if refs:
+        number, generation = refs[-1]  # 增量更新的文件以最后一个 trailer 为准
+        match = re.search(rb"(?<!\d)" + number + rb"\s+" + generation + rb"\s+obj", data)
+        if match:
+            info = data[match.end():match.end() + 4096]
+        else:
+            starts = re.findall(rb"startxref\s+(\d+)", tail or head)
+            if starts:
+                info = _pdf_xref_object(f, int(starts[-1]), int(number))
+        if info is not None:
+            info = info.split(b"endobj")[0]
+
+    meta = {}
+    if info:
+        title = _pdf_value(info, b"Title")
+        created = _pdf_date(_pdf_value(info, b"CreationDate"))
+        if title and title.strip():
+            meta["title"] = title.strip()
+        if created is not None:
+            meta["created"] = created
+    if "title" not in meta:
+        match = re.search(rb"<dc:title>.*?<rdf:li[^>]*>(.*?)</rdf:li>", data, re.S)
+        if match and match.group(1).strip():
+            meta["title"] = html.unescape(match.group(1).decode("utf-8", "ignore")).strip()
+    if "created" not in meta:
+        match = re.search(rb"xmp:CreateDate(?:>|=\")([0-9T:+\-.Z]+)", data)
+        if match:
+            try:
+                meta["created"] = datetime.fromisoformat(match.group(1).decode().replace("Z", "+00:00")).timestamp()
+            except (ValueError, OverflowError, OSError):
+                pass
+    return meta
+
+def _read_wav(f, size):
+    """WAV: 数据块字节数 / 每秒字节数，跳过其他块的内容"""
+    if f.read(12)[8:] != b"WAVE":
+        return {}
+    byte_rate = None
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return {}
+        chunk, length = head[:4], struct.unpack("<I", head[4:])[0]
+        if chunk == b"fmt ":
+            fmt = f.read(length + length % 2)
+            byte_rate = struct.unpack_from("<I", fmt, 8)[0]
+        elif chunk == b"data":
+            return {"duration": length / byte_rate} if byte_rate else {}
+        else:
+            f.seek(length + length % 2, 1)
+
+def _read_flac(f, size):
+    """FLAC: STREAMINFO 中的总采样数 / 采样率"""
+    head = f.read(42)
+    if head[:4] != b"fLaC" or head[4] & 0x7F != 0:
+        return {}
+    value = int.from_bytes(head[18:26], "big")
+    rate, samples = value >> 44, value & ((1 << 36) - 1)
+    return {"duration": samples / rate} if rate and samples else {}
+
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia"}
+_MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc).timestamp()
+
+def _read_mp4(f, size):
+    """MP4/MOV: 按 atom 头部跳转找到 moov/mvhd，读取时长和创建时间"""
+    pos, end = 0, size
+    while pos + 8 <= end:
+        f.seek(pos)
+        head = f.read(16)
+        length, kind = struct.unpack(">I4s", head[:8])
+        header = 8
+        if length == 1:
+            length, header = struct.unpack(">Q", head[8:16])[0], 16
+        elif length == 0:
+            length = end - pos
+        if length < header:
+            return {}
+        if kind == b"mvhd":
+            f.seek(pos + header)
+            body = f.read(32)
+            if body[0] == 1:
+                created, _, scale, duration = struct.unpack_from(">QQIQ", body, 4)
+            else:
+                created, _, scale, duration = struct.unpack_from(">IIII", body, 4)
+            meta = {"duration": duration / scale} if scale else {}
+            if created:
+                meta["taken"] = _MP4_EPOCH + created
+            return meta
+        if kind in _MP4_CONTAINERS:
+            pos, end = pos + header, pos + length  # 进入容器
+        else:
+            pos += length
+    return {}
+
+def _read_avi(f, size):
+    """AVI: avih 中的每帧微秒数 × 总帧数"""
+    head = f.read(256)
+    if head[:4] != b"RIFF" or head[8:12] != b"AVI ":
+        return {}
+    pos = head.find(b"avih")
+    if pos < 0:
+        return {}
+    micro_per_frame, _, _, _, frames = struct.unpack_from("<5I", head, pos + 8)
+    return {"duration": micro_per_frame * frames / 1e6} if frames else {}
+
+_MP3_BITRATES = {1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+                 2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]}
+_MP3_RATES = [44100, 48000, 32000]
+
+def _read_mp3(f, size):
+    """MP3: 跳过 ID3 标签后读取第一帧，有 Xing/Info 帧数时按帧数计算，否则按固定码率估算"""
+    start = 0
+    head = f.read(10)
+    if head[:3] == b"ID3":
+        start = 10 + ((head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | head[9] & 0x7F)
+        if head[5] & 0x10:
+            start += 10  # 标签尾部
+    f.seek(start)
+    data = f.read(4096)
+    pos = 0
+    while True:
+        pos = data.find(b"\xff", pos)
+        if pos < 0 or pos + 4 > len(data):
+            return {}
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        version = (b1 >> 3) & 3  # 3: MPEG1, 2: MPEG2, 0: MPEG2.5
+        if b1 & 0xE0 == 0xE0 and version != 1 and (b1 >> 1) & 3 == 1 and 0 < b2 >> 4 < 15 and (b2 >> 2) & 3 < 3:
+            break
+        pos += 1
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[1 if mpeg1 else 2][b2 >> 4] * 1000
+    rate = _MP3_RATES[(b2 >> 2) & 3] >> (0 if mpeg1 else 1 if version == 2 else 2)
+    samples = 1152 if mpeg1 else 576
+    mono = b3 >> 6 == 3
+    side = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = pos + 4 + side
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        (flags,) = struct.unpack_from(">I", data, xing + 4)
+        if flags & 1:
+            (frames,) = struct.unpack_from(">I", data, xing + 8)
+            return {"duration": frames * samples / rate}
+    return {"duration": (size - start - pos) * 8 / bitrate}
+
+# 扩展名 -> 读取函数，每个函数只读取文件头部（MP4 按 atom 头部跳转）
+READERS = {
+    "jpg": _read_jpeg, "jpeg": _read_jpeg, "tif": _read_tiff, "tiff": _read_tiff,
+    "pdf": _read_pdf,
+    "wav": _read_wav, "flac": _read_flac, "mp3": _read_mp3, "avi": _read_avi,
+    "mp4": _read_mp4, "m4a": _read_mp4, "m4v": _read_mp4, "mov": _read_mp4, "3gp": _read_mp4,
+}
+
+def read_metadata(path):
+    """读取一个文件的元数据字典，不支持的类型或文件损坏时返回空字典"""
+    reader = READERS.get(os.path.splitext(path)[1].lower()[1:])
+    if reader is None:
+        return {}
+    try:
+        with open(path, "rb") as f:
+            return reader(f, os.fstat(f.fileno()).st_size)
+    except (OSError, ValueError, struct.error, IndexError, AttributeError):
+        return {}
+
+def map_files(func, paths, workers=METADATA_WORKERS, executor=None, min_files=POOL_MIN_FILES):
+    """按顺序返回每个文件的 func(路径)，文件较多时使用进程池（传入 executor 时使用共享的进程池）
+
+    每次只向进程池提交有限的几块，不会一次为全部文件创建任务。
+    """
+    if len(paths) < min_files or (executor is None and workers <= 1):
+        return [func(path) for path in paths]
+    if executor is not None:
+        return list(chunked_map(executor, func, paths, CHUNK_SIZE))
+    with create_executor(EXECUTOR_PROCESS, min(workers, len(paths))) as executor:
+        return list(chunked_map(executor, func, paths, CHUNK_SIZE))
+
+def read_metadata_many(paths, workers=METADATA_WORKERS):
+    """按顺序返回多个文件的元数据，文件较多时使用进程池同时读取"""
+    return map_files(read_metadata, paths, workers)
+
+def file_fingerprint(path):
+    """只与文件内容有关的指纹（大小和开头的内容），文件改名或复制后不变；无法读取时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read(FINGERPRINT_BYTES))
+            digest.update(str(os.fstat(f.fileno()).st_size).encode())
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+# 自动生成的无意义标题，如 "Microsoft Word - 新建文档.docx"、"untitled"
+_GENERATED_TITLE = re.compile(r"^(microsoft word - |untitled$|无标题)|\.(docx?|pdf|wps)$", re.I)
+
+def _pdf_first_lines(path):
+    """PDF 文档信息中的标题和第一页的文字；第一页的文字需要安装 pypdf"""
+    lines = []
+    title = read_metadata(path).get("title")
+    if title and not _GENERATED_TITLE.search(title):
+        lines.append(title)
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return lines  # 没有 pypdf 时只使用文档信息中的标题
+    import logging
+    logging.getLogger("pypdf").setLevel(logging.ERROR)  # 不输出格式不规范等警告
+    reader = PdfReader(path)  # 只解析交叉引用表，页面对象用到时才读取
+    if len(reader.pages):
+        lines += (reader.pages[0].extract_text() or "").splitlines()
+    return lines
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _docx_first_lines(path):
+    """DOCX 属性中的标题和正文开头的段落，边解压边解析，读够 CONTENT_LINES 段即停止"""
+    lines = []
+    with zipfile.ZipFile(path) as z:
+        try:
+            match = re.search(rb"<dc:title>([^<]*)</dc:title>", z.read("docProps/core.xml"))
+            if match and not _GENERATED_TITLE.search(match.group(1).decode("utf-8", "ignore")):
+                lines.append(html.unescape(match.group(1).decode("utf-8", "ignore")))
+        except KeyError:
+            pass
+        with z.open("word/document.xml") as f:
+            texts = []
+            for _, element in ET.iterparse(f):
+                if element.tag == _W + "t":
+                    texts.append(element.text or "")
+                elif element.tag == _W + "p":
+                    lines.append("".join(texts))
+                    texts = []
+                    element.clear()
+                    if sum(1 for line in lines if line.strip()) >= CONTENT_LINES:
+                        break
+    return lines
+
+def read_first_lines(path):
+    """读取 PDF 第一页或 DOCX 开头的非空文本行（含文档标题），用于内容匹配；失败时返回空列表"""
+    ext = os.path.splitext(path)[1].lower()[1:]
+    try:
+        if ext == "pdf":
+            lines = _pdf_first_lines(path)
+        elif ext == "docx":
+            lines = _docx_first_lines(path)
+        else:
+            return []
+    except Exception:  # 文件损坏、加密或格式不规范时 pypdf 等可能抛出各种异常
+        return []
+    lines = [" ".join(line.split()) for line in lines]
+    return [line for line in lines if line][:CONTENT_LINES]
+
+def evict_least_used(conn, table, max_entries):
+    """删除 SQLite 缓存表中最久未使用（used 最小）的记录，只保留 max_entries 条"""
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if count > max_entries:
+        conn.execute(f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} ORDER BY used LIMIT ?)",
+                     (count - max_entries,))
+
+class MetadataCache:
+    """保存在磁盘上的元数据缓存（SQLite），以 (路径, 大小, 修改时间) 为键
+
+    文件大小或修改时间变化后旧记录不再命中，重新读取后覆盖。
+    """
+
+    def __init__(self, path):
+        self.now = int(time.time())
+        self.conn = sqlite3.connect(path, timeout=10)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                          "data TEXT, used INTEGER)")
+
+    def lookup(self, files):
+        """files 为 (路径, 大小, 修改时间) 列表，返回 路径 -> 元数据，只包括仍然有效的记录"""
+        wanted = {path: (size, mtime) for path, size, mtime in files}
+        found = {}
+        paths = list(wanted)
+        for i in range(0, len(paths), 500):
+            batch = paths[i:i + 500]
+            rows = self.conn.execute(f"SELECT path, size, mtime, data FROM metadata WHERE path IN "
+                                     f"({','.join('?' * len(batch))})", batch).fetchall()
+            for path, size, mtime, data in rows:
+                if wanted[path] == (size, mtime):
+                    found[path] = json.loads(data)
+        if found:
+            self.conn.executemany("UPDATE metadata SET used = ? WHERE path = ?", ((self.now, path) for path in found))
+        return found
+
+    def store(self, items):
+        """items 为 (路径, 大小, 修改时间, 元数据) 列表"""
+        self.conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)",
+                              ((path, size, mtime, json.dumps(meta, ensure_ascii=False), self.now)
+                               for path, size, mtime, meta in items))
+
+    def close(self):
+        """淘汰超出容量的旧记录并写入磁盘"""
+        try:
+            evict_least_used(self.conn, "metadata", CACHE_MAX_ENTRIES)
+            self.conn.commit()
+        finally:
+            self.conn.close()
@@ -1,351 +1,609 @@
 import os
+import re
 import sys
-import glob
+import string
+import multiprocessing
 from datetime import datetime
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QLabel, QLineEdit, QComboBox, QListWidget,
-                             QFileDialog, QMessageBox, QGroupBox, QCheckBox, QSpinBox,
-                             QProgressBar, QTextEdit, QSplitter)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-
-class FileRenamerApp(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.initUI()
-        self.folder_path = ""
-        
-    def initUI(self):
-        self.setWindowTitle("文件重命名工具")
-        self.setGeometry(100, 100, 900, 700)
-        
-        # 中央部件
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        main_layout = QVBoxLayout(central_widget)
-        
-        # 创建分割器
-        splitter = QSplitter(Qt.Vertical)
-        
-        # 上部 - 控制面板
-        control_group = QGroupBox("重命名设置")
-        control_layout = QVBoxLayout()
-        
-        # 文件夹选择
-        folder_layout = QHBoxLayout()
-        self.folder_label = QLabel("未选择文件夹")
-        self.folder_label.setStyleSheet("QLabel { background-color: #f0f0f0; padding: 5px; }")
-        folder_btn = QPushButton("选择文件夹")
-        folder_btn.clicked.connect(self.select_folder)
-        folder_layout.addWidget(self.folder_label, 4)
-        folder_layout.addWidget(folder_btn, 1)
-        control_layout.addLayout(folder_layout)
-        
-        # 文件类型选择
-        type_layout = QHBoxLayout()
-        type_layout.addWidget(QLabel("文件类型:"))
-        self.file_type_combo = QComboBox()
-        self.file_type_combo.addItems(["所有文件", "PDF文件", "图片文件", "文本文件", "视频文件", "音频文件", "自定义"])
-        self.file_type_combo.currentTextChanged.connect(self.update_file_list)
-        type_layout.addWidget(self.file_type_combo)
-        
-        self.custom_ext_input = QLineEdit()
-        self.custom_ext_input.setPlaceholderText("输入扩展名，如: txt,docx (逗号分隔)")
-        self.custom_ext_input.setVisible(False)
-        type_layout.addWidget(self.custom_ext_input)
-        
-        control_layout.addLayout(type_layout)
-        
-        # 排序方式
-        sort_layout = QHBoxLayout()
-        sort_layout.addWidget(QLabel("排序方式:"))
-        self.sort_combo = QComboBox()
-        self.sort_combo.addItems(["修改时间(旧→新)", "修改时间(新→旧)", "文件名(A→Z)", "文件名(Z→A)", "文件大小(小→大)", "文件大小(大→小)"])
-        sort_layout.addWidget(self.sort_combo)
-        control_layout.addLayout(sort_layout)
-        
-        # 重命名规则
-        rename_layout = QHBoxLayout()
-        rename_layout.addWidget(QLabel("重命名规则:"))
-        self.rename_combo = QComboBox()
-        self.rename_combo.addItems(["序号+原文件名", "完全重命名", "日期+序号", "自定义格式"])
-        self.rename_combo.currentTextChanged.connect(self.toggle_custom_format)
-        rename_layout.addWidget(self.rename_combo)
-        
-        self.custom_format_input = QLineEdit()
-        self.custom_format_input.setPlaceholderText("使用 {index} {name} {ext} {date} 等变量")
-        self.custom_format_input.setVisible(False)
-        rename_layout.addWidget(self.custom_format_input)
-        control_layout.addLayout(rename_layout)
-        
-        # 序号设置
-        index_layout = QHBoxLayout()
-        index_layout.addWidget(QLabel("起始序号:"))
-        self.start_index_spin = QSpinBox()
-        self.start_index_spin.setRange(1, 9999)
-        self.start_index_spin.setValue(1)
-        index_layout.addWidget(self.start_index_spin)
-        
-        index_layout.addWidget(QLabel("序号位数:"))
-        self.digits_spin = QSpinBox()
-        self.digits_spin.setRange(1, 6)
-        self.digits_spin.setValue(3)
-        index_layout.addWidget(self.digits_spin)
-        control_layout.addLayout(index_layout)
-        
-        # 预览和操作按钮
-        btn_layout = QHBoxLayout()
-        self.preview_btn = QPushButton("预览重命名")
-        self.preview_btn.clicked.connect(self.preview_rename)
-        self.rename_btn = QPushButton("执行重命名")
-        self.rename_btn.clicked.connect(self.execute_rename)
-        self.rename_btn.setEnabled(False)
-        
-        btn_layout.addWidget(self.preview_btn)
-        btn_layout.addWidget(self.rename_btn)
-        control_layout.addLayout(btn_layout)
-        
-        control_group.setLayout(control_layout)
-        
-        # 下部 - 文件列表和日志
-        bottom_group = QGroupBox("文件列表和操作日志")
-        bottom_layout = QVBoxLayout()
-        
-        # 文件列表
-        self.file_list = QListWidget()
-        bottom_layout.addWidget(QLabel("文件列表:"))
-        bottom_layout.addWidget(self.file_list)
-        
-        # 进度条
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setVisible(False)
-        bottom_layout.addWidget(self.progress_bar)
-        
-        # 日志区域
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setMaximumHeight(150)
-        bottom_layout.addWidget(QLabel("操作日志:"))
-        bottom_layout.addWidget(self.log_text)
-        
-        bottom_group.setLayout(bottom_layout)
-        
-        # 添加到分割器
-        splitter.addWidget(control_group)
-        splitter.addWidget(bottom_group)
-        splitter.setSizes([300, 400])
-        
-        main_layout.addWidget(splitter)
-        
-        # 连接信号
-        self.file_type_combo.currentTextChanged.connect(self.toggle_custom_ext)
-        self.custom_ext_input.textChanged.connect(self.update_file_list)
-        self.sort_combo.currentTextChanged.connect(self.update_file_list)
-        
-    def toggle_custom_ext(self):
-        """切换自定义扩展名输入框的显示"""
-        if self.file_type_combo.currentText() == "自定义":
-            self.custom_ext_input.setVisible(True)
-        else:
-            self.custom_ext_input.setVisible(False)
-            
-    def toggle_custom_format(self):
-        """切换自定义格式输入框的显示"""
-        if self.rename_combo.currentText() == "自定义格式":
-            self.custom_format_input.setVisible(True)
-        else:
-            self.custom_format_input.setVisible(False)
-            
-    def select_folder(self):
-        """选择文件夹"""
-        folder = QFileDialog.getExistingDirectory(self, "选择文件夹")
-        if folder:
-            self.folder_path = folder
-            self.folder_label.setText(folder)
-            self.update_file_list()
-            
-    def get_file_extensions(self):
-        """获取选择的文件扩展名"""
-        file_type = self.file_type_combo.currentText()
-        if file_type == "所有文件":
-            return ["*"]
-        elif file_type == "PDF文件":
-            return ["pdf"]
-        elif file_type == "图片文件":
-            return ["jpg", "jpeg", "png", "gif", "bmp", "tiff"]
-        elif file_type == "文本文件":
-            return ["txt", "doc", "docx", "md", "rtf"]
-        elif file_type == "视频文件":
-            return ["mp4", "avi", "mov", "mkv", "wmv"]
-        elif file_type == "音频文件":
-            return ["mp3", "wav", "flac", "aac", "ogg"]
-        elif file_type == "自定义":
-            custom_ext = self.custom_ext_input.text().strip()
-            if custom_ext:
-                return [ext.strip() for ext in custom_ext.split(",")]
-        return ["*"]
-            
-    def update_file_list(self):
-        """更新文件列表"""
-        if not self.folder_path:
-            return
+
+from 运行统计 import RunStats
+from 重命名日志 import RenameJournal, new_journal_path, latest_journal
+from 重命名引擎 import (PLAN_RENAME, PLAN_UNCHANGED, PLAN_CONFLICT, PLAN_ERROR, FileRecord, extension_filter,
+                   list_folder, scan_files, plan_renames, apply_rename_plan, resume_journal, undo_journal)
+from 文件元数据 import METADATA_CACHE_FILENAME, METADATA_WORKERS, MetadataCache, read_metadata, read_metadata_many
+
+# 文件类型 -> 扩展名列表
+FILE_TYPES = {
+    "所有文件": ["*"],
+    "PDF文件": ["pdf"],
+    "图片文件": ["jpg", "jpeg", "png", "gif", "bmp", "tiff"],
+    "文本文件": ["txt", "doc", "docx", "md", "rtf"],
+    "视频文件": ["mp4", "avi", "mov", "mkv", "wmv"],
+    "音频文件": ["mp3", "wav", "flac", "aac", "ogg"],
+}
+
+SORT_METHODS = ["修改时间(旧→新)", "修改时间(新→旧)", "文件名(A→Z)", "文件名(Z→A)", "文件大小(小→大)", "文件大小(大→小)",
+                "拍摄/创建时间(旧→新)", "拍摄/创建时间(新→旧)", "时长(短→长)", "时长(长→短)", "文档标题(A→Z)"]
+RENAME_RULES = ["序号+原文件名", "完全重命名", "日期+序号", "自定义格式"]
+
+REPORT_FILE_PREFIX = "重命名统计_"
+STATE_FOLDER = ".文件重命名"  # 上级文件夹不可写时，重命名记录、运行统计和元数据缓存放在被重命名文件夹内的这个文件夹中
+ROOT_LABEL = "根目录"  # 重命名磁盘根目录时记录名称中代替文件夹名
+
+def parse_extensions(text):
+    """解析逗号分隔的自定义扩展名，为空时返回所有文件"""
+    text = text.strip()
+    if text:
+        return [ext.strip() for ext in text.split(",")]
+    return ["*"]
+
+class FolderSnapshot:
+    """文件夹中全部文件的缓存，切换文件类型和排序方式时只使用缓存，不再读取磁盘
+
+    文件夹内容变化时用 refresh_folder 重新列出发生变化的那一个文件夹，与缓存比较后
+    只替换新增、删除和大小或修改时间变化的文件记录。
+    """
+    
+    def __init__(self, folder_path, recursive=False):
+        self.folder_path = os.path.normpath(folder_path)
+        self.recursive = recursive
+        self.folders = {}  # 文件夹 -> {文件名: FileRecord}
+        self.prefixes = {}  # 文件夹 -> 相对路径前缀
+        self.sorted_records = None  # 按路径排序的全部文件记录，缓存变化时清空
+        
+    def scan(self, stats=None):
+        """完整扫描一次，文件夹本身无法访问时抛出 OSError"""
+        self.folders = {}
+        self.prefixes = {}
+        self.sorted_records = None
+        self._add_tree(self.folder_path, "", top=True)
+        if stats:
+            stats.count("files_stated", sum(len(files) for files in self.folders.values()))
+        return self
+        
+    def _add_tree(self, folder, prefix, top=False):
+        pending = [(folder, prefix)]
+        while pending:
+            folder, prefix = pending.pop()
+            try:
+                records, subfolders = list_folder(folder, prefix, lambda name: True)
+            except OSError:
+                if top and folder == self.folder_path:
+                    raise
+                continue
+            self.folders[folder] = {record.name: record for record in records}
+            self.prefixes[folder] = prefix
+            if self.recursive:
+                pending.extend(subfolders)
+                
+    def _drop_tree(self, folder):
+        for path in [path for path in self.folders if path == folder or path.startswith(folder + os.sep)]:
+            del self.folders[path]
+            del self.prefixes[path]
             
-        self.file_list.clear()
-        extensions = self.get_file_extensions()
-        
-        # 获取所有匹配的文件
-        all_files = []
-        for ext in extensions:
-            if ext == "*":
-                pattern = "*"
+    def refresh_folder(self, folder):
+        """重新列出一个已缓存的文件夹，返回 (新增, 删除, 修改) 的文件数"""
+        if folder not in self.folders:
+            return 0, 0, 0
+        old = self.folders[folder]
+        try:
+            records, subfolders = list_folder(folder, self.prefixes[folder], lambda name: True)
+        except OSError:
+            # 文件夹已被删除，去掉其中和子文件夹中的全部文件
+            removed = sum(len(files) for path, files in self.folders.items()
+                          if path == folder or path.startswith(folder + os.sep))
+            if folder != self.folder_path:
+                self._drop_tree(folder)
             else:
-                pattern = f"*.{ext}"
-            files = glob.glob(os.path.join(self.folder_path, pattern))
-            all_files.extend([f for f in files if os.path.isfile(f)])
-            
-        # 去重
-        all_files = list(set(all_files))
-        
-        # 排序
-        sort_method = self.sort_combo.currentText()
-        if sort_method == "修改时间(旧→新)":
-            all_files.sort(key=os.path.getmtime)
-        elif sort_method == "修改时间(新→旧)":
-            all_files.sort(key=os.path.getmtime, reverse=True)
-        elif sort_method == "文件名(A→Z)":
-            all_files.sort(key=lambda x: os.path.basename(x).lower())
-        elif sort_method == "文件名(Z→A)":
-            all_files.sort(key=lambda x: os.path.basename(x).lower(), reverse=True)
-        elif sort_method == "文件大小(小→大)":
-            all_files.sort(key=os.path.getsize)
-        elif sort_method == "文件大小(大→小)":
-            all_files.sort(key=os.path.getsize, reverse=True)
-            
-        # 显示文件列表
-        for file_path in all_files:
-            file_name = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path)
-            mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            item_text = f"{file_name} ({file_size//1024}KB, {mod_time.strftime('%Y-%m-%d %H:%M')})"
-            self.file_list.addItem(item_text)
-            
-        self.log_text.append(f"找到 {len(all_files)} 个文件")
-        
-    def generate_new_name(self, old_name, index):
-        """生成新文件名"""
-        name_without_ext, ext = os.path.splitext(old_name)
-        ext = ext.lower()
-        
-        index_str = str(index).zfill(self.digits_spin.value())
-        current_date = datetime.now().strftime("%Y%m%d")
-        
-        rule = self.rename_combo.currentText()
-        
-        if rule == "序号+原文件名":
-            return f"{index_str}_{old_name}"
-        elif rule == "完全重命名":
-            return f"{index_str}{ext}"
-        elif rule == "日期+序号":
-            return f"{current_date}_{index_str}{ext}"
-        elif rule == "自定义格式":
-            format_str = self.custom_format_input.text()
-            if format_str:
-                return format_str.format(
-                    index=index_str,
-                    name=name_without_ext,
-                    ext=ext[1:],  # 去掉点
-                    date=current_date,
-                    original=old_name
-                )
-            return old_name
-        return old_name
-        
-    def preview_rename(self):
-        """预览重命名结果"""
-        if not self.folder_path:
-            QMessageBox.warning(self, "警告", "请先选择文件夹！")
-            return
-            
-        self.log_text.clear()
-        self.log_text.append("=== 预览重命名结果 ===")
-        
-        file_items = [self.file_list.item(i) for i in range(self.file_list.count())]
-        if not file_items:
-            self.log_text.append("没有文件可重命名")
-            return
-            
-        start_index = self.start_index_spin.value()
-        
-        for i, item in enumerate(file_items):
-            # 从显示文本中提取原始文件名
-            original_text = item.text()
-            old_name = original_text.split(" ")[0]  # 获取文件名部分
-            
-            new_name = self.generate_new_name(old_name, start_index + i)
-            self.log_text.append(f"{i+1:03d}. {old_name} → {new_name}")
-            
-        self.rename_btn.setEnabled(True)
-        self.log_text.append("预览完成，可以执行重命名")
-        
-    def execute_rename(self):
-        """执行重命名操作"""
-        if not self.folder_path:
-            return
-            
-        reply = QMessageBox.question(self, "确认", "确定要执行重命名操作吗？此操作不可撤销！",
-                                   QMessageBox.Yes | QMessageBox.No)
-        if reply != QMessageBox.Yes:
-            return
-            
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setMaximum(self.file_list.count())
-        self.progress_bar.setValue(0)
-        
-        success_count = 0
-        error_count = 0
-        start_index = self.start_index_spin.value()
-        
-        self.log_text.append("=== 开始重命名 ===")
-        
-        for i in range(self.file_list.count()):
-            item = self.file_list.item(i)
-            original_text = item.text()
-            old_name = original_text.split(" ")[0]
-            old_path = os.path.join(self.folder_path, old_name)
-            
-            new_name = self.generate_new_name(old_name, start_index + i)
-            new_path = os.path.join(self.folder_path, new_name)
+                self.folders[folder] = {}
+            self.sorted_records = None
+            return 0, removed, 0
             
+        added = removed = updated = 0
+        new = {}
+        for record in records:
+            previous = old.get(record.name)
+            if previous is None:
+                added += 1
+            elif previous.size != record.size or previous.mtime != record.mtime:
+                updated += 1
+            else:
+                record = previous  # 没有变化的文件沿用原来的记录
+            new[record.name] = record
+        removed = sum(1 for name in old if name not in new)
+        self.folders[folder] = new
+        
+        if self.recursive:
+            current = {path for path, _ in subfolders}
+            for path in [path for path in self.folders if os.path.dirname(path) == folder and path not in current]:
+                removed += sum(len(files) for sub, files in self.folders.items()
+                               if sub == path or sub.startswith(path + os.sep))
+                self._drop_tree(path)
+            for path, prefix in subfolders:
+                if path not in self.folders:
+                    self._add_tree(path, prefix)
+                    added += sum(len(files) for sub, files in self.folders.items()
+                                 if sub == path or sub.startswith(path + os.sep))
+        if added or removed or updated:
+            self.sorted_records = None
+        return added, removed, updated
+        
+    def records(self, extensions):
+        """扩展名匹配的文件记录列表（新列表，按路径排序），只使用缓存"""
+        if self.sorted_records is None:
+            self.sorted_records = sorted((record for files in self.folders.values() for record in files.values()),
+                                         key=lambda r: r.relpath)
+        if "*" in extensions:
+            return list(self.sorted_records)
+        match = extension_filter(extensions)
+        return [record for record in self.sorted_records if match(record.name)]
+
+def record_metadata(record):
+    """文件的元数据字典，还没有读取时立即读取（应先用 load_metadata 批量读取）"""
+    if record.meta is None:
+        record.meta = read_metadata(record.path)
+    return record.meta
+
+def _content_time(record):
+    """照片的拍摄时间、视频的录制时间或 PDF 的创建日期，都没有时为修改时间"""
+    meta = record_metadata(record)
+    return meta.get("taken") or meta.get("created") or record.mtime
+
+def metadata_cache_path(folder_path):
+    """元数据缓存与运行统计放在同一个文件夹中，见 journal_directory"""
+    return os.path.join(journal_directory(folder_path, create=True)[0], METADATA_CACHE_FILENAME)
+
+def load_metadata(records, folder_path, workers=METADATA_WORKERS, stats=None):
+    """为还没有元数据的文件记录读取元数据，返回 (从文件读取的数量, 缓存命中的数量)
+
+    先查磁盘缓存（路径、大小和修改时间都相同才命中），其余文件只读取文件头部，
+    数量较多时使用进程池。缓存无法打开时照常读取，只是不保存。
+    """
+    pending = [record for record in records if record.meta is None]
+    if not pending:
+        return 0, 0
+    try:
+        cache = MetadataCache(metadata_cache_path(folder_path))
+    except Exception:  # sqlite3.Error 或文件夹不可写
+        cache = None
+    try:
+        found = cache.lookup([(r.path, r.size, r.mtime) for r in pending]) if cache else {}
+        missing = []
+        for record in pending:
+            meta = found.get(record.path)
+            if meta is None:
+                missing.append(record)
+            else:
+                record.meta = meta
+        for record, meta in zip(missing, read_metadata_many([r.path for r in missing], workers)):
+            record.meta = meta
+        if cache and missing:
+            cache.store([(r.path, r.size, r.mtime, r.meta) for r in missing])
+    finally:
+        if cache:
             try:
-                os.rename(old_path, new_path)
-                self.log_text.append(f"✓ 成功: {old_name} → {new_name}")
-                success_count += 1
-            except Exception as e:
-                self.log_text.append(f"✗ 失败: {old_name} → {str(e)}")
-                error_count += 1
-                
-            self.progress_bar.setValue(i + 1)
-            QApplication.processEvents()  # 更新UI
+                cache.close()
+            except Exception:
+                pass  # 缓存写入失败不影响本次结果
+    if stats:
+        stats.count("meta_read", len(missing))
+        stats.count("meta_cache_hits", len(found))
+    return len(missing), len(found)
+
+# 排序方式 -> (排序键, 是否倒序)
+SORT_KEYS = {
+    "修改时间(旧→新)": (lambda r: r.mtime, False),
+    "修改时间(新→旧)": (lambda r: r.mtime, True),
+    "文件名(A→Z)": (lambda r: r.name.lower(), False),
+    "文件名(Z→A)": (lambda r: r.name.lower(), True),
+    "文件大小(小→大)": (lambda r: r.size, False),
+    "文件大小(大→小)": (lambda r: r.size, True),
+    "拍摄/创建时间(旧→新)": (_content_time, False),
+    "拍摄/创建时间(新→旧)": (_content_time, True),
+    "时长(短→长)": (lambda r: record_metadata(r).get("duration", 0), False),
+    "时长(长→短)": (lambda r: record_metadata(r).get("duration", 0), True),
+    "文档标题(A→Z)": (lambda r: (record_metadata(r).get("title") or r.name).lower(), False),
+}
+METADATA_SORTS = set(SORT_METHODS[6:])  # 需要先读取文件元数据的排序方式
+
+def sort_files(records, sort_method):
+    """按选择的排序方式原地排序文件记录列表，相同时保持按路径的顺序"""
+    if sort_method in SORT_KEYS:
+        key, reverse = SORT_KEYS[sort_method]
+        records.sort(key=key, reverse=reverse)
+    return records
+
+class _Date(datetime):
+    """模板中的日期，不写格式时为 20240101，也可以写 {mtime:%Y-%m-%d}"""
+    
+    def __format__(self, spec):
+        return self.strftime(spec or "%Y%m%d")
+
+def _folder_name(record, number, state):
+    return os.path.basename(record.folder)
+
+def _ctime(record, number, state):
+    return _Date.fromtimestamp(os.stat(record.path).st_ctime)  # 只有模板用到时才读取文件信息
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+# Windows 保留的设备名，不区分大小写，带扩展名（如 CON.txt）也不能使用
+_RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL"} | {f"{prefix}{i}" for prefix in ("COM", "LPT") for i in range(1, 10)}
+
+def _unsafe_char_reason(name):
+    match = _UNSAFE_CHARS.search(name)
+    if not match:
+        return ""
+    char = match.group()
+    return f"文件名中不能包含 {char if char.isprintable() else repr(char)}"
+
+def invalid_name_reason(name):
+    """新文件名不能在 Windows 上使用的原因，可以使用时返回空字符串
+
+    其他系统允许的冒号、问号等字符也不允许，同一个模板在各个系统上得到相同的结果。
+    """
+    if not name or name in (".", ".."):
+        return "文件名无效"
+    if _unsafe_char_reason(name):
+        return _unsafe_char_reason(name)
+    if name[-1] in ". ":
+        return "文件名不能以点或空格结尾"
+    stem = name.split(".")[0].rstrip(" ")
+    if stem.upper() in _RESERVED_NAMES:
+        return f"{stem} 是系统保留的名称"
+    return ""
+
+def _title(record, number, state):
+    """文档标题，去掉文件名中不能使用的字符；没有标题时为原文件名（不含扩展名）"""
+    title = _UNSAFE_CHARS.sub("_", record_metadata(record).get("title", "")).strip(" .")
+    return title or os.path.splitext(record.name)[0]
+
+def _meta_date(key):
+    def get(record, number, state):
+        return _Date.fromtimestamp(record_metadata(record).get(key) or record.mtime)
+    return get
+
+def _ext_index(record, number, state):
+    """同一扩展名的文件中的序号，按调用顺序计数"""
+    ext = os.path.splitext(record.name)[1].lower()
+    count = state["ext_counts"].get(ext, state["start"])
+    state["ext_counts"][ext] = count + 1
+    return str(count).zfill(state["digits"])
+
+# 模板变量 -> (说明, 取值函数)，取值函数的参数为 (文件记录, 序号, 本次运行的状态)
+TEMPLATE_VARIABLES = {
+    "index": ("序号，按序号位数补零", lambda record, number, state: str(number).zfill(state["digits"])),
+    "n": ("序号数字，可写 {n:04d}", lambda record, number, state: number),
+    "extindex": ("同一扩展名的文件中的序号", _ext_index),
+    "name": ("原文件名（不含扩展名）", lambda record, number, state: os.path.splitext(record.name)[0]),
+    "ext": ("扩展名（小写，不含点）", lambda record, number, state: os.path.splitext(record.name)[1].lower()[1:]),
+    "suffix": ("扩展名（小写，含点）", lambda record, number, state: os.path.splitext(record.name)[1].lower()),
+    "original": ("原文件名", lambda record, number, state: record.name),
+    "folder": ("所在文件夹的名称", _folder_name),
+    "size": ("文件大小（字节）", lambda record, number, state: record.size),
+    "sizekb": ("文件大小（KB）", lambda record, number, state: record.size // 1024),
+    "date": ("今天的日期，可写 {date:%Y-%m-%d}", lambda record, number, state: state["today"]),
+    "mtime": ("修改时间，可写 {mtime:%Y%m%d_%H%M}", lambda record, number, state: _Date.fromtimestamp(record.mtime)),
+    "ctime": ("创建时间", _ctime),
+    "taken": ("拍摄时间（照片 EXIF、视频），没有时为修改时间", _meta_date("taken")),
+    "created": ("PDF 创建日期，没有时为修改时间", _meta_date("created")),
+    "title": ("PDF 文档标题，没有时为原文件名", _title),
+    "duration": ("音频、视频时长（秒），可写 {duration:04d}",
+                 lambda record, number, state: round(record_metadata(record).get("duration", 0))),
+}
+METADATA_VARIABLES = {"taken", "created", "title", "duration"}  # 需要先读取文件元数据的变量
+
+# 同一次运行中所有文件都相同的变量，编译时直接生成文字
+CONSTANT_VARIABLES = {"date"}
+
+# 变量后的转换: {name!u} 大写、{name!l} 小写、{name!t} 每个单词首字母大写
+TEMPLATE_CONVERSIONS = {"u": str.upper, "l": str.lower, "t": str.title}
+
+# 内置重命名规则对应的模板
+RULE_TEMPLATES = {
+    "序号+原文件名": "{index}_{original}",
+    "完全重命名": "{index}{suffix}",
+    "日期+序号": "{date}_{index}{suffix}",
+}
+
+_FIELD = re.compile(r"^([A-Za-z_]\w*)((?:\[[^\[\]]*\])*)$")
+_ACCESSOR = re.compile(r"\[([^\[\]]*)\]")
+
+def _parse_accessor(text):
+    """把 [3]、[:10]、[-4:] 解析为下标或切片"""
+    try:
+        if ":" not in text:
+            return int(text)
+        parts = [int(part) if part.strip() else None for part in text.split(":")]
+    except ValueError:
+        raise ValueError(f"无效的下标: [{text}]")
+    if len(parts) > 3:
+        raise ValueError(f"无效的切片: [{text}]")
+    return slice(*parts)
+
+def _compile_field(field_name, conversion, spec):
+    """编译模板中的一个变量，返回 (变量名, 由变量值生成文字的函数)"""
+    match = _FIELD.match(field_name)
+    if not match:
+        raise ValueError(f"无效的变量: {{{field_name}}}")
+    variable = match.group(1)
+    if variable not in TEMPLATE_VARIABLES:
+        raise ValueError(f"未知的变量: {{{variable}}}，可用的变量: {', '.join(TEMPLATE_VARIABLES)}")
+    accessors = [_parse_accessor(text) for text in _ACCESSOR.findall(match.group(2))]
+    if conversion and conversion not in TEMPLATE_CONVERSIONS:
+        raise ValueError(f"未知的转换: !{conversion}，可用的转换: !u 大写, !l 小写, !t 首字母大写")
+    if "{" in spec:
+        raise ValueError(f"格式中不能再使用变量: {{{field_name}:{spec}}}")
+    convert = TEMPLATE_CONVERSIONS.get(conversion)
+    
+    if not accessors and not convert:
+        return variable, lambda value: format(value, spec)
+        
+    def render(value):
+        text = value if isinstance(value, str) else format(value, "")
+        for accessor in accessors:
+            text = text[accessor]
+        if convert:
+            text = convert(text)
+        return format(text, spec)
+    return variable, render
+
+class RenameTemplate:
+    """编译后的重命名模板，编译时检查模板，之后每个文件只需按顺序拼接
+
+    只计算模板中用到的变量（如创建时间需要读取文件信息，没有用到时不读取）；
+    今天的日期在编译时确定，同一次运行中所有文件相同。模板无效时抛出 ValueError。
+    extindex 按调用顺序计数，每次运行需要重新编译。
+    """
+    
+    def __init__(self, template, digits, start_index=1):
+        self.template = template
+        self.state = {"digits": digits, "start": start_index, "today": _Date.now(), "ext_counts": {}}
+        self.parts = []  # 文字或 (变量名, 生成文字的函数)
+        try:
+            parsed = list(string.Formatter().parse(template))
+        except ValueError as e:
+            raise ValueError(f"模板格式错误: {str(e)}")
+        for literal, field_name, spec, conversion in parsed:
+            self._add_text(literal)
+            if field_name is None:
+                continue
+            if not field_name:
+                raise ValueError("模板中的 {} 需要写变量名，如 {index}")
+            variable, render = _compile_field(field_name, conversion, spec or "")
+            if variable in CONSTANT_VARIABLES:
+                try:
+                    self._add_text(render(TEMPLATE_VARIABLES[variable][1](None, 0, self.state)))
+                except (ValueError, TypeError, IndexError) as e:
+                    raise ValueError(f"模板格式错误: {{{field_name}}} {str(e)}")
+            else:
+                self.parts.append((variable, render))
+        self.getters = {part[0]: TEMPLATE_VARIABLES[part[0]][1] for part in self.parts if isinstance(part, tuple)}
+        self.needs_metadata = bool(METADATA_VARIABLES & set(self.getters))
+        self._check()
+        
+    def _add_text(self, text):
+        """追加固定文字，与前面的文字合并"""
+        if self.parts and isinstance(self.parts[-1], str):
+            self.parts[-1] += text
+        elif text:
+            self.parts.append(text)
             
-        self.progress_bar.setVisible(False)
-        self.log_text.append(f"=== 完成 ===")
-        self.log_text.append(f"成功: {success_count}, 失败: {error_count}")
+    def _check(self):
+        """用示例文件生成一次，提前发现格式与变量类型不符等错误"""
+        sample = FileRecord(os.curdir, "示例文件.txt", 0, 0.0, "示例文件.txt")
+        sample.meta = {}
+        values = {name: (_Date.now() if name == "ctime" else getter(sample, 1, dict(self.state, ext_counts={})))
+                  for name, getter in self.getters.items()}
+        try:
+            sample_name = self._render(values)
+        except IndexError:
+            return  # 下标超出示例文件名的长度，实际文件可能足够长
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"模板格式错误: {str(e)}")
+        # 模板本身写入或格式生成的字符（如 {mtime:%H:%M} 中的冒号）对每个文件都一样
+        reason = _unsafe_char_reason(sample_name)
+        if reason:
+            raise ValueError(f"模板格式错误: {reason}（示例: {sample_name}）")
+            
+    def _render(self, values):
+        return "".join(part if isinstance(part, str) else part[1](values[part[0]]) for part in self.parts)
         
-        # 更新文件列表
-        self.update_file_list()
-        self.rename_btn.setEnabled(False)
+    def __call__(self, record, number):
+        """生成一个文件的新文件名，number 为该文件的序号"""
+        state = self.state
+        return self._render({name: getter(record, number, state) for name, getter in self.getters.items()})
 
-def main():
-    app = QApplication(sys.argv)
-    app.setStyle('Fusion')  # 使用Fusion样式
+def compile_rename_rule(rule, digits, custom_format="", start_index=1):
+    """把重命名规则编译为 RenameTemplate，自定义格式为空时保留原文件名"""
+    if rule == "自定义格式":
+        template = custom_format or "{original}"
+    else:
+        template = RULE_TEMPLATES.get(rule, "{original}")
+    return RenameTemplate(template, digits, start_index)
+
+def build_rename_plan(records, rule, digits, start_index, custom_format=""):
+    """为按顺序排列的文件记录生成重命名计划，所有检查都用字典和集合完成
+
+    模板在这里编译一次，模板无效时抛出 ValueError，不生成任何新文件名。新文件名
+    不能在 Windows 上使用时（见 invalid_name_reason）标记为格式错误，不写入重命名记录。
+    """
+    template = compile_rename_rule(rule, digits, custom_format, start_index)
+    new_names = []
+    status = []
+    reasons = []
+    for i, record in enumerate(records):
+        try:
+            new_name = template(record, start_index + i)
+        except (ValueError, IndexError, OSError) as e:
+            new_names.append("")
+            status.append(PLAN_ERROR)
+            reasons.append(str(e))
+            continue
+        new_names.append(new_name)
+        reasons.append("" if new_name == record.name else invalid_name_reason(new_name))
+        if new_name == record.name:
+            status.append(PLAN_UNCHANGED)
+        elif reasons[-1]:
+            status.append(PLAN_ERROR)
+        else:
+            status.append(PLAN_RENAME)
+    return plan_renames(records, new_names, status, reasons)
+
+def rename_files(records, rule, digits, start_index, custom_format="", log=print, progress=None, stats=None,
+                 workers=1):
+    """按顺序重命名扫描得到的文件记录（每个文件在原文件夹中改名），返回 (成功数, 失败数)
+
+    先生成重命名计划再执行，参数见 apply_rename_plan。
+    """
+    stats = stats or RunStats("筛选重命名")
+    with stats.stage("plan"):
+        plan = build_rename_plan(records, rule, digits, start_index, custom_format)
+    return apply_rename_plan(plan, log, progress, stats, workers=workers)
+
+def journal_directory(folder_path, create=False):
+    """重命名记录、运行统计和元数据缓存所在的文件夹，返回 (所在文件夹, 记录名称)
+
+    默认放在被重命名文件夹的旁边。上级文件夹不可写、被重命名的是磁盘根目录或共享
+    文件夹的根，或者以前已经改放到文件夹内时，放在文件夹内的 STATE_FOLDER 中，
+    扫描时跳过以 . 开头的文件夹，不会被当作要重命名的文件。create 为 True 时
+    创建这个文件夹（创建失败时之后的写入会报告错误）。
+    """
+    folder_path = os.path.abspath(folder_path)
+    parent, label = os.path.split(folder_path)
+    inner = os.path.join(folder_path, STATE_FOLDER)
+    if label and not os.path.isdir(inner) and os.access(parent, os.W_OK):
+        return parent, label
+    if create:
+        try:
+            os.makedirs(inner, exist_ok=True)
+        except OSError:
+            pass
+    return inner, label or ROOT_LABEL
+
+def create_journal(folder_path):
+    """为一次重命名新建重命名记录（第一次写入时才创建文件）"""
+    directory, label = journal_directory(folder_path, create=True)
+    return RenameJournal(new_journal_path(directory, label), "筛选重命名", label, os.path.abspath(folder_path))
+
+def write_stats_report(folder_path, stats, log=print):
+    """在日志中写入运行统计摘要，并把完整报告保存到重命名记录所在的文件夹
+
+    报告不直接放在文件夹内，避免下次按"所有文件"重命名时被当作普通文件处理。
+    """
+    log(stats.summary())
+    directory, label = journal_directory(folder_path, create=True)
+    path = os.path.join(directory, f"{REPORT_FILE_PREFIX}{label}_{stats.started.strftime('%Y%m%d_%H%M%S')}.json")
+    try:
+        stats.write_report(path)
+    except OSError as e:
+        log(f"无法保存运行统计: {str(e)}")
+
+# 命令行中排序方式和重命名规则的英文名称
+SORT_ALIASES = {"mtime": "修改时间(旧→新)", "mtime-desc": "修改时间(新→旧)", "name": "文件名(A→Z)",
+                "name-desc": "文件名(Z→A)", "size": "文件大小(小→大)", "size-desc": "文件大小(大→小)",
+                "taken": "拍摄/创建时间(旧→新)", "taken-desc": "拍摄/创建时间(新→旧)", "duration": "时长(短→长)",
+                "duration-desc": "时长(长→短)", "title": "文档标题(A→Z)"}
+RULE_ALIASES = {"prefix": "序号+原文件名", "index": "完全重命名", "date": "日期+序号", "custom": "自定义格式"}
+
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="按排序结果给文件夹中的文件加上序号重命名")
+    parser.add_argument("folder", help="要重命名的文件夹")
+    parser.add_argument("--type", choices=list(FILE_TYPES), default="所有文件", help="文件类型，默认: 所有文件")
+    parser.add_argument("--ext", default="", help="自定义扩展名，如: txt,docx (逗号分隔)，指定后忽略 --type")
+    parser.add_argument("--sort", choices=list(SORT_ALIASES) + SORT_METHODS, default="mtime",
+                        help="排序方式: mtime/mtime-desc/name/name-desc/size/size-desc/taken(拍摄或创建时间)/"
+                             "taken-desc/duration(时长)/duration-desc/title(文档标题)，默认: mtime")
+    parser.add_argument("--rule", choices=list(RULE_ALIASES) + RENAME_RULES, default="prefix",
+                        help="重命名规则: prefix(序号+原文件名)/index(完全重命名)/date(日期+序号)/custom(自定义格式)，默认: prefix")
+    parser.add_argument("--format", default="",
+                        help="自定义格式，可使用变量 " + " ".join(f"{{{name}}}" for name in TEMPLATE_VARIABLES)
+                             + "，如 {name[:10]!u}_{mtime:%%Y%%m%%d}_{index}.{ext}")
+    parser.add_argument("--digits", type=int, default=3, choices=range(1, 7), metavar="1-6", help="序号位数，默认: 3")
+    parser.add_argument("--start", type=int, default=1, help="起始序号，默认: 1")
+    parser.add_argument("--recursive", action="store_true", help="包括子文件夹中的文件（各自在所在文件夹中改名）")
+    parser.add_argument("--workers", type=int, default=1, help="同时重命名的线程数，网络文件夹可以调大，默认: 1")
+    parser.add_argument("--meta-workers", type=int, default=METADATA_WORKERS,
+                        help=f"按元数据排序或命名时读取元数据的进程数，默认: {METADATA_WORKERS}")
+    parser.add_argument("--dry-run", action="store_true", help="只预览重命名结果，不修改文件")
+    parser.add_argument("--resume", action="store_true", help="按重命名记录继续上次中断的重命名，不重新扫描")
+    parser.add_argument("--undo", action="store_true", help="按重命名记录撤销上次重命名")
+    args = parser.parse_args(argv)
+
+    args.sort = SORT_ALIASES.get(args.sort, args.sort)
+    args.rule = RULE_ALIASES.get(args.rule, args.rule)
+    if args.rule == "自定义格式" and not args.format:
+        parser.error("自定义格式需要指定 --format")
+    try:
+        compile_rename_rule(args.rule, args.digits, args.format, args.start)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers < 1:
+        parser.error("--workers 至少为 1")
+    if args.meta_workers < 1:
+        parser.error("--meta-workers 至少为 1")
+    return args
+
+def main_cli(argv):
+    """命令行模式，返回进程退出码"""
+    args = parse_args(argv)
+    stats = RunStats("筛选重命名")
+    if args.resume or args.undo:
+        return journal_cli(args, stats)
+    extensions = parse_extensions(args.ext) if args.ext else FILE_TYPES[args.type]
+    with stats.stage("scan"):
+        records = scan_files(args.folder, extensions, args.recursive, stats)
+    template = compile_rename_rule(args.rule, args.digits, args.format, args.start)
+    if args.sort in METADATA_SORTS or template.needs_metadata:
+        with stats.stage("metadata"):
+            load_metadata(records, args.folder, args.meta_workers, stats)
+    with stats.stage("sort"):
+        sort_files(records, args.sort)
+    print(f"找到 {len(records)} 个文件")
     
-    # 设置字体
-    font = QFont("Microsoft YaHei", 10)
-    app.setFont(font)
+    with stats.stage("plan"):
+        plan = build_rename_plan(records, args.rule, args.digits, args.start, args.format)
     
-    window = FileRenamerApp()
-    window.show()
-    sys.exit(app.exec_())
+    if args.dry_run:
+        print("=== 预览重命名结果 ===")
+        for i, entry in enumerate(plan.entries):
+            line = f"{i+1:03d}. {entry.record.relpath} → {entry.new_name}"
+            if entry.status in (PLAN_CONFLICT, PLAN_ERROR):
+                line += f"  [{entry.status}: {entry.reason}]"
+            print(line)
+        print(plan.summary())
+        return 0
+        
+    print(plan.summary())
+    print("=== 开始重命名 ===")
+    success_count, error_count = apply_rename_plan(plan, stats=stats, workers=args.workers,
+                                                   journal=create_journal(args.folder))
+    print("=== 完成 ===")
+    print(f"成功: {success_count}, 失败: {error_count}")
+    write_stats_report(args.folder, stats)
+    return 0 if error_count == 0 else 1
+
+def journal_cli(args, stats):
+    """命令行中的 --resume 和 --undo，返回进程退出码"""
+    directory, label = journal_directory(args.folder)
+    state = latest_journal(directory, label, unfinished=args.resume)
+    if state is None:
+        print("没有中断的重命名" if args.resume else "没有可以撤销的重命名")
+        return 1
+    action = resume_journal if args.resume else undo_journal
+    success_count, error_count = action(state, stats=stats, workers=args.workers)
+    print("=== 完成 ===")
+    print(f"成功: {success_count}, 失败: {error_count}")
+    write_stats_report(args.folder, stats)
+    return 0 if error_count == 0 else 1
+
+def main():
+    # 打包为可执行程序后，读取元数据的进程池的子进程需要此调用
+    multiprocessing.freeze_support()
+    # 有命令行参数时使用命令行模式，不加载 PyQt5
+    if len(sys.argv) > 1:
+        sys.exit(main_cli(sys.argv[1:]))
+    from 筛选重命名界面 import run_gui
+    run_gui()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,635 @@
+import sys
+import time
+import threading
+from datetime import datetime
+from functools import partial
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                             QPushButton, QLabel, QLineEdit, QComboBox, QTableView,
+                             QFileDialog, QMessageBox, QGroupBox, QCheckBox, QSpinBox,
+                             QProgressBar, QTextEdit, QSplitter, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, QTimer, QFileSystemWatcher, pyqtSignal
+from PyQt5.QtGui import QFont, QColor
+
+from 筛选重命名 import (FILE_TYPES, SORT_METHODS, RENAME_RULES, FolderSnapshot, parse_extensions, sort_files,
+                   compile_rename_rule, build_rename_plan, create_journal, journal_directory, write_stats_report,
+                   TEMPLATE_VARIABLES, METADATA_SORTS, load_metadata)
+from 重命名引擎 import PLAN_RENAME, PLAN_CONFLICT, PLAN_ERROR, apply_rename_plan, resume_journal, undo_journal
+from 重命名日志 import latest_journal
+from 运行统计 import RunStats
+
+PROGRESS_INTERVAL = 0.1  # 重命名时最多每隔这么多秒刷新一次进度和日志
+FILTER_DELAY = 300  # 输入自定义扩展名停顿这么多毫秒后才刷新列表
+WATCH_DELAY = 500  # 文件夹变化后等待这么多毫秒再合并，一批改动只重新列出一次
+
+class PlanBuilder(QThread):
+    """在后台线程中生成重命名计划，完成后发出 built 信号，出错时发出 failed 信号"""
+    built = pyqtSignal(object)
+    failed = pyqtSignal(str)  # 错误信息
+    
+    def __init__(self, records, rule, digits, start_index, custom_format, folder_path, parent=None):
+        super().__init__(parent)
+        self.records = records
+        self.rename_args = (rule, digits, start_index, custom_format)
+        self.folder_path = folder_path
+        
+    def run(self):
+        rule, digits, start_index, custom_format = self.rename_args
+        try:
+            if compile_rename_rule(rule, digits, custom_format, start_index).needs_metadata:
+                load_metadata(self.records, self.folder_path)
+            plan = build_rename_plan(self.records, *self.rename_args)
+        except Exception as e:
+            self.failed.emit(f"生成重命名计划时发生错误: {str(e)}")
+            return
+        self.built.emit(plan)
+
+class MetadataLoader(QThread):
+    """在后台读取文件元数据（先查磁盘缓存，其余用进程池读取），完成后发出 loaded 信号，出错时发出 failed 信号"""
+    loaded = pyqtSignal(int, int, float)  # 从文件读取的数量, 缓存命中的数量, 用时
+    failed = pyqtSignal(str)  # 错误信息
+    
+    def __init__(self, records, folder_path, parent=None):
+        super().__init__(parent)
+        self.records = records
+        self.folder_path = folder_path
+        
+    def run(self):
+        start = time.perf_counter()
+        try:
+            read, cached = load_metadata(self.records, self.folder_path)
+        except Exception as e:
+            self.failed.emit(f"读取文件元数据时发生错误: {str(e)}")
+            return
+        self.loaded.emit(read, cached, time.perf_counter() - start)
+
+class RenameWorker(QThread):
+    """在后台线程中执行重命名，按时间间隔分批发送进度和日志，不逐个文件刷新界面
+
+    job 为 apply_rename_plan、resume_journal 或 undo_journal 绑定第一个参数后的函数。
+    job 出错时把错误写入日志，done 信号总会发出，界面不会一直停在改名状态。
+    """
+    progress = pyqtSignal(int, list)  # 已处理的文件数, 这段时间的日志
+    done = pyqtSignal(int, int)  # 成功数, 失败数
+    
+    def __init__(self, job, workers, stats, parent=None):
+        super().__init__(parent)
+        self.job = job
+        self.workers = workers
+        self.stats = stats
+        self.cancel_event = threading.Event()
+        self.messages = []
+        self.done_count = 0
+        self.last_emit = 0.0
+        
+    def cancel(self):
+        """请求取消，已经开始的改名会完成"""
+        self.cancel_event.set()
+        
+    def report(self, done):
+        self.done_count = done
+        if time.perf_counter() - self.last_emit >= PROGRESS_INTERVAL:
+            self.flush()
+            
+    def flush(self):
+        self.last_emit = time.perf_counter()
+        messages, self.messages = self.messages, []
+        self.progress.emit(self.done_count, messages)
+        
+    def run(self):
+        success_count = error_count = 0
+        try:
+            success_count, error_count = self.job(log=self.messages.append, progress=self.report, stats=self.stats,
+                                                  cancel=self.cancel_event, workers=self.workers)
+        except Exception as e:
+            self.messages.append(f"重命名过程中发生错误: {str(e)}")
+        finally:
+            self.flush()
+            self.done.emit(success_count, error_count)
+
+class FileTableModel(QAbstractTableModel):
+    """文件列表的表格模型，视图只会请求可见的行；预览后显示重命名计划"""
+    COLUMNS = ["原文件名", "新文件名", "大小", "修改时间", "状态"]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = []
+        self.plan = None  # 预览生成的重命名计划，与 records 一一对应
+        
+    def set_records(self, records):
+        """替换整个文件列表，同时清除预览"""
+        self.beginResetModel()
+        self.records = records
+        self.plan = None
+        self.endResetModel()
+        
+    def set_plan(self, plan):
+        """显示重命名计划，只通知视图刷新可见的行"""
+        self.plan = plan
+        if self.records:
+            self.dataChanged.emit(self.index(0, 1), self.index(len(self.records) - 1, len(self.COLUMNS) - 1))
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+        
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return section + 1
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        record = self.records[row]
+        
+        if role == Qt.TextAlignmentRole and column == 2:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.ForegroundRole and column == 4 and self.plan:
+            if self.plan.entries[row].status in (PLAN_CONFLICT, PLAN_ERROR):
+                return QColor("red")
+            return None
+        if role != Qt.DisplayRole:
+            return None
+            
+        if column == 0:
+            return record.relpath
+        if column == 2:
+            return f"{record.size//1024}KB"
+        if column == 3:
+            return datetime.fromtimestamp(record.mtime).strftime('%Y-%m-%d %H:%M')
+        if not self.plan:
+            return ""
+        entry = self.plan.entries[row]
+        if column == 1:
+            return entry.new_name
+        if entry.reason:
+            return f"{entry.status}: {entry.reason}"
+        if entry.temp_name:
+            return f"{PLAN_RENAME}（经临时文件名）"
+        return entry.status
+
+class FileRenamerApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.initUI()
+        self.folder_path = ""
+        self.plan_builder = None
+        self.metadata_loader = None
+        self.rename_worker = None
+        self.snapshot = None  # 当前文件夹的文件缓存，切换类型和排序时不再扫描
+        self.changed_folders = set()  # 监视到变化、还没有重新列出的文件夹
+        
+    def initUI(self):
+        self.setWindowTitle("文件重命名工具")
+        self.setGeometry(100, 100, 900, 700)
+        
+        # 中央部件
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        
+        # 创建分割器
+        splitter = QSplitter(Qt.Vertical)
+        
+        # 上部 - 控制面板
+        control_group = QGroupBox("重命名设置")
+        self.control_group = control_group
+        control_layout = QVBoxLayout()
+        
+        # 文件夹选择
+        folder_layout = QHBoxLayout()
+        self.folder_label = QLabel("未选择文件夹")
+        self.folder_label.setStyleSheet("QLabel { background-color: #f0f0f0; padding: 5px; }")
+        folder_btn = QPushButton("选择文件夹")
+        folder_btn.clicked.connect(self.select_folder)
+        folder_layout.addWidget(self.folder_label, 4)
+        folder_layout.addWidget(folder_btn, 1)
+        control_layout.addLayout(folder_layout)
+        
+        # 文件类型选择
+        type_layout = QHBoxLayout()
+        type_layout.addWidget(QLabel("文件类型:"))
+        self.file_type_combo = QComboBox()
+        self.file_type_combo.addItems(list(FILE_TYPES) + ["自定义"])
+        self.file_type_combo.currentTextChanged.connect(self.update_file_list)
+        type_layout.addWidget(self.file_type_combo)
+        
+        self.custom_ext_input = QLineEdit()
+        self.custom_ext_input.setPlaceholderText("输入扩展名，如: txt,docx (逗号分隔)")
+        self.custom_ext_input.setVisible(False)
+        type_layout.addWidget(self.custom_ext_input)
+        
+        self.recursive_check = QCheckBox("包含子文件夹")
+        self.recursive_check.stateChanged.connect(self.rescan_folder)
+        type_layout.addWidget(self.recursive_check)
+        
+        control_layout.addLayout(type_layout)
+        
+        # 排序方式
+        sort_layout = QHBoxLayout()
+        sort_layout.addWidget(QLabel("排序方式:"))
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItems(SORT_METHODS)
+        sort_layout.addWidget(self.sort_combo)
+        control_layout.addLayout(sort_layout)
+        
+        # 重命名规则
+        rename_layout = QHBoxLayout()
+        rename_layout.addWidget(QLabel("重命名规则:"))
+        self.rename_combo = QComboBox()
+        self.rename_combo.addItems(RENAME_RULES)
+        self.rename_combo.currentTextChanged.connect(self.toggle_custom_format)
+        rename_layout.addWidget(self.rename_combo)
+        
+        self.custom_format_input = QLineEdit()
+        self.custom_format_input.setPlaceholderText("如 {mtime:%Y%m%d}_{index}_{name}.{ext}")
+        self.custom_format_input.setToolTip(
+            "可用的变量:\n" + "\n".join(f"{{{name}}}  {desc}" for name, (desc, _) in TEMPLATE_VARIABLES.items())
+            + "\n\n取一部分: {name[:10]}　转换: {name!u} 大写, {name!l} 小写, {name!t} 首字母大写")
+        self.custom_format_input.setVisible(False)
+        rename_layout.addWidget(self.custom_format_input)
+        control_layout.addLayout(rename_layout)
+        
+        # 序号设置
+        index_layout = QHBoxLayout()
+        index_layout.addWidget(QLabel("起始序号:"))
+        self.start_index_spin = QSpinBox()
+        self.start_index_spin.setRange(1, 9999)
+        self.start_index_spin.setValue(1)
+        index_layout.addWidget(self.start_index_spin)
+        
+        index_layout.addWidget(QLabel("序号位数:"))
+        self.digits_spin = QSpinBox()
+        self.digits_spin.setRange(1, 6)
+        self.digits_spin.setValue(3)
+        index_layout.addWidget(self.digits_spin)
+        
+        index_layout.addWidget(QLabel("重命名线程数:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 16)
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip("网络文件夹每次改名都要等待服务器响应，可以调大同时改名")
+        index_layout.addWidget(self.workers_spin)
+        control_layout.addLayout(index_layout)
+        
+        # 预览和操作按钮
+        btn_layout = QHBoxLayout()
+        self.preview_btn = QPushButton("预览重命名")
+        self.preview_btn.clicked.connect(self.preview_rename)
+        self.rename_btn = QPushButton("执行重命名")
+        self.rename_btn.clicked.connect(self.execute_rename)
+        self.rename_btn.setEnabled(False)
+        
+        self.resume_btn = QPushButton("继续中断的重命名")
+        self.resume_btn.clicked.connect(self.resume_rename)
+        self.resume_btn.setEnabled(False)
+        self.undo_btn = QPushButton("撤销上次重命名")
+        self.undo_btn.clicked.connect(self.undo_rename)
+        self.undo_btn.setEnabled(False)
+        
+        btn_layout.addWidget(self.preview_btn)
+        btn_layout.addWidget(self.rename_btn)
+        btn_layout.addWidget(self.resume_btn)
+        btn_layout.addWidget(self.undo_btn)
+        control_layout.addLayout(btn_layout)
+        
+        control_group.setLayout(control_layout)
+        
+        # 下部 - 文件列表和日志
+        bottom_group = QGroupBox("文件列表和操作日志")
+        bottom_layout = QVBoxLayout()
+        
+        # 文件列表，由表格模型提供数据，只绘制可见的行
+        self.file_model = FileTableModel(self)
+        self.file_list = QTableView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setWordWrap(False)
+        self.file_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.file_list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # 不按内容计算行高
+        self.file_list.verticalHeader().setDefaultSectionSize(22)
+        header = self.file_list.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        header.setSectionResizeMode(1, QHeaderView.Stretch)
+        for column, width in ((2, 80), (3, 130), (4, 90)):
+            header.resizeSection(column, width)
+        bottom_layout.addWidget(QLabel("文件列表:"))
+        bottom_layout.addWidget(self.file_list)
+        
+        # 进度条和取消按钮
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel_rename)
+        self.cancel_btn.setVisible(False)
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_btn)
+        bottom_layout.addLayout(progress_layout)
+        
+        # 日志区域
+        self.log_text = QTextEdit()
+        self.log_text.setReadOnly(True)
+        self.log_text.setMaximumHeight(150)
+        bottom_layout.addWidget(QLabel("操作日志:"))
+        bottom_layout.addWidget(self.log_text)
+        
+        bottom_group.setLayout(bottom_layout)
+        
+        # 添加到分割器
+        splitter.addWidget(control_group)
+        splitter.addWidget(bottom_group)
+        splitter.setSizes([300, 400])
+        
+        main_layout.addWidget(splitter)
+        
+        # 输入扩展名时停顿后才刷新；文件夹变化时只重新列出变化的文件夹
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY)
+        self.filter_timer.timeout.connect(self.update_file_list)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(WATCH_DELAY)
+        self.watch_timer.timeout.connect(self.apply_folder_changes)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.folder_changed)
+        
+        # 连接信号
+        self.file_type_combo.currentTextChanged.connect(self.toggle_custom_ext)
+        self.custom_ext_input.textChanged.connect(self.filter_timer.start)
+        self.sort_combo.currentTextChanged.connect(self.update_file_list)
+        
+    def toggle_custom_ext(self):
+        """切换自定义扩展名输入框的显示"""
+        if self.file_type_combo.currentText() == "自定义":
+            self.custom_ext_input.setVisible(True)
+        else:
+            self.custom_ext_input.setVisible(False)
+            
+    def toggle_custom_format(self):
+        """切换自定义格式输入框的显示"""
+        if self.rename_combo.currentText() == "自定义格式":
+            self.custom_format_input.setVisible(True)
+        else:
+            self.custom_format_input.setVisible(False)
+            
+    def select_folder(self):
+        """选择文件夹"""
+        folder = QFileDialog.getExistingDirectory(self, "选择文件夹")
+        if folder:
+            self.folder_path = folder
+            self.folder_label.setText(folder)
+            self.rescan_folder()
+            self.update_journal_buttons()
+            
+    def update_journal_buttons(self):
+        """按上次的重命名记录启用继续和撤销按钮"""
+        directory, label = journal_directory(self.folder_path)
+        state = latest_journal(directory, label)
+        self.resume_btn.setEnabled(state is not None and not state.finished)
+        self.undo_btn.setEnabled(state is not None and bool(state.entries))
+        if state is not None and not state.finished:
+            self.log_text.append("上次重命名没有完成，可以继续或撤销")
+            
+    def get_file_extensions(self):
+        """获取选择的文件扩展名"""
+        file_type = self.file_type_combo.currentText()
+        if file_type == "自定义":
+            return parse_extensions(self.custom_ext_input.text())
+        return FILE_TYPES.get(file_type, ["*"])
+            
+    def rescan_folder(self):
+        """完整扫描文件夹，重建文件缓存和监视的文件夹列表"""
+        if not self.folder_path:
+            return
+        self.snapshot = FolderSnapshot(self.folder_path, self.recursive_check.isChecked()).scan()
+        self.changed_folders.clear()
+        self.watch_folders()
+        self.update_file_list()
+        
+    def watch_folders(self):
+        """让监视的文件夹与缓存中的文件夹一致"""
+        watched = set(self.watcher.directories())
+        wanted = set(self.snapshot.folders)
+        if watched - wanted:
+            self.watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.watcher.addPaths(list(wanted - watched))
+            
+    def folder_changed(self, path):
+        """文件夹内容变化，稍后合并，连续的变化只处理一次"""
+        self.changed_folders.add(path)
+        self.watch_timer.start()
+        
+    def apply_folder_changes(self):
+        """重新列出发生变化的文件夹，只把变化的文件合并到缓存中"""
+        if self.rename_worker and self.rename_worker.isRunning():
+            self.watch_timer.start()  # 重命名结束后会完整刷新
+            return
+        if not self.snapshot:
+            return
+        folders, self.changed_folders = self.changed_folders, set()
+        added = removed = updated = 0
+        for folder in folders:
+            a, r, u = self.snapshot.refresh_folder(folder)
+            added, removed, updated = added + a, removed + r, updated + u
+        self.watch_folders()
+        if added or removed or updated:
+            self.log_text.append(f"文件夹有变化: 新增 {added} 个, 删除 {removed} 个, 修改 {updated} 个")
+            self.update_file_list()
+            
+    def update_file_list(self):
+        """按文件类型和排序方式从缓存中更新文件列表，不读取磁盘"""
+        if not self.snapshot:
+            return
+            
+        extensions = self.get_file_extensions()
+        
+        # 缓存中已有全部文件的大小和修改时间，只需筛选和排序；表格只显示可见的行
+        records = self.snapshot.records(extensions)
+        sort_method = self.sort_combo.currentText()
+        self.rename_btn.setEnabled(False)  # 文件列表变化后需要重新预览
+        if sort_method in METADATA_SORTS and any(record.meta is None for record in records):
+            # 按元数据排序时先在后台读取，读完后再排序；读取期间不能预览
+            self.file_model.set_records(records)
+            self.preview_btn.setEnabled(False)
+            if not (self.metadata_loader and self.metadata_loader.isRunning()):
+                self.log_text.append("正在读取文件元数据...")
+                self.metadata_loader = MetadataLoader(records, self.folder_path, self)
+                self.metadata_loader.loaded.connect(self.metadata_loaded)
+                self.metadata_loader.failed.connect(self.worker_failed)
+                self.metadata_loader.start()
+            return
+        self.file_model.set_records(sort_files(records, sort_method))
+            
+        self.log_text.append(f"找到 {len(records)} 个文件")
+        
+    def metadata_loaded(self, read, cached, seconds):
+        """元数据读取完成，按当前的筛选和排序方式重新列出文件"""
+        self.log_text.append(f"读取元数据: 从文件读取 {read} 个，缓存命中 {cached} 个，用时 {seconds:.2f} 秒")
+        self.preview_btn.setEnabled(True)
+        self.update_file_list()
+        
+    def worker_failed(self, message):
+        """生成计划或读取元数据出错，报告错误并恢复预览按钮"""
+        self.log_text.append(message)
+        self.preview_btn.setEnabled(True)
+        QMessageBox.warning(self, "错误", message)
+        
+    def preview_rename(self):
+        """预览重命名结果"""
+        if not self.folder_path:
+            QMessageBox.warning(self, "警告", "请先选择文件夹！")
+            return
+            
+        self.log_text.clear()
+        self.log_text.append("=== 预览重命名结果 ===")
+        
+        if not self.file_model.records:
+            self.log_text.append("没有文件可重命名")
+            return
+            
+        # 先检查模板，无效时不生成计划
+        try:
+            compile_rename_rule(self.rename_combo.currentText(), self.digits_spin.value(),
+                                self.custom_format_input.text(), self.start_index_spin.value())
+        except ValueError as e:
+            self.log_text.append(str(e))
+            QMessageBox.warning(self, "警告", str(e))
+            return
+            
+        # 在后台生成重命名计划，执行时使用同一个计划
+        self.preview_btn.setEnabled(False)
+        self.rename_btn.setEnabled(False)
+        self.plan_builder = PlanBuilder(self.file_model.records, self.rename_combo.currentText(),
+                                        self.digits_spin.value(), self.start_index_spin.value(),
+                                        self.custom_format_input.text(), self.folder_path, self)
+        self.plan_builder.built.connect(self.show_plan)
+        self.plan_builder.failed.connect(self.worker_failed)
+        self.plan_builder.start()
+        
+    def show_plan(self, plan):
+        """在文件列表中显示生成好的重命名计划"""
+        self.preview_btn.setEnabled(not (self.metadata_loader and self.metadata_loader.isRunning()))
+        if self.sender() is not self.plan_builder or self.plan_builder.records is not self.file_model.records:
+            return  # 生成期间文件列表已经变化
+        self.file_model.set_plan(plan)
+        self.log_text.append(plan.summary())
+        if plan.pending:
+            self.rename_btn.setEnabled(True)
+            self.log_text.append("预览完成，新文件名见文件列表，可以执行重命名")
+        else:
+            self.log_text.append("没有需要重命名的文件")
+        
+    def execute_rename(self):
+        """执行重命名操作"""
+        plan = self.file_model.plan
+        if not self.folder_path or not plan:
+            return
+            
+        reply = QMessageBox.question(self, "确认", "确定要执行重命名操作吗？完成后可以用\"撤销上次重命名\"改回。",
+                                   QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+            
+        self.log_text.append("=== 开始重命名 ===")
+        self.start_worker(partial(apply_rename_plan, plan, journal=create_journal(self.folder_path)),
+                          len(plan.pending))
+        
+    def resume_rename(self):
+        """按重命名记录继续上次中断的重命名，不重新扫描和预览"""
+        directory, label = journal_directory(self.folder_path)
+        state = latest_journal(directory, label, unfinished=True)
+        if state is None:
+            self.log_text.append("没有中断的重命名")
+            return
+        self.log_text.append("=== 继续重命名 ===")
+        self.start_worker(partial(resume_journal, state), len(state.entries))
+        
+    def undo_rename(self):
+        """把上次重命名（包括中断的）改回原文件名"""
+        directory, label = journal_directory(self.folder_path)
+        state = latest_journal(directory, label)
+        if state is None:
+            self.log_text.append("没有可以撤销的重命名")
+            return
+        reply = QMessageBox.question(self, "确认", f"确定要把上次重命名的 {len(state.entries)} 个文件改回原文件名吗？",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        self.log_text.append("=== 撤销重命名 ===")
+        self.start_worker(partial(undo_journal, state), len(state.entries))
+        
+    def start_worker(self, job, total):
+        """在后台线程中改名，期间只能取消，不能修改设置"""
+        self.control_group.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(0)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setVisible(True)
+        
+        self.rename_worker = RenameWorker(job, self.workers_spin.value(), RunStats("筛选重命名"), self)
+        self.rename_worker.progress.connect(self.show_rename_progress)
+        self.rename_worker.done.connect(self.finish_rename)
+        self.rename_worker.start()
+        
+    def show_rename_progress(self, done, messages):
+        """显示后台线程分批发送的进度和日志"""
+        with self.rename_worker.stats.stage("progress"):
+            if messages:
+                self.log_text.append("\n".join(messages))
+            self.progress_bar.setValue(done)
+            
+    def cancel_rename(self):
+        """取消正在进行的重命名"""
+        if self.rename_worker and self.rename_worker.isRunning():
+            self.rename_worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.log_text.append("正在取消...")
+            
+    def finish_rename(self, success_count, error_count):
+        """重命名结束后报告结果并刷新文件列表"""
+        stats = self.rename_worker.stats
+        elapsed = stats.elapsed()
+        self.progress_bar.setVisible(False)
+        self.cancel_btn.setVisible(False)
+        self.control_group.setEnabled(True)
+        self.log_text.append(f"=== 完成 ===")
+        self.log_text.append(f"成功: {success_count}, 失败: {error_count}")
+        if elapsed > 0:
+            self.log_text.append(f"用时 {elapsed:.1f} 秒，平均每秒 {success_count / elapsed:.0f} 个文件")
+        
+        # 更新文件列表
+        with stats.stage("refresh"):
+            self.rescan_folder()
+        self.rename_btn.setEnabled(False)
+        self.update_journal_buttons()
+        write_stats_report(self.folder_path, stats, log=self.log_text.append)
+        
+    def closeEvent(self, event):
+        """关闭窗口时取消正在进行的重命名，并等待已经开始的改名完成"""
+        if self.rename_worker and self.rename_worker.isRunning():
+            self.rename_worker.cancel()
+            self.rename_worker.wait()
+        if self.metadata_loader and self.metadata_loader.isRunning():
+            self.metadata_loader.wait()
+        event.accept()
+
+def run_gui():
+    app = QApplication(sys.argv)
+    app.setStyle('Fusion')  # 使用Fusion样式
+    
+    # 设置字体
+    font = QFont("Microsoft YaHei", 10)
+    app.setFont(font)
+    
+    window = FileRenamerApp()
+    window.show()
+    sys.exit(app.exec_())
\ No newline at end of file
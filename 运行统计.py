@@ -0,0 +1,123 @@
+import json
+import time
+import heapq
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+SLOWEST_COUNT = 10  # 报告中保留的最慢文件数量
+
+# 报告中使用英文键，日志摘要中显示中文名称
+LABELS = {
+    "load": "读取表格",
+    "scan": "扫描文件夹",
+    "sort": "排序",
+    "match": "匹配",
+    "normalize": "规范化匹配",
+    "content": "内容匹配",
+    "output": "输出文件",
+    "output_wait": "等待输出",
+    "metadata": "读取元数据",
+    "plan": "生成重命名计划",
+    "rename": "重命名",
+    "log": "日志输出",
+    "progress": "界面更新",
+    "refresh": "刷新列表",
+    "job": "批量任务",
+    "rows": "表格行数",
+    "files_stated": "读取文件信息",
+    "compared": "相似度比较",
+    "pruned": "剪枝跳过",
+    "normalized_hits": "规范化匹配文件数",
+    "cache_hits": "缓存命中",
+    "content_read": "读取文件内容",
+    "content_cache_hits": "内容缓存命中",
+    "content_hits": "内容匹配文件数",
+    "files_output": "输出文件数",
+    "bytes_output": "输出字节数",
+    "files_skipped": "跳过未变化的文件",
+    "bytes_skipped": "跳过的字节数",
+    "stale_deleted": "删除多余文件",
+    "files_renamed": "重命名文件数",
+    "rename_failed": "重命名失败",
+    "temp_renames": "临时改名",
+    "rename_cancelled": "取消未改名",
+    "meta_read": "读取元数据文件数",
+    "meta_cache_hits": "元数据缓存命中",
+    "files": "文件数",
+    "matched": "匹配文件数",
+    "exact": "精确匹配",
+    "normalized": "规范化匹配",
+    "fuzzy": "模糊匹配",
+    "unmatched": "未匹配",
+    "output_failed": "输出失败",
+}
+
+class RunStats:
+    """一次运行的各阶段用时、计数和最慢的文件，两个工具共用
+
+    所有方法都是线程安全的，记录一次只需要一次加锁，可以在正常运行时一直开启。
+    阶段用时按名称累加，同一阶段可以多次进入；阶段之间可以嵌套（如日志输出
+    发生在匹配阶段中），因此各阶段之和可能大于总用时。
+    """
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.started = datetime.now()
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+        self.stages = {}  # 阶段名 -> 累计秒数，按首次出现的顺序
+        self.counters = {}  # 计数名 -> 数量
+        self.slowest = []  # (秒数, 阶段, 文件名) 小根堆，只保留最慢的几项
+
+    @contextmanager
+    def stage(self, name):
+        """统计 with 块的用时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, stage, item, seconds):
+        """记录单个文件的用时，只保留最慢的 SLOWEST_COUNT 项"""
+        with self.lock:
+            if len(self.slowest) < SLOWEST_COUNT:
+                heapq.heappush(self.slowest, (seconds, stage, item))
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, stage, item))
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def summary(self):
+        """一行摘要，写入日志"""
+        with self.lock:
+            parts = [f"{LABELS.get(name, name)} {seconds:.2f}秒" for name, seconds in self.stages.items()]
+            parts += [f"{LABELS.get(name, name)} {value}" for name, value in self.counters.items()]
+        return f"运行统计: 总用时 {self.elapsed():.2f}秒; " + ", ".join(parts)
+
+    def report(self):
+        with self.lock:
+            return {
+                "tool": self.tool,
+                "started": self.started.isoformat(timespec="seconds"),
+                "total_seconds": round(self.elapsed(), 6),
+                "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+                "slowest": [{"file": item, "stage": stage, "seconds": round(seconds, 6)}
+                            for seconds, stage, item in sorted(self.slowest, reverse=True)],
+            }
+
+    def write_report(self, path):
+        """把报告写入 JSON 文件，失败时抛出 OSError"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,542 @@
+import os
+import time
+import threading
+import uuid
+from collections import Counter, deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from 运行统计 import RunStats
+from 重命名日志 import RenameJournal, new_journal_path
+
+# 两个工具共用的重命名流程: 扫描 → 筛选 → 排序或匹配 → 生成计划 → 执行。
+# 扫描逐个文件夹进行，执行器中同时在途的任务数有上限，不会为每个文件预先创建任务；
+# 排序、预览和计划仍然需要全部文件的记录，每个文件保留一条。
+
+TEMP_FILE_PREFIX = "~重命名中_"  # 两阶段重命名时使用的临时文件名前缀
+
+# 重命名计划中每个文件的状态
+PLAN_RENAME = "待重命名"
+PLAN_UNCHANGED = "不变"
+PLAN_CONFLICT = "冲突"
+PLAN_ERROR = "格式错误"
+
+# 执行器类型，见 create_executor
+EXECUTOR_SERIAL = "serial"  # 在调用线程中依次执行
+EXECUTOR_THREAD = "thread"  # 线程池，适合重命名、复制等等待磁盘或网络的操作
+EXECUTOR_PROCESS = "process"  # 进程池，适合相似度计算、解析文件等耗费 CPU 的操作
+EXECUTORS = (EXECUTOR_SERIAL, EXECUTOR_THREAD, EXECUTOR_PROCESS)
+WINDOW_PER_WORKER = 4  # bounded_map 中每个工作线程（进程）最多同时在途的任务数
+
+class SerialExecutor:
+    """在调用线程中依次执行任务的执行器，接口与 concurrent.futures 的执行器相同"""
+    
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+        
+    def map(self, func, *iterables, timeout=None, chunksize=1):
+        return map(func, *iterables)
+        
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+def create_executor(kind, workers=1, **kwargs):
+    """创建 EXECUTORS 中的一种执行器，workers 不大于 1 时总是使用 SerialExecutor
+
+    kwargs 传给进程池（如 initializer、initargs）。
+    """
+    if kind not in EXECUTORS:
+        raise ValueError(f"未知的执行器类型: {kind}")
+    if kind == EXECUTOR_SERIAL or workers <= 1:
+        return SerialExecutor()
+    if kind == EXECUTOR_THREAD:
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, **kwargs)
+
+def bounded_map(executor, func, items, window=None):
+    """按输入顺序产出 func(项)，items 按需读取，同时最多有 window 个任务已提交而未取回结果
+
+    与 executor.map 不同，不会一开始就为全部输入创建任务，输入可以是生成器，内存占用与输入总量无关。
+    executor 为 None 或 SerialExecutor 时在调用线程中逐个计算。提前停止迭代时取消还没有开始的任务。
+    """
+    if executor is None or isinstance(executor, SerialExecutor):
+        yield from map(func, items)
+        return
+    window = window or WINDOW_PER_WORKER * (getattr(executor, "_max_workers", None) or os.cpu_count() or 1)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_chunks(items, size):
+    """把任意可迭代对象按顺序分成至多 size 项的列表"""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _apply_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+def chunked_map(executor, func, items, chunk_size, window=None):
+    """同 bounded_map，但每个任务处理 chunk_size 项，减少进程池的传输次数"""
+    for results in bounded_map(executor, partial(_apply_chunk, func), iter_chunks(items, chunk_size), window):
+        yield from results
+
+def run_matchers(items, matchers, stats=None):
+    """依次运行匹配器，每个匹配器只处理前面的匹配器没有匹配的项，返回最后仍未匹配的项
+
+    matchers 为 (阶段名, 匹配器) 列表。匹配器接收 (序号, 名称) 列表，自行记录匹配到的项，
+    按原顺序返回没有匹配的项；传入 stats 时按阶段名统计用时。
+    """
+    for stage, matcher in matchers:
+        if stats:
+            with stats.stage(stage):
+                items = matcher(items)
+        else:
+            items = matcher(items)
+    return items
+
+class FileRecord:
+    """扫描时得到的文件信息，之后的排序、显示和重命名都不再读取文件系统"""
+    __slots__ = ("folder", "name", "size", "mtime", "relpath", "meta")
+
+    def __init__(self, folder, name, size, mtime, relpath):
+        self.folder = folder  # 文件所在的文件夹
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.relpath = relpath  # 相对于扫描文件夹的路径，用于显示
+        self.meta = None  # 文件元数据（拍摄时间、时长等），按元数据排序或命名时才读取，见 load_metadata
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, self.name)
+
+def extension_filter(extensions):
+    """返回判断文件名是否匹配扩展名的函数，扩展名不区分大小写"""
+    if "*" in extensions:
+        return lambda name: True
+    exts = {ext.lower().lstrip(".") for ext in extensions if ext}
+    multi = tuple("." + ext for ext in exts if "." in ext)  # 如 tar.gz
+    
+    def match(name):
+        ext = name.rpartition(".")[2].lower()
+        if "." in name and ext in exts:
+            return True
+        return bool(multi) and name.lower().endswith(multi)
+    return match
+
+def list_folder(folder, prefix, match):
+    """列出一个文件夹，返回 (名称匹配的文件记录列表, 子文件夹 [(路径, 相对路径前缀)])
+
+    每个匹配的文件只读取一次文件信息，跳过以 . 开头的文件和文件夹，不列出指向文件夹的符号链接。
+    """
+    records = []
+    subfolders = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_file():
+                    if match(entry.name):
+                        st = entry.stat()
+                        records.append(FileRecord(folder, entry.name, st.st_size, st.st_mtime, prefix + entry.name))
+                elif entry.is_dir(follow_symlinks=False):
+                    subfolders.append((entry.path, prefix + entry.name + os.sep))
+            except OSError:
+                continue  # 扫描期间被删除的文件
+    return records, subfolders
+
+def iter_files(folder_path, extensions=("*",), recursive=False, stats=None):
+    """逐个产出扩展名匹配的文件记录，不排序，只保留当前文件夹的文件列表和待扫描的子文件夹
+
+    每个匹配的文件只读取一次文件信息；跳过以 . 开头的文件和文件夹。
+    recursive 为 True 时包括子文件夹中的文件（不进入指向文件夹的符号链接）。
+    """
+    match = extension_filter(extensions)
+    pending = [(folder_path, "")]
+    while pending:
+        folder, prefix = pending.pop()
+        try:
+            found, subfolders = list_folder(folder, prefix, match)
+        except OSError:
+            if folder == folder_path:
+                raise
+            continue  # 子文件夹无法访问时跳过
+        if stats:
+            stats.count("files_stated", len(found))
+        yield from found
+        if recursive:
+            pending.extend(subfolders)
+
+def scan_files(folder_path, extensions, recursive=False, stats=None):
+    """扫描文件夹，返回扩展名匹配的文件记录列表（按路径排序），见 iter_files"""
+    return sorted(iter_files(folder_path, extensions, recursive, stats), key=lambda r: r.relpath)
+
+# status 为 PLAN_* 之一；reason 说明冲突或格式错误的原因；
+# temp_name 不为空时该文件先改为临时文件名，第二阶段再改为新文件名
+PlanEntry = namedtuple("PlanEntry", ["record", "new_name", "status", "reason", "temp_name"])
+
+def _name_key(folder, name):
+    """比较文件名时使用的键，在不区分大小写的系统（Windows）上忽略大小写"""
+    return folder, os.path.normcase(name)
+
+def _folder_names(folders):
+    """列出每个文件夹中现有的全部文件名（包括隐藏文件和其他类型的文件），返回键的集合"""
+    keys = set()
+    for folder in folders:
+        try:
+            with os.scandir(folder) as it:
+                keys.update(_name_key(folder, entry.name) for entry in it)
+        except OSError:
+            continue
+    return keys
+
+class RenamePlan:
+    """一次重命名的完整计划：每个文件的新文件名和状态，生成后不再修改
+
+    预览显示的和执行时使用的是同一个计划。新文件名与其他文件的新文件名相同、
+    或者目标文件已存在且不会被移走时标记为冲突，不会改名。新文件名是另一个
+    待改名文件的原文件名时（如 A→B 同时 B→C，或 A→B 同时 B→A），被占用的
+    文件先改为临时文件名，再统一改为新文件名。
+    """
+    
+    def __init__(self, entries, token, ids=None):
+        self.entries = tuple(entries)
+        self.token = token  # 临时文件名中使用的随机串
+        # 每项在重命名记录中的编号，继续中断的重命名时沿用原来的编号
+        self.ids = tuple(ids) if ids is not None else tuple(range(len(self.entries)))
+        self.counts = Counter(entry.status for entry in self.entries)
+        self.pending = tuple(entry for entry in self.entries if entry.status == PLAN_RENAME)
+        self.temp_count = sum(1 for entry in self.pending if entry.temp_name)
+        
+    def __len__(self):
+        return len(self.entries)
+        
+    def summary(self):
+        """一行摘要，用于日志"""
+        text = (f"共 {len(self.entries)} 个文件: 待重命名 {self.counts[PLAN_RENAME]}, "
+                f"不变 {self.counts[PLAN_UNCHANGED]}, 冲突 {self.counts[PLAN_CONFLICT]}, "
+                f"格式错误 {self.counts[PLAN_ERROR]}")
+        if self.temp_count:
+            text += f"; 其中 {self.temp_count} 个需要先改为临时文件名"
+        return text
+        
+    def validate(self):
+        """检查生成计划之后文件夹是否发生了变化，返回问题列表，为空时可以执行
+
+        每个文件夹只列出一次，之后都是集合查找。
+        """
+        existing = _folder_names({entry.record.folder for entry in self.pending})
+        sources = {_name_key(entry.record.folder, entry.record.name) for entry in self.pending}
+        problems = []
+        for entry in self.pending:
+            folder = entry.record.folder
+            if _name_key(folder, entry.record.name) not in existing:
+                problems.append(f"源文件已不存在: {entry.record.relpath}")
+            target = _name_key(folder, entry.new_name)
+            if target in existing and target not in sources:
+                problems.append(f"目标文件已存在: {entry.record.relpath} → {entry.new_name}")
+            if entry.temp_name and _name_key(folder, entry.temp_name) in existing:
+                problems.append(f"临时文件已存在: {entry.temp_name}")
+        return problems
+
+def plan_renames(records, new_names, status=None, reasons=None):
+    """检查新文件名之间和与现有文件的冲突，给需要的文件分配临时文件名，返回计划
+
+    status 和 reasons 为每个文件的初始状态（PLAN_*）和原因，默认全部待重命名。
+    """
+    status = list(status) if status is not None else [PLAN_RENAME] * len(records)
+    reasons = list(reasons) if reasons is not None else [""] * len(records)
+    token = uuid.uuid4().hex[:8]
+    sources = [_name_key(record.folder, record.name) for record in records]
+    targets = [_name_key(record.folder, name) for record, name in zip(records, new_names)]
+    
+    # 新文件名相同的文件都不改名
+    target_counts = Counter(targets[i] for i in range(len(records)) if status[i] == PLAN_RENAME)
+    for i in range(len(records)):
+        if status[i] == PLAN_RENAME and target_counts[targets[i]] > 1:
+            status[i] = PLAN_CONFLICT
+            reasons[i] = "与其他文件的新文件名相同"
+            
+    moving = {sources[i] for i in range(len(records)) if status[i] == PLAN_RENAME}
+    targeted_by = {targets[i]: i for i in range(len(records)) if status[i] == PLAN_RENAME}
+    existing = _folder_names({record.folder for record in records})
+    
+    # 目标文件已存在且不会被移走时冲突；冲突的文件留在原处，又会使以它为目标的文件冲突
+    pending = [(i, "目标文件已存在") for i in range(len(records))
+               if status[i] == PLAN_RENAME and targets[i] != sources[i]
+               and targets[i] in existing and targets[i] not in moving]
+    while pending:
+        i, reason = pending.pop()
+        if status[i] != PLAN_RENAME:
+            continue
+        status[i] = PLAN_CONFLICT
+        reasons[i] = reason
+        moving.discard(sources[i])
+        j = targeted_by.get(sources[i])
+        if j is not None and j != i:
+            pending.append((j, f"目标文件 {new_names[j]} 因冲突不会被移走"))
+            
+    entries = []
+    for i, record in enumerate(records):
+        temp_name = ""
+        if status[i] == PLAN_RENAME and targeted_by.get(sources[i], i) != i:
+            temp_name = f"{TEMP_FILE_PREFIX}{token}_{i}{os.path.splitext(record.name)[1]}"
+        entries.append(PlanEntry(record, new_names[i], status[i], reasons[i], temp_name))
+    return RenamePlan(entries, token)
+
+def apply_rename_plan(plan, log=print, progress=None, stats=None, cancel=None, workers=1, journal=None,
+                      failures=None):
+    """执行重命名计划，返回 (成功数, 失败数)，冲突和格式错误的文件计为失败
+
+    先检查文件夹是否在生成计划后发生了变化，有变化时不修改任何文件。
+    第一阶段把被其他文件占用为目标的文件改为临时文件名，第二阶段把所有文件改为
+    新文件名；改名失败的文件尽量恢复原文件名，并且不会被其他文件覆盖。
+    progress 为可选的回调函数，每处理完一个文件调用一次，参数为已处理的文件数；
+    传入 stats 时分别统计重命名、日志输出和界面更新的用时。
+    cancel 为可选的 threading.Event，设置后不再开始新的改名；用了临时文件名的
+    文件总是先全部完成，取消时不会留下临时文件。workers 大于 1 时用线程池同时
+    改名，适合网络文件夹；日志和 progress 仍然在调用线程中按计划顺序调用。
+    传入 journal（RenameJournal）时先把计划写入磁盘，再记录每一步的完成情况，
+    用于中断后继续和撤销；计划无法写入记录时不修改任何文件。传入 failures（dict）
+    时把每个没有改名的文件的原因按相对路径写入其中。
+    """
+    stats = stats or RunStats("重命名")
+    failures = {} if failures is None else failures
+    skipped = [entry for entry in plan.entries if entry.status in (PLAN_CONFLICT, PLAN_ERROR)]
+    for entry in skipped:
+        log(f"✗ 跳过: {entry.record.relpath} → {entry.status}: {entry.reason}")
+        failures[entry.record.relpath] = f"{entry.status}: {entry.reason}"
+        
+    problems = plan.validate()
+    if problems:
+        for problem in problems:
+            log(f"✗ {problem}")
+        log("文件夹在预览后发生了变化，没有修改任何文件，请重新预览")
+        for entry in plan.pending:
+            failures[entry.record.relpath] = "文件夹在预览后发生了变化"
+        stats.count("rename_failed", len(plan.pending) + len(skipped))
+        if journal:
+            journal.close()
+        return 0, len(plan.pending) + len(skipped)
+        
+    ids = dict(zip(plan.entries, plan.ids))
+    lock = threading.Lock()
+    current = {}  # 已改为临时文件名的计划项 -> 临时文件路径
+    occupied = set()  # 仍被未能移走的文件占用的文件名，不能作为目标
+    claimed = set()  # 已经改好或正在改的新文件名
+    failed = set()
+    
+    def move_to_temp(entry):
+        """第一阶段: 腾出被其他文件作为目标的文件名"""
+        record = entry.record
+        temp_path = os.path.join(record.folder, entry.temp_name)
+        start = time.perf_counter()
+        try:
+            os.rename(record.path, temp_path)
+            with lock:
+                current[entry] = temp_path
+            message = None
+        except OSError as e:
+            with lock:
+                failed.add(entry)
+                occupied.add(_name_key(record.folder, record.name))
+                failures[record.relpath] = str(e)
+            message = f"✗ 失败: {record.relpath} → {str(e)}"
+        stats.add_time("rename", time.perf_counter() - start)
+        return message
+        
+    def move_to_target(entry):
+        """第二阶段: 改为新文件名，返回 (是否成功, 日志, 用时)，已取消时返回 None"""
+        if entry not in current and cancel is not None and cancel.is_set():
+            return None
+        record = entry.record
+        target = _name_key(record.folder, entry.new_name)
+        source = _name_key(record.folder, record.name)
+        start = time.perf_counter()
+        with lock:
+            blocked = target in occupied
+            if not blocked:
+                claimed.add(target)  # 先占用目标，失败的文件就不会恢复到这个文件名
+        try:
+            if blocked:
+                raise OSError(f"目标文件 {entry.new_name} 未能移走")
+            os.rename(current.get(entry, record.path), os.path.join(record.folder, entry.new_name))
+            ok, message = True, f"✓ 成功: {record.relpath} → {entry.new_name}"
+        except OSError as e:
+            ok, message = False, f"✗ 失败: {record.relpath} → {str(e)}"
+            with lock:
+                failures[record.relpath] = str(e)
+                if not blocked:
+                    claimed.discard(target)
+                # 原文件名还没有被其他文件占用时恢复，否则留在临时文件名
+                restore = entry in current and source not in claimed
+                occupied.add(source)
+            if entry in current:
+                try:
+                    if not restore:
+                        raise OSError
+                    os.rename(current[entry], record.path)
+                except OSError:
+                    message += f"（文件保留为 {entry.temp_name}）"
+        return ok, message, time.perf_counter() - start
+        
+    def run(func, entries):
+        return bounded_map(executor, func, entries)
+    success_count = 0
+    error_count = len(skipped)
+    cancelled = 0
+    executor = None
+    try:
+        if journal:
+            try:
+                journal.add_entries((ids[entry], entry.record.folder, entry.record.name, entry.new_name,
+                                     entry.temp_name) for entry in plan.pending)
+            except OSError as e:
+                log(f"✗ 无法写入重命名记录 {journal.path}: {str(e)}")
+                log("没有修改任何文件")
+                for entry in plan.pending:
+                    failures[entry.record.relpath] = "无法写入重命名记录"
+                stats.count("rename_failed", len(plan.pending) + len(skipped))
+                return 0, len(plan.pending) + len(skipped)
+        executor = create_executor(EXECUTOR_THREAD, workers)
+        temp_entries = [entry for entry in plan.pending if entry.temp_name]
+        for entry, message in zip(temp_entries, run(move_to_temp, temp_entries)):
+            if message:
+                log(message)
+                error_count += 1
+            elif journal:
+                journal.mark("temp", ids[entry])
+        if journal:
+            journal.commit()  # 第二阶段开始前确认第一阶段的记录已写入磁盘
+            
+        # 用了临时文件名的文件排在前面，取消时它们已经全部完成
+        order = sorted((entry for entry in plan.pending if entry not in failed), key=lambda e: not e.temp_name)
+        done = len(failed)
+        for entry, result in zip(order, run(move_to_target, order)):
+            if result is None:
+                cancelled += 1
+                failures[entry.record.relpath] = "已取消"
+                continue
+            ok, message, seconds = result
+            if ok:
+                success_count += 1
+                if journal:
+                    journal.mark("done", ids[entry])
+            else:
+                error_count += 1
+            stats.add_time("rename", seconds)
+            stats.observe("rename", entry.record.relpath, seconds)
+            logged = time.perf_counter()
+            log(message)
+            stats.add_time("log", time.perf_counter() - logged)
+            
+            done += 1
+            if progress:
+                updated = time.perf_counter()
+                progress(done)
+                stats.add_time("progress", time.perf_counter() - updated)
+        if journal:
+            journal.finish(cancelled > 0)
+    finally:
+        try:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        finally:
+            if journal:
+                journal.close()
+            
+    if cancelled:
+        log(f"已取消，{cancelled} 个文件没有重命名")
+    stats.count("files_renamed", success_count)
+    stats.count("rename_failed", error_count)
+    stats.count("temp_renames", len(current))
+    if cancelled:
+        stats.count("rename_cancelled", cancelled)
+    return success_count, error_count
+
+def _journal_record(state, folder, name):
+    root = state.root or folder
+    return FileRecord(folder, name, 0, 0.0, os.path.relpath(os.path.join(folder, name), root))
+
+def resume_plan(state):
+    """按记录中每个文件现在的位置生成继续执行的计划，只检查记录中的文件，不扫描文件夹"""
+    entries = []
+    ids = []
+    for entry_id, (folder, src, dst, temp) in state.entries.items():
+        name = state.locate(entry_id)
+        if name == dst and name != src:
+            continue  # 已经完成
+        if name is None:
+            entry = PlanEntry(_journal_record(state, folder, src), dst, PLAN_CONFLICT, "文件已不存在", "")
+        elif temp and name == temp:
+            entry = PlanEntry(_journal_record(state, folder, temp), dst, PLAN_RENAME, "", "")
+        else:
+            entry = PlanEntry(_journal_record(state, folder, src), dst, PLAN_RENAME, "", temp)
+        entries.append(entry)
+        ids.append(entry_id)
+    return RenamePlan(entries, "", ids)
+
+def undo_plan(state):
+    """把记录中已经改名（或停在临时文件名）的文件改回原文件名的计划，同样检查冲突和循环"""
+    records = []
+    new_names = []
+    for entry_id, (folder, src, dst, temp) in state.entries.items():
+        name = state.locate(entry_id)
+        if name is None or name == src:
+            continue
+        records.append(_journal_record(state, folder, name))
+        new_names.append(src)
+    return plan_renames(records, new_names)
+
+def resume_journal(state, log=print, progress=None, stats=None, cancel=None, workers=1):
+    """继续执行中断的重命名，完成情况写回原来的记录，返回 (成功数, 失败数)"""
+    plan = resume_plan(state)
+    log(f"继续中断的重命名: {os.path.basename(state.path)}")
+    log(plan.summary())
+    journal = RenameJournal(state.path)
+    journal.known.update(state.entries)
+    return apply_rename_plan(plan, log, progress, stats, cancel, workers, journal)
+
+def undo_journal(state, log=print, progress=None, stats=None, cancel=None, workers=1):
+    """撤销一次重命名，撤销本身也写入新的记录（可以再次撤销），返回 (成功数, 失败数)
+
+    全部改回后在原记录中写入撤销标记；有失败或取消时不写，可以再次撤销。
+    """
+    plan = undo_plan(state)
+    log(f"撤销重命名: {os.path.basename(state.path)}")
+    log(plan.summary())
+    journal = RenameJournal(new_journal_path(os.path.dirname(state.path), state.label),
+                            state.tool, state.label, state.root)
+    success_count, error_count = apply_rename_plan(plan, log, progress, stats, cancel, workers, journal)
+    if error_count == 0 and not (cancel is not None and cancel.is_set()):
+        try:
+            RenameJournal.mark_undone(state.path)
+        except OSError as e:
+            log(f"无法在原重命名记录中写入撤销标记: {str(e)}")
+    return success_count, error_count
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+JOURNAL_PREFIX = "重命名记录_"
+COMMIT_COUNT = 256  # 攒够这么多条完成记录就写入磁盘一次
+COMMIT_INTERVAL = 0.5  # 距上次写入磁盘超过这么多秒时也写入一次
+
+def new_journal_path(directory, label):
+    """在 directory 中生成一个新的重命名记录文件名，如 重命名记录_论文_20240101_120000.jsonl"""
+    base = os.path.join(directory, f"{JOURNAL_PREFIX}{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    path = base + ".jsonl"
+    suffix = 2
+    while os.path.exists(path):
+        path = f"{base}_{suffix}.jsonl"
+        suffix += 1
+    return path
+
+def find_journals(directory, label):
+    """返回 directory 中 label 的全部重命名记录路径，从新到旧"""
+    prefix = f"{JOURNAL_PREFIX}{label}_"
+    try:
+        with os.scandir(directory) as it:
+            names = [entry.name for entry in it if entry.name.startswith(prefix) and entry.name.endswith(".jsonl")]
+    except OSError:
+        return []
+    names.sort(key=lambda name: (name[:len(prefix) + 15], len(name), name), reverse=True)
+    return [os.path.join(directory, name) for name in names]
+
+def _ends_with_newline(path):
+    """文件为空或以换行结尾"""
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+class RenameJournal:
+    """追加写入的重命名记录（每行一个 JSON），用于中断后继续和撤销
+
+    开始改名前写入全部计划（begin 和每个文件的 entry）并立即写入磁盘；之后每完成
+    一步追加一条 temp（已改为临时文件名）或 done（已改为新文件名），按组提交：
+    攒够 COMMIT_COUNT 条或距上次提交超过 COMMIT_INTERVAL 秒才 fsync 一次。
+    正常结束时写入 end。崩溃时最后一组完成记录可能丢失，继续和撤销时按文件
+    实际所在的位置判断这些步骤。可以在多个线程中同时调用。
+    """
+
+    def __init__(self, path, tool=None, label="", root=""):
+        self.path = path
+        # 新记录的开头，写入第一个计划项时才创建文件；继续已有的记录时为 None
+        self.header = {"op": "begin", "tool": tool, "label": label, "root": root,
+                       "started": datetime.now().isoformat(timespec="seconds")} if tool else None
+        self.known = set()  # 已经写入的计划项编号
+        self.file = None
+        self.created = False  # 记录文件是否由本对象新建
+        self.lock = threading.Lock()
+        self.pending = 0  # 还没有写入磁盘的记录数
+        self.last_commit = time.perf_counter()
+        self.commits = 0
+        self.finished = False
+
+    def _open(self):
+        if self.file is None:
+            self.created = not os.path.lexists(self.path)
+            self.file = open(self.path, "a", encoding="utf-8")
+            if not self.created and not _ends_with_newline(self.path):
+                self.file.write("\n")  # 崩溃时写了一半的最后一行，之后的记录另起一行
+            if self.header:
+                self.file.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+                self.pending += 1
+
+    def _write(self, line):
+        self._open()
+        self.file.write(line)
+        self.pending += 1
+
+    def _commit(self):
+        if self.file is None or not self.pending:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_commit = time.perf_counter()
+        self.commits += 1
+
+    def add_entries(self, entries):
+        """写入计划项 (编号, 文件夹, 原文件名, 新文件名, 临时文件名) 并立即写入磁盘，已写入的编号跳过
+
+        没有新的计划项时也会打开记录文件，确认可以写入。写入失败时抛出 OSError，
+        新建的记录文件被删除，不会留下只有一部分计划的记录。
+        """
+        with self.lock:
+            try:
+                self._open()
+                for entry_id, folder, src, dst, temp in entries:
+                    if entry_id not in self.known:
+                        self._write(json.dumps({"op": "entry", "id": entry_id, "folder": folder, "src": src,
+                                                "dst": dst, "temp": temp}, ensure_ascii=False) + "\n")
+                        self.known.add(entry_id)
+                self._commit()
+            except OSError:
+                self._discard()
+                raise
+
+    def _discard(self):
+        """关闭写入失败的记录文件，新建的记录文件同时删除"""
+        file, self.file = self.file, None
+        self.pending = 0
+        if file is not None:
+            try:
+                file.close()
+            except OSError:
+                pass
+            if self.created:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+    def mark(self, op, entry_id):
+        """记录一步已完成（op 为 temp 或 done），按组提交"""
+        with self.lock:
+            self._write(f'{{"op": "{op}", "id": {int(entry_id)}}}\n')  # 每个文件一条，不经过 json 编码
+            if self.pending >= COMMIT_COUNT or time.perf_counter() - self.last_commit >= COMMIT_INTERVAL:
+                self._commit()
+
+    def commit(self):
+        """立即把已记录的内容写入磁盘"""
+        with self.lock:
+            self._commit()
+
+    def finish(self, cancelled=False):
+        """写入结束标记，之后这份记录不再需要继续"""
+        with self.lock:
+            if self.file is not None:
+                self._write(json.dumps({"op": "end", "cancelled": cancelled}) + "\n")
+                self._commit()
+            self.finished = True
+
+    def close(self):
+        """写入剩余的记录并关闭文件，写入失败时也会关闭文件"""
+        with self.lock:
+            if self.file is not None:
+                try:
+                    self._commit()
+                finally:
+                    file, self.file = self.file, None
+                    file.close()
+
+    @staticmethod
+    def mark_undone(path):
+        """在已撤销的记录末尾写入标记，之后不再撤销或继续这份记录"""
+        newline = "" if _ends_with_newline(path) else "\n"
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(newline + json.dumps({"op": "undone"}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+class JournalState:
+    """读取一份重命名记录: 计划项和各自已确认完成的步骤"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tool = None
+        self.label = ""
+        self.root = ""
+        self.entries = {}  # 编号 -> (文件夹, 原文件名, 新文件名, 临时文件名)
+        self.temp_done = set()
+        self.done = set()
+        self.finished = False
+        self.cancelled = False
+        self.undone = False
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的最后一行
+                op = record.get("op")
+                if op == "begin":
+                    self.tool = record.get("tool")
+                    self.label = record.get("label", "")
+                    self.root = record.get("root", "")
+                elif op == "entry":
+                    self.entries[record["id"]] = (record["folder"], record["src"], record["dst"], record["temp"])
+                elif op == "temp":
+                    self.temp_done.add(record["id"])
+                elif op == "done":
+                    self.done.add(record["id"])
+                elif op == "end":
+                    self.finished = True
+                    self.cancelled = record.get("cancelled", False)
+                elif op == "undone":
+                    self.undone = True
+
+    def locate(self, entry_id):
+        """文件现在的文件名，找不到时返回 None
+
+        第一阶段全部完成后才开始第二阶段，且开始前会提交记录，所以临时文件名不存在、
+        又没有 temp 记录的文件一定还没有开始改名。
+        """
+        folder, src, dst, temp = self.entries[entry_id]
+
+        def exists(name):
+            return os.path.lexists(os.path.join(folder, name))
+        if temp:
+            if exists(temp):
+                return temp
+            if entry_id in self.temp_done or entry_id in self.done:
+                return dst if exists(dst) else None
+            return src if exists(src) else None
+        if exists(src):
+            return src
+        return dst if exists(dst) else None
+
+def latest_journal(directory, label, unfinished=False):
+    """最近一次没有撤销的重命名记录，没有时返回 None
+
+    unfinished 为 True 时只在最近一次记录中断（没有结束标记）时返回它。
+    """
+    for path in find_journals(directory, label):
+        try:
+            state = JournalState(path)
+        except OSError:
+            continue
+        if state.undone:
+            continue
+        if unfinished and state.finished:
+            return None
+        return state
+    return None